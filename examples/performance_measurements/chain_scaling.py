@@ -0,0 +1,95 @@
+#!/usr/bin/env python2
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Installs more chains than there are vlan ids (50k by default) between
+# two VNFs using MPLS labels. Every chain gets its own UDP port match.
+# Usage: sudo python chain_scaling.py [num_chains] [label_mode]
+
+import csv
+import logging
+import re
+import sys
+import time
+
+from emuvim.dcemulator.net import DCNetwork
+from mininet.node import RemoteController
+from mininet.log import setLogLevel
+
+setLogLevel('info')
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger("chain_scaling")
+
+NUM_CHAINS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+LABEL_MODE = sys.argv[2] if len(sys.argv) > 2 else 'mpls'
+BATCH_SIZE = 1000
+FIRST_UDP_PORT = 1024
+
+
+def flow_count(switch):
+    out = switch.dpctl('dump-aggregate', '-O OpenFlow13')
+    m = re.search(r'flow_count=(\d+)', out)
+    return int(m.group(1)) if m else -1
+
+
+with open('chain_scaling_%s_%d.csv' % (LABEL_MODE, time.time()), 'w') as csvfile:
+    fieldnames = ['chains', 'batch_duration', 'failed', 'labels_in_use',
+                  'flows_s1', 'flows_s2']
+    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    writer.writeheader()
+
+    net = DCNetwork(controller=RemoteController, monitor=False,
+                    enable_learning=False, label_mode=LABEL_MODE)
+    try:
+        dc1 = net.addDatacenter("dc1")
+        dc2 = net.addDatacenter("dc2")
+        s1 = net.addSwitch("s1")
+        s2 = net.addSwitch("s2")
+        net.addLink(dc1, s1)
+        net.addLink(s1, s2)
+        net.addLink(s2, dc2)
+        net.start()
+
+        dc1.startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        dc2.startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+
+        start = time.time()
+        installed = 0
+        while installed < NUM_CHAINS:
+            n = min(BATCH_SIZE, NUM_CHAINS - installed)
+            chains = [{'vnf_src_name': 'vnf1', 'vnf_dst_name': 'vnf2',
+                       'vnf_src_interface': 'intf1',
+                       'vnf_dst_interface': 'intf2',
+                       'match': 'dl_type=0x0800,nw_proto=17,udp_dst=%d' % (
+                           FIRST_UDP_PORT + installed + i)}
+                      for i in range(n)]
+            res = net.programChains(chains, cmd='add-flow', cookie=10)
+            installed += n
+            writer.writerow({
+                'chains': installed,
+                'batch_duration': res.duration,
+                'failed': len(res.failed),
+                'labels_in_use': len(net.chain_labels),
+                'flows_s1': flow_count(net['s1']),
+                'flows_s2': flow_count(net['s2']),
+            })
+            csvfile.flush()
+
+        LOG.info('installed %d chains in %.1fs, %d labels in use' % (
+            installed, time.time() - start, len(net.chain_labels)))
+    finally:
+        net.stop()
@@ -57,6 +57,8 @@ class ChainApi(Resource):
                               resource_class_kwargs={'api': self})
         self.api.add_resource(ChainList, "/v1/chain/list",
                               resource_class_kwargs={'api': self})
+        self.api.add_resource(ChainVnfInterfacesList, "/v1/chain",
+                              resource_class_kwargs={'api': self})
         self.api.add_resource(ChainVnfInterfaces, "/v1/chain/<src_vnf>/<src_intfs>/<dst_vnf>/<dst_intfs>",
                               resource_class_kwargs={'api': self})
         self.api.add_resource(ChainVnfDcStackInterfaces,
@@ -173,6 +175,63 @@ class ChainList(Resource):
             return ex.message, 500
 
 
+class ChainVnfInterfacesList(Resource):
+    """
+    Handles requests targeted at: "/v1/chain"
+    Requests are for setting up many chains between vnfs at once.
+    """
+
+    def __init__(self, api):
+        self.api = api
+
+    def put(self):
+        return self.post()
+
+    def post(self):
+        """
+        A post request to "/v1/chain" will create all chains given as JSON array.
+        Each entry looks like this (path and layer2 are optional):
+        {"src_vnf": "vnf1", "src_intfs": "intf1", "dst_vnf": "vnf2", "dst_intfs": "intf2",
+         "path": ["dc1.s1", "s1", "dc4.s1"], "layer2": true}
+        The flow rules of all chains are installed in one go.
+
+        :return: flask.Response 200 if all chains are set up correctly else 500,
+         contains one entry per chain: [{'cookie': value, 'success': bool, 'message': str}]
+         501 if one of the VNF / intfs does not exist
+        :rtype: :class:`flask.Response`
+        """
+        if not request.is_json or not isinstance(request.json, list):
+            return Response(u"Expected a JSON array of chains", status=400,
+                            mimetype="application/json")
+
+        chains = list()
+        for entry in request.json:
+            # check if both VNFs exist
+            for vnf, intfs in [(entry.get('src_vnf'), entry.get('src_intfs')),
+                               (entry.get('dst_vnf'), entry.get('dst_intfs'))]:
+                if not self.api.manage.check_vnf_intf_pair(vnf, intfs):
+                    return Response(u"VNF %s or intfs %s does not exist" % (vnf, intfs), status=501,
+                                    mimetype="application/json")
+            chains.append({'vnf_src_name': entry.get('src_vnf'),
+                           'vnf_dst_name': entry.get('dst_vnf'),
+                           'vnf_src_interface': entry.get('src_intfs'),
+                           'vnf_dst_interface': entry.get('dst_intfs'),
+                           'bidirectional': True,
+                           'path': entry.get('path'),
+                           'layer2': entry.get('layer2', True)})
+        try:
+            resp = self.api.manage.network_actions_start(chains)
+            status = 200 if all(r['success'] for r in resp) else 500
+            return Response(json.dumps(resp), status=status,
+                            mimetype="application/json")
+
+        except Exception as e:
+            logging.exception(
+                u"%s: Error setting up the chains.\n %s" % (__name__, e))
+            return Response(u"Error setting up the chains",
+                            status=500, mimetype="application/json")
+
+
 class BalanceHostList(Resource):
     '''
     Will retrieve all loadbalance rules including their paths.
@@ -26,13 +26,14 @@
 import logging
 import threading
 import uuid
-import networkx as nx
 import emuvim.api.openstack.chain_api as chain_api
 import json
 import random
 from emuvim.api.openstack.resources.net import Net
 from emuvim.api.openstack.resources.port import Port
 from mininet.node import OVSSwitch, RemoteController, Node
+from emuvim.dcemulator.flows import FlowBatch, OfctlBundle
+from emuvim.dcemulator.timing import timed_operation
 
 
 class OpenstackManage(object):
@@ -88,6 +89,8 @@ class OpenstackManage(object):
         self.floating_netmask = "192.168.100.0/24"
         self.floating_nodes = dict()
         self.floating_cookies = dict()
+        # vlan tags used by the paths of each floating loadbalancer
+        self.floating_vlans = dict()
         self.floating_intf = None
         self.floating_links = dict()
 
@@ -141,6 +144,7 @@ class OpenstackManage(object):
             self.floating_root = Node('root', inNamespace=False)
             self.net.hosts.append(self.floating_root)
             self.net.nameToNode['root'] = self.floating_root
+            self.net.node_registry.add('root', self.floating_root, 'host')
             self.floating_intf = self.net.addLink(
                 self.floating_root, self.floating_switch).intf1
             self.floating_root.setIP(root_ip, intf=self.floating_intf)
@@ -220,16 +224,21 @@ class OpenstackManage(object):
             * *vnf_src_interface* (``str``): Name of source interface.
             * *vnf_dst_interface* (``str``): Name of destination interface.
             * *weight* (``int``): This value is fed into the shortest path computation if no path is specified.
+            * *routing* (``str``): 'load' to route the chain around utilized links (load-aware routing).
             * *match* (``str``): A custom match entry for the openflow flow rules. Only vlanid or port possible.
             * *bidirectional* (``bool``): If set the chain will be set in both directions, else it will just set up \
                             from source to destination.
             * *cookie* (``int``): Cookie value used by openflow. Used to identify the flows in the switches to be \
                             able to modify the correct flows.
             * *no_route* (``bool``): If set a layer 3 route to the target interface will not be set up.
+            * *chain_requests* (``list``): If given, the chain is not installed but appended to this list \
+                            (see network_actions_start).
         :return: The cookie chosen for the flow.
         :rtype: ``int``
         """
         try:
+            timer = self.net.timer
+            backend = self.net.flow_backend
             vnf_src_interface = kwargs.get('vnf_src_interface')
             vnf_dst_interface = kwargs.get('vnf_dst_interface')
             layer2 = kwargs.get('layer2', True)
@@ -247,8 +256,9 @@ class OpenstackManage(object):
             if layer2:
                 switch, inport = self._get_connected_switch_data(
                     vnf_src_name, vnf_src_interface)
-                self.setup_arp_reply_at(
-                    switch, inport, dst_intf.IP(), dst_intf.MAC())
+                with timer.phase('os_chain_add', backend, 'arp_reply'):
+                    self.setup_arp_reply_at(
+                        switch, inport, dst_intf.IP(), dst_intf.MAC())
                 if isinstance(match, str):
                     match += ",dl_dst=%s" % dst_intf.MAC()
                 else:
@@ -256,16 +266,24 @@ class OpenstackManage(object):
 
             cookie = kwargs.get('cookie', self.get_cookie())
             self.cookies.add(cookie)
-            self.net.setChain(
-                vnf_src_name, vnf_dst_name,
+            chain_request = dict(
+                vnf_src_name=vnf_src_name,
+                vnf_dst_name=vnf_dst_name,
                 vnf_src_interface=vnf_src_interface,
                 vnf_dst_interface=vnf_dst_interface,
                 cmd='add-flow',
                 weight=kwargs.get('weight'),
+                routing=kwargs.get('routing'),
                 match=match,
                 bidirectional=False,
                 cookie=cookie,
                 path=kwargs.get('path'))
+            if kwargs.get('chain_requests') is not None:
+                # installed later on together with other chains
+                kwargs['chain_requests'].append(chain_request)
+            else:
+                with timer.phase('os_chain_add', backend, 'set_chain'):
+                    self.net.setChain(**chain_request)
 
             # to keep this logic seperate of the core son-emu do the
             # housekeeping here
@@ -279,8 +297,9 @@ class OpenstackManage(object):
             if kwargs.get('path') is not None:
                 data["path"] = kwargs.get('path')
             else:
-                data["path"] = self._get_path(vnf_src_name, vnf_dst_name, vnf_src_interface,
-                                              vnf_dst_interface)[0]
+                with timer.phase('os_chain_add', backend, 'path'):
+                    data["path"] = self._get_path(vnf_src_name, vnf_dst_name, vnf_src_interface,
+                                                  vnf_dst_interface)[0]
 
             # add route to dst ip to this interface
             # this might block on containers that are still setting up, so
@@ -288,8 +307,9 @@ class OpenstackManage(object):
             if not kwargs.get('no_route'):
                 # son_emu does not like concurrent commands for a container so we need to lock this if multiple chains
                 # on the same interface are created
-                src_node.setHostRoute(dst_node.intf(
-                    vnf_dst_interface).IP(), vnf_src_interface)
+                with timer.phase('os_chain_add', backend, 'host_route'):
+                    src_node.setHostRoute(dst_node.intf(
+                        vnf_dst_interface).IP(), vnf_src_interface)
 
             try:
                 son_emu_data = json.loads(
@@ -305,7 +325,8 @@ class OpenstackManage(object):
                 son_emu_data["son_emu_data"]["interfaces"][vnf_src_interface].append(
                     dst_intf.IP())
 
-            self.set_son_emu_chain_data(vnf_src_name, son_emu_data)
+            with timer.phase('os_chain_add', backend, 'chain_data'):
+                self.set_son_emu_chain_data(vnf_src_name, son_emu_data)
 
             if kwargs.get('bidirectional', False):
                 # call the reverse direction
@@ -315,7 +336,9 @@ class OpenstackManage(object):
                 self.network_action_start(vnf_dst_name, vnf_src_name, vnf_src_interface=vnf_dst_interface,
                                           vnf_dst_interface=vnf_src_interface, bidirectional=False,
                                           layer2=kwargs.get('layer2', False), path=path,
-                                          no_route=kwargs.get('no_route'))
+                                          no_route=kwargs.get('no_route'),
+                                          routing=kwargs.get('routing'),
+                                          chain_requests=kwargs.get('chain_requests'))
 
             self.full_chain_data[flow] = data
             self.chain_flow_cookies[flow] = cookie
@@ -324,6 +347,43 @@ class OpenstackManage(object):
             logging.exception("RPC error.")
             raise Exception(ex.message)
 
+    @timed_operation('os_chains_add')
+    def network_actions_start(self, chains):
+        """
+        Starts many network chains at once. The flow rules of all chains are
+        installed with a single DCNetwork.setChains call.
+
+        :param chains: List of dicts with the keys vnf_src_name, vnf_dst_name and the keyword
+                       arguments of network_action_start.
+        :type chains: ``list``
+        :return: One dict per chain: {'cookie': ..., 'success': ..., 'message': ...}
+        :rtype: ``list``
+        """
+        chain_requests = list()
+        started = list()
+        for chain in chains:
+            kwargs = dict(chain)
+            vnf_src_name = kwargs.pop('vnf_src_name')
+            vnf_dst_name = kwargs.pop('vnf_dst_name')
+            first = len(chain_requests)
+            kwargs['chain_requests'] = chain_requests
+            cookie = self.network_action_start(vnf_src_name, vnf_dst_name, **kwargs)
+            started.append((cookie, first, len(chain_requests)))
+
+        with self.net.timer.phase('os_chains_add', self.net.flow_backend, 'set_chains'):
+            results = self.net.setChains(chain_requests)
+
+        ret = list()
+        for cookie, first, last in started:
+            chain_results = results[first:last]
+            ret.append({
+                'cookie': cookie,
+                'success': all(r['success'] for r in chain_results),
+                'message': '\n'.join(r['message'] for r in chain_results)
+            })
+        return ret
+
+    @timed_operation('os_chain_delete')
     def network_action_stop(self, vnf_src_name, vnf_dst_name, **kwargs):
         """
         Starts a network chain for a source destination pair
@@ -396,20 +456,10 @@ class OpenstackManage(object):
         :return: List containing the switch, and the inport number
         :rtype: [``str``, ``int``]
         """
-        src_sw = None
-        src_sw_inport_nr = None
-        for connected_sw in self.net.DCNetwork_graph.neighbors(vnf_name):
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            for link in link_dict:
-                if (link_dict[link]['src_port_id'] == vnf_interface or
-                    link_dict[link][
-                        'src_port_name'] == vnf_interface):
-                    # found the right link and connected switch
-                    src_sw = connected_sw
-                    src_sw_inport_nr = link_dict[link]['dst_port_nr']
-                    break
-
-        return src_sw, src_sw_inport_nr
+        port = self.net.getConnectedSwitchPort(vnf_name, vnf_interface)
+        if port is None:
+            return None, None
+        return port.switch, port.port_nr
 
     def _get_path(self, src_vnf, dst_vnf, src_vnf_intf, dst_vnf_intf):
         """
@@ -429,37 +479,18 @@ class OpenstackManage(object):
         """
         # modified version of the _chainAddFlow from
         # emuvim.dcemulator.net._chainAddFlow
-        src_sw = None
-        dst_sw = None
         logging.debug("Find shortest path from vnf %s to %s",
                       src_vnf, dst_vnf)
 
-        for connected_sw in self.net.DCNetwork_graph.neighbors(src_vnf):
-            link_dict = self.net.DCNetwork_graph[src_vnf][connected_sw]
-            for link in link_dict:
-                if (link_dict[link]['src_port_id'] == src_vnf_intf or
-                    link_dict[link][
-                        'src_port_name'] == src_vnf_intf):
-                    # found the right link and connected switch
-                    src_sw = connected_sw
-                    break
-
-        for connected_sw in self.net.DCNetwork_graph.neighbors(dst_vnf):
-            link_dict = self.net.DCNetwork_graph[connected_sw][dst_vnf]
-            for link in link_dict:
-                if link_dict[link]['dst_port_id'] == dst_vnf_intf or \
-                        link_dict[link][
-                        'dst_port_name'] == dst_vnf_intf:
-                    # found the right link and connected
-                    dst_sw = connected_sw
-                    break
+        src_sw, _ = self._get_connected_switch_data(src_vnf, src_vnf_intf)
+        dst_sw, _ = self._get_connected_switch_data(dst_vnf, dst_vnf_intf)
         logging.debug("From switch %s to %s " % (src_sw, dst_sw))
 
         # get shortest path
         try:
             # returns the first found shortest path
             # if all shortest paths are wanted, use: all_shortest_paths
-            path = nx.shortest_path(self.net.DCNetwork_graph, src_sw, dst_sw)
+            path = self.net.getShortestPath(src_sw, dst_sw)
         except BaseException:
             logging.exception("No path could be found between {0} and {1} using src_sw={2} and dst_sw={3}".format(
                 src_vnf, dst_vnf, src_sw, dst_sw))
@@ -474,6 +505,7 @@ class OpenstackManage(object):
             src_vnf, dst_vnf, path))
         return path, src_sw, dst_sw
 
+    @timed_operation('lb_install')
     def add_loadbalancer(self, src_vnf_name, src_vnf_interface, lb_data):
         """
         This function will set up a loadbalancer at the given interface.
@@ -507,13 +539,10 @@ class OpenstackManage(object):
 
         # find the switch belonging to the source interface, as well as the
         # inport nr
-        for connected_sw in net.DCNetwork_graph.neighbors(src_vnf_name):
-            link_dict = net.DCNetwork_graph[src_vnf_name][connected_sw]
-            for link in link_dict:
-                if link_dict[link]['src_port_name'] == src_vnf_interface:
-                    src_sw = connected_sw
-                    src_sw_inport_nr = link_dict[link]['dst_port_nr']
-                    break
+        src_port = net.getConnectedSwitchPort(src_vnf_name, src_vnf_interface)
+        if src_port is not None:
+            src_sw = src_port.switch
+            src_sw_inport_nr = src_port.port_nr
 
         if src_sw is None or src_sw_inport_nr == 0:
             raise Exception(u"Source VNF or interface can not be found.")
@@ -522,12 +551,10 @@ class OpenstackManage(object):
         for vnf_name in dest_intfs_mapping:
             if vnf_name not in net.DCNetwork_graph:
                 raise Exception(u"Target VNF %s is not known." % vnf_name)
-            for connected_sw in net.DCNetwork_graph.neighbors(vnf_name):
-                link_dict = net.DCNetwork_graph[vnf_name][connected_sw]
-                for link in link_dict:
-                    if link_dict[link]['src_port_name'] == dest_intfs_mapping[vnf_name]:
-                        dest_vnf_outport_nrs.append(
-                            int(link_dict[link]['dst_port_nr']))
+            dst_port = net.getConnectedSwitchPort(
+                vnf_name, dest_intfs_mapping[vnf_name])
+            if dst_port is not None:
+                dest_vnf_outport_nrs.append(int(dst_port.port_nr))
         # get first switch
         if (src_vnf_name, src_vnf_interface) not in self.lb_flow_cookies:
             self.lb_flow_cookies[(src_vnf_name, src_vnf_interface)] = list()
@@ -542,7 +569,9 @@ class OpenstackManage(object):
         # set up paths for each destination vnf individually
         index = 0
         cookie = self.get_cookie()
-        main_cmd = "add-flow -OOpenFlow13"
+        # all rules are applied as one bundle per switch at the end
+        bundle = OfctlBundle(use_bundles=net.ofctl_bundles,
+                             cookie_index=net.cookie_index)
         self.lb_flow_cookies[(src_vnf_name, src_vnf_interface)].append(cookie)
 
         # bookkeeping
@@ -563,13 +592,15 @@ class OpenstackManage(object):
 
         # set up arp reply as well as add the route to the interface
         self.setup_arp_reply_at(src_sw, src_sw_inport_nr,
-                                plus_one, lb_mac, cookie=cookie)
-        net.getNodeByName(src_vnf_name).setHostRoute(
-            plus_one, src_vnf_interface)
+                                plus_one, lb_mac, cookie=cookie, bundle=bundle)
+        with net.timer.phase('lb_install', net.flow_backend, 'host_route'):
+            net.getNodeByName(src_vnf_name).setHostRoute(
+                plus_one, src_vnf_interface)
 
         for dst_vnf_name, dst_vnf_interface in dest_intfs_mapping.items():
-            path, src_sw, dst_sw = self._get_path(src_vnf_name, dst_vnf_name,
-                                                  src_vnf_interface, dst_vnf_interface)
+            with net.timer.phase('lb_install', net.flow_backend, 'path'):
+                path, src_sw, dst_sw = self._get_path(src_vnf_name, dst_vnf_name,
+                                                      src_vnf_interface, dst_vnf_interface)
 
             # use custom path if one is supplied
             # json does not support hashing on tuples so we use nested dicts
@@ -599,14 +630,14 @@ class OpenstackManage(object):
             switch_inport_nr = src_sw_inport_nr
 
             # self.setup_arp_reply_at(src_sw, src_sw_inport_nr, target_ip, target_mac, cookie=cookie)
-            net.getNodeByName(dst_vnf_name).setHostRoute(
-                src_ip, dst_vnf_interface)
+            with net.timer.phase('lb_install', net.flow_backend, 'host_route'):
+                net.getNodeByName(dst_vnf_name).setHostRoute(
+                    src_ip, dst_vnf_interface)
 
             # choose free vlan if path contains more than 1 switch
             if len(path) > 1:
-                vlan = net.vlans.pop()
-                if vlan == 0:
-                    vlan = net.vlans.pop()
+                vlan = net.vlans.allocate(
+                    owner=('lb', src_vnf_name, src_vnf_interface))
             else:
                 vlan = None
 
@@ -673,7 +704,7 @@ class OpenstackManage(object):
                         # set up arp replys at the port so the dst nodes know
                         # the src
                         self.setup_arp_reply_at(
-                            current_hop, switch_outport_nr, src_ip, src_mac, cookie=cookie)
+                            current_hop, switch_outport_nr, src_ip, src_mac, cookie=cookie, bundle=bundle)
 
                         # reverse route
                         cmd_back = 'in_port=%s' % switch_outport_nr
@@ -719,14 +750,14 @@ class OpenstackManage(object):
                     cmd_back += ',output:%s' % src_sw_inport_nr
 
                     self.setup_arp_reply_at(
-                        current_hop, switch_outport_nr, src_ip, src_mac, cookie=cookie)
+                        current_hop, switch_outport_nr, src_ip, src_mac, cookie=cookie, bundle=bundle)
 
                 # excecute the command on the target switch
                 logging.debug(cmd)
                 cmd = "\"%s\"" % cmd
                 cmd_back = "\"%s\"" % cmd_back
-                net[current_hop].dpctl(main_cmd, cmd)
-                net[current_hop].dpctl(main_cmd, cmd_back)
+                bundle.add(net[current_hop], cmd)
+                bundle.add(net[current_hop], cmd_back)
 
                 # set next hop for the next iteration step
                 if isinstance(next_node, OVSSwitch):
@@ -754,11 +785,14 @@ class OpenstackManage(object):
 
         # actually add the flow
         logging.debug("Switch: %s, CMD: %s" % (src_sw, cmd))
-        net[src_sw].dpctl(main_cmd, cmd)
+        bundle.add(net[src_sw], cmd)
+        with net.timer.phase('lb_install', net.flow_backend, 'flow_push'):
+            bundle.apply(net.flow_workers)
 
         # finally add all flow data to the internal data storage
         self.full_lb_data[(src_vnf_name, src_vnf_interface)] = data
 
+    @timed_operation('floating_lb_install')
     def add_floating_lb(self, datacenter, lb_data):
         """
         This function will set up a loadbalancer at the given datacenter.
@@ -789,12 +823,10 @@ class OpenstackManage(object):
         for vnf_name in dest_intfs_mapping:
             if vnf_name not in net.DCNetwork_graph:
                 raise Exception(u"Target VNF %s is not known." % vnf_name)
-            for connected_sw in net.DCNetwork_graph.neighbors(vnf_name):
-                link_dict = net.DCNetwork_graph[vnf_name][connected_sw]
-                for link in link_dict:
-                    if link_dict[link]['src_port_name'] == dest_intfs_mapping[vnf_name]:
-                        dest_vnf_outport_nrs.append(
-                            int(link_dict[link]['dst_port_nr']))
+            dst_port = net.getConnectedSwitchPort(
+                vnf_name, dest_intfs_mapping[vnf_name])
+            if dst_port is not None:
+                dest_vnf_outport_nrs.append(int(dst_port.port_nr))
 
         if len(dest_vnf_outport_nrs) == 0:
             raise Exception(
@@ -805,7 +837,9 @@ class OpenstackManage(object):
         # set up paths for each destination vnf individually
         index = 0
         cookie = self.get_cookie()
-        main_cmd = "add-flow -OOpenFlow13"
+        # all rules are applied as one bundle per switch at the end
+        bundle = OfctlBundle(use_bundles=net.ofctl_bundles,
+                             cookie_index=net.cookie_index)
         floating_ip = self.floating_network.get_new_ip_address(
             "floating-ip").split("/")[0]
 
@@ -822,9 +856,10 @@ class OpenstackManage(object):
                 if datacenter not in self.floating_links:
                     self.floating_links[datacenter] = \
                         net.addLink(self.floating_switch, datacenter)
-                path = \
-                    self._get_path(self.floating_root.name, dst_vnf_name,
-                                   self.floating_intf.name, dst_vnf_interface)[0]
+                with net.timer.phase('floating_lb_install', net.flow_backend, 'path'):
+                    path = \
+                        self._get_path(self.floating_root.name, dst_vnf_name,
+                                       self.floating_intf.name, dst_vnf_interface)[0]
 
             if isinstance(path, dict):
                 self.delete_flow_by_cookie(cookie)
@@ -837,7 +872,8 @@ class OpenstackManage(object):
             dst_sw_outport_nr = dest_vnf_outport_nrs[index]
             current_hop = src_sw
             switch_inport_nr = src_sw_inport_nr
-            vlan = net.vlans.pop()
+            vlan = net.vlans.allocate(owner=('floating_lb', cookie))
+            self.floating_vlans.setdefault(cookie, list()).append(vlan)
 
             # iterate all switches on the path
             for i in range(0, len(path)):
@@ -888,7 +924,7 @@ class OpenstackManage(object):
                     cmd_back += ',dl_vlan=%s' % vlan
                     cmd_back += ',actions=pop_vlan,output:%s' % switch_inport_nr
                     self.setup_arp_reply_at(
-                        current_hop, src_sw_inport_nr, floating_ip, target_mac, cookie=cookie)
+                        current_hop, src_sw_inport_nr, floating_ip, target_mac, cookie=cookie, bundle=bundle)
                 elif next_hop == dst_vnf_name:  # last switch
                     # remove any vlan tags
                     cmd += ',dl_vlan=%s' % vlan
@@ -896,7 +932,7 @@ class OpenstackManage(object):
                     # set up arp replys at the port so the dst nodes know the
                     # src
                     self.setup_arp_reply_at(
-                        current_hop, switch_outport_nr, src_ip, src_mac, cookie=cookie)
+                        current_hop, switch_outport_nr, src_ip, src_mac, cookie=cookie, bundle=bundle)
 
                     # reverse route
                     cmd_back = 'in_port=%s' % switch_outport_nr
@@ -909,8 +945,9 @@ class OpenstackManage(object):
                     cmd_back += ',set_field:%s->eth_src' % src_mac
                     cmd_back += ',set_field:%s->ip_src' % floating_ip
                     cmd_back += ',output:%s' % switch_inport_nr
-                    net.getNodeByName(dst_vnf_name).setHostRoute(
-                        src_ip, dst_vnf_interface)
+                    with net.timer.phase('floating_lb_install', net.flow_backend, 'host_route'):
+                        net.getNodeByName(dst_vnf_name).setHostRoute(
+                            src_ip, dst_vnf_interface)
                 else:  # middle node
                     # if we have a circle in the path we need to specify this, as openflow will ignore the packet
                     # if we just output it on the same port as it came in
@@ -927,8 +964,8 @@ class OpenstackManage(object):
                 logging.debug(cmd)
                 cmd = "\"%s\"" % cmd
                 cmd_back = "\"%s\"" % cmd_back
-                net[current_hop].dpctl(main_cmd, cmd)
-                net[current_hop].dpctl(main_cmd, cmd_back)
+                bundle.add(net[current_hop], cmd)
+                bundle.add(net[current_hop], cmd_back)
 
                 # set next hop for the next iteration step
                 if isinstance(next_node, OVSSwitch):
@@ -956,14 +993,16 @@ class OpenstackManage(object):
 
         # actually add the flow
         logging.debug("Switch: %s, CMD: %s" % (src_sw, cmd))
-        net[src_sw].dpctl(main_cmd, cmd)
+        bundle.add(net[src_sw], cmd)
+        with net.timer.phase('floating_lb_install', net.flow_backend, 'flow_push'):
+            bundle.apply(net.flow_workers)
 
         self.floating_cookies[cookie] = floating_ip
 
         return cookie, floating_ip
 
     def setup_arp_reply_at(self, switch, port_nr,
-                           target_ip, target_mac, cookie=None):
+                           target_ip, target_mac, cookie=None, bundle=None):
         """
         Sets up a custom ARP reply at a switch.
         An ARP request coming in on the `port_nr` for `target_ip` will be answered with target IP/MAC.
@@ -978,12 +1017,13 @@ class OpenstackManage(object):
         :type target_mac: ``str``
         :param cookie: cookie to identify the ARP request, if None a new one will be picked
         :type cookie: ``int`` or ``None``
+        :param bundle: add the rule to this bundle instead of applying it right away
+        :type bundle: ``OfctlBundle`` or ``None``
         :return: cookie
         :rtype: ``int``
         """
         if cookie is None:
             cookie = self.get_cookie()
-        main_cmd = "add-flow -OOpenFlow13"
 
         # first set up ARP requests for the source node, so it will always
         # 'find' a partner
@@ -1009,7 +1049,13 @@ class OpenstackManage(object):
         cmd += ',load:0x%s->NXM_OF_ARP_SPA[]' % dst_ip_hex
         # output to incoming port remember the closing "
         cmd += ',IN_PORT"'
-        self.net[switch].dpctl(main_cmd, cmd)
+        if bundle is None:
+            arp_bundle = OfctlBundle(use_bundles=self.net.ofctl_bundles,
+                                     cookie_index=self.net.cookie_index)
+            arp_bundle.add(self.net[switch], cmd)
+            arp_bundle.apply()
+        else:
+            bundle.add(self.net[switch], cmd)
         logging.debug(
             "Set up ARP reply at %s port %s." % (switch, port_nr))
 
@@ -1026,23 +1072,49 @@ class OpenstackManage(object):
             return False
         logging.debug("Deleting flow by cookie %d" % (cookie))
         flows = list()
-        # we have to call delete-group for each switch
-        for node in self.net.switches:
+        # only the switches that received flows with this cookie
+        for dpid in self._cookie_dpids(cookie):
             flow = dict()
-            flow["dpid"] = int(node.dpid, 16)
+            flow["dpid"] = dpid
             flow["cookie"] = cookie
             flow['cookie_mask'] = int('0xffffffffffffffff', 16)
 
             flows.append(flow)
-        for flow in flows:
-            logging.debug("Deleting flowentry with cookie %d" % (
-                flow["cookie"]))
-            if self.net.controller == RemoteController:
-                self.net.ryu_REST('stats/flowentry/delete', data=flow)
+        logging.debug("Deleting flowentries with cookie %d" % cookie)
+        if self.net.controller == RemoteController:
+            self.net.deleteFlows(flows)
+        self._release_chains(cookie)
 
+        self.net.cookie_index.pop(cookie)
         self.cookies.remove(cookie)
         return True
 
+    def _release_chains(self, cookie):
+        """
+        Release the chain records (tag, reservation, queue, ...) of the chains
+        installed with the given cookie, their flows are deleted by cookie.
+        """
+        batch = FlowBatch()
+        for target_flow, chain_cookie in self.chain_flow_cookies.items():
+            if chain_cookie != cookie:
+                continue
+            src_vnf_name, src_vnf_intf, dst_vnf_name, dst_vnf_intf = target_flow
+            # shared entries of path labels that are not used any more
+            for entry in self.net._removeChainRecord(
+                    src_vnf_name, dst_vnf_name, src_vnf_intf, dst_vnf_intf):
+                batch.add(entry)
+        if batch.entries:
+            self.net._apply_flow_batch(batch)
+
+    def _cookie_dpids(self, cookie):
+        """
+        Dpids of the switches that hold flows with the given cookie.
+        Falls back to all switches if the cookie was never recorded.
+        """
+        if cookie in self.net.cookie_index:
+            return self.net.cookie_index.dpids(cookie)
+        return [int(node.dpid, 16) for node in self.net.switches]
+
     def delete_chain_by_intf(
             self, src_vnf_name, src_vnf_intf, dst_vnf_name, dst_vnf_intf):
         """
@@ -1078,6 +1150,7 @@ class OpenstackManage(object):
             return True
         return False
 
+    @timed_operation('lb_delete')
     def delete_loadbalancer(self, vnf_src_name, vnf_src_interface):
         '''
         Removes a loadbalancer that is configured for the node and interface
@@ -1086,42 +1159,51 @@ class OpenstackManage(object):
         :param src_vnf_interface: Name of the destination VNF
         '''
         flows = list()
-        # we have to call delete-group for each switch
+        # we have to call delete-group for each switch of the lb
         delete_group = list()
         group_id = self.get_flow_group(vnf_src_name, vnf_src_interface)
-        for node in self.net.switches:
-            for cookie in self.lb_flow_cookies[(
-                    vnf_src_name, vnf_src_interface)]:
+        lb_dpids = set()
+        for cookie in self.lb_flow_cookies[(
+                vnf_src_name, vnf_src_interface)]:
+            for dpid in self._cookie_dpids(cookie):
                 flow = dict()
-                flow["dpid"] = int(node.dpid, 16)
+                flow["dpid"] = dpid
                 flow["cookie"] = cookie
                 flow['cookie_mask'] = int('0xffffffffffffffff', 16)
 
                 flows.append(flow)
+                lb_dpids.add(dpid)
+            self.net.cookie_index.pop(cookie)
+        for dpid in sorted(lb_dpids):
             group_del = dict()
-            group_del["dpid"] = int(node.dpid, 16)
+            group_del["dpid"] = dpid
             group_del["group_id"] = group_id
             delete_group.append(group_del)
 
-        for flow in flows:
-            logging.debug("Deleting flowentry with cookie %d belonging to lb at %s:%s" % (
-                flow["cookie"], vnf_src_name, vnf_src_interface))
-            if self.net.controller == RemoteController:
-                self.net.ryu_REST('stats/flowentry/delete', data=flow)
+        logging.debug("Deleting flowentries with cookies %s belonging to lb at %s:%s" % (
+            self.lb_flow_cookies[(vnf_src_name, vnf_src_interface)], vnf_src_name, vnf_src_interface))
+        if self.net.controller == RemoteController:
+            self.net.deleteFlows(flows)
 
+        # groups can only be deleted after the flows that point to them
         logging.debug("Deleting group with id %s" % group_id)
-        for switch_del_group in delete_group:
-            if self.net.controller == RemoteController:
-                self.net.ryu_REST("stats/groupentry/delete",
-                                  data=switch_del_group)
+        if self.net.controller == RemoteController:
+            self.net.ryu_REST_batch(
+                [{'prefix': 'stats/groupentry/delete', 'data': switch_del_group}
+                 for switch_del_group in delete_group])
 
         # unmap groupid from the interface
         target_pair = (vnf_src_name, vnf_src_interface)
         if target_pair in self.flow_groups:
             del self.flow_groups[target_pair]
         if target_pair in self.full_lb_data:
+            # the flows are gone, so the vlan tags of the paths can be reused
+            for path_data in self.full_lb_data[target_pair]["paths"]:
+                self.net.vlans.free(path_data["vlan"],
+                                    owner=('lb',) + target_pair)
             del self.full_lb_data[target_pair]
 
+    @timed_operation('floating_lb_delete')
     def delete_floating_lb(self, cookie):
         """
         Delete a floating loadbalancer.
@@ -1137,6 +1219,8 @@ class OpenstackManage(object):
         self.delete_flow_by_cookie(cookie)
         floating_ip = self.floating_cookies[cookie]
         self.floating_network.withdraw_ip_address(floating_ip)
+        for vlan in self.floating_vlans.pop(cookie, list()):
+            self.net.vlans.free(vlan, owner=('floating_lb', cookie))
 
     def set_arp_entry(self, vnf_name, vnf_interface, ip, mac):
         """
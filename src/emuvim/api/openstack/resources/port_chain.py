@@ -67,6 +67,8 @@ class PortChain(object):
         egress_ports = list(map(lambda port_pair: port_pair.ingress, port_pair_chain))
         chain_start = ingress_ports[0]
         chain_rest = ingress_ports[1:]
+        # the chains of all flow classifiers are installed at once
+        chain_requests = []
 
         for flow_classifier_id in self.flow_classifiers:
             flow_classifier = compute.find_flow_classifier_by_name_or_id(flow_classifier_id)
@@ -93,14 +95,19 @@ class PortChain(object):
                     raise RuntimeError("Neutron SFC: ingress port %s not connected to any server." %
                                        ingress_port.name)
 
-                compute.dc.net.setChain(
-                    server_egress.name, server_ingress.name,
-                    egress_port.intf_name, ingress_port.intf_name,
+                chain_requests.append(dict(
+                    vnf_src_name=server_egress.name, vnf_dst_name=server_ingress.name,
+                    vnf_src_interface=egress_port.intf_name, vnf_dst_interface=ingress_port.intf_name,
                     match=flow_classifier.to_match(),
                     mod_dl_dst=ingress_port.mac_address,
                     cmd="add-flow", cookie=self.cookie, priority=10, bidirectional=False,
                     monitor=False, skip_vlan_tag=True
-                )
+                ))
+
+        for result in compute.dc.net.setChains(chain_requests):
+            if not result["success"]:
+                raise RuntimeError("Neutron SFC: chain %s -> %s failed: %s" %
+                                   (result["vnf_src_name"], result["vnf_dst_name"], result["message"]))
 
     def uninstall(self, compute):
         # TODO: implement
@@ -217,8 +217,10 @@ class Compute(Resource):
         logging.debug("API CALL: compute status")
 
         try:
+            # fresh=true: bypass the status cache
+            fresh = request.args.get('fresh', 'false').lower() == 'true'
             return dcs.get(dc_label).containers.get(
-                compute_name).getStatus(), 200, CORS_HEADER
+                compute_name).getStatus(fresh=fresh), 200, CORS_HEADER
         except Exception as ex:
             logging.exception("API error.")
             return ex.message, 500, CORS_HEADER
@@ -258,17 +260,19 @@ class ComputeList(Resource):
     def get(self, dc_label=None):
         logging.debug("API CALL: compute list")
         try:
+            # fresh=true: bypass the status cache
+            fresh = request.args.get('fresh', 'false').lower() == 'true'
             if dc_label is None or dc_label == 'None':
                 # return list with all compute nodes in all DCs
                 all_containers = []
                 for dc in dcs.values():
                     all_containers += dc.listCompute()
-                container_list = [(c.name, c.getStatus())
+                container_list = [(c.name, c.getStatus(fresh=fresh))
                                   for c in all_containers]
                 return container_list, 200, CORS_HEADER
             else:
                 # return list of compute nodes for specified DC
-                container_list = [(c.name, c.getStatus())
+                container_list = [(c.name, c.getStatus(fresh=fresh))
                                   for c in dcs.get(dc_label).listCompute()]
                 return container_list, 200, CORS_HEADER
         except Exception as ex:
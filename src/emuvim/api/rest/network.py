@@ -44,6 +44,8 @@ net = None
 class NetworkAction(Resource):
     """
     Add or remove chains between VNFs. These chain links are implemented as flow entries in the networks' SDN switches.
+    The payload can also be a JSON array of chains (with the parameters below), these are set up all at once
+    and a list with one result per chain is returned.
     :param vnf_src_name: VNF name of the source of the link
     :param vnf_dst_name: VNF name of the destination of the link
     :param vnf_src_interface: VNF interface name of the source of the link
@@ -56,6 +58,12 @@ class NetworkAction(Resource):
     :param skip_vlan_tag: boolean to indicate whether a new vlan tag should be created for this chain
     :param monitor: boolean to indicate whether a new vlan tag should be created for this chain
     :param monitor_placement: 'tx'=place the monitoring flowrule at the beginning of the chain, 'rx'=place at the end of the chain
+    :param routing: 'load' to route the chain around utilized links
+    :param protect: boolean, also install a link-disjoint backup path with fast failover
+    :param max_delay: max. end-to-end delay (ms) of the path of the chain
+    :param min_bw: min. residual bandwidth (Mbit/s) of the path, reserved for the chain
+    :param min_rate: guaranteed rate (Mbit/s) of the chain (HTB queue on its ports)
+    :param max_rate: max. rate (Mbit/s) of the chain (HTB queue on its ports)
     :return: message string indicating if the chain action is succesful or not
     """
 
@@ -85,38 +93,62 @@ class NetworkAction(Resource):
             if data is None:
                 data = {}
 
-            vnf_src_name = data.get("vnf_src_name")
-            vnf_dst_name = data.get("vnf_dst_name")
-            vnf_src_interface = data.get("vnf_src_interface")
-            vnf_dst_interface = data.get("vnf_dst_interface")
-            weight = data.get("weight")
-            match = data.get("match")
-            bidirectional = data.get("bidirectional")
-            cookie = data.get("cookie")
-            priority = data.get("priority")
-            skip_vlan_tag = data.get("skip_vlan_tag")
-            monitor = data.get("monitor")
-            monitor_placement = data.get("monitor_placement")
+            # a JSON array sets up (or removes) all given chains at once
+            if isinstance(data, list):
+                chain_requests = [self._chain_request(d, command) for d in data]
+                results = net.setChains(chain_requests)
+                return results, 200, CORS_HEADER
 
+            chain_request = self._chain_request(data, command)
             c = net.setChain(
-                vnf_src_name, vnf_dst_name,
-                vnf_src_interface=vnf_src_interface,
-                vnf_dst_interface=vnf_dst_interface,
-                cmd=command,
-                weight=weight,
-                match=match,
-                bidirectional=bidirectional,
-                cookie=cookie,
-                priority=priority,
-                skip_vlan_tag=skip_vlan_tag,
-                monitor=monitor,
-                monitor_placement=monitor_placement)
+                chain_request.pop("vnf_src_name"),
+                chain_request.pop("vnf_dst_name"),
+                **chain_request)
             # return setChain response
             return str(c), 200, CORS_HEADER
         except Exception as ex:
             logging.exception("API error.")
             return str(ex), 500, CORS_HEADER
 
+    def _chain_request(self, data, command):
+        return dict(
+            vnf_src_name=data.get("vnf_src_name"),
+            vnf_dst_name=data.get("vnf_dst_name"),
+            vnf_src_interface=data.get("vnf_src_interface"),
+            vnf_dst_interface=data.get("vnf_dst_interface"),
+            cmd=command,
+            weight=data.get("weight"),
+            match=data.get("match"),
+            bidirectional=data.get("bidirectional"),
+            cookie=data.get("cookie"),
+            priority=data.get("priority"),
+            skip_vlan_tag=data.get("skip_vlan_tag"),
+            monitor=data.get("monitor"),
+            monitor_placement=data.get("monitor_placement"),
+            routing=data.get("routing"),
+            protect=data.get("protect"),
+            max_delay=data.get("max_delay"),
+            min_bw=data.get("min_bw"),
+            min_rate=data.get("min_rate"),
+            max_rate=data.get("max_rate"))
+
+
+class NetworkQueues(Resource):
+    """
+    HTB queues of the chains with a min_rate/max_rate and their counters
+    (tx_bytes, tx_packets, tx_errors per switch).
+    """
+
+    global net
+
+    def get(self):
+        logging.debug("REST CALL: network chain queues")
+        try:
+            return net.getChainQueues(stats=True), 200, CORS_HEADER
+        except Exception as ex:
+            logging.exception("API error.")
+            return str(ex), 500, CORS_HEADER
+
 
 class DrawD3jsgraph(Resource):
 
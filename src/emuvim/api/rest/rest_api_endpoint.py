@@ -36,7 +36,7 @@ from emuvim.api.rest.compute import ComputeList, Compute, ComputeResources, Data
 
 # need to import total module to set its global variable net
 from emuvim.api.rest import network
-from emuvim.api.rest.network import NetworkAction, DrawD3jsgraph
+from emuvim.api.rest.network import NetworkAction, NetworkQueues, DrawD3jsgraph
 
 from emuvim.api.rest import monitor
 from emuvim.api.rest.monitor import MonitorInterfaceAction, MonitorFlowAction, MonitorLinkAction, MonitorSkewAction, MonitorTerminal
@@ -94,6 +94,9 @@ class RestApiEndpoint(object):
                               "/restapi/network")
         self.api.add_resource(DrawD3jsgraph,
                               "/restapi/network/d3jsgraph")
+        # queues (and their counters) of chains with a rate
+        self.api.add_resource(NetworkQueues,
+                              "/restapi/network/queues")
 
         # monitoring related actions
         # export a network interface traffic rate counter
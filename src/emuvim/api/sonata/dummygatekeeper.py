@@ -196,6 +196,10 @@ class Service(object):
         # build a instances dict (a bit like a NSR :))
         self.instances[instance_uuid] = dict()
         self.instances[instance_uuid]["vnf_instances"] = list()
+        # vlan tags of the E-LANs of this instance (released on stop)
+        self.instances[instance_uuid]["elan_tags"] = list()
+        # chain requests of the E-Lines of this instance (removed on stop)
+        self.instances[instance_uuid]["eline_requests"] = list()
 
         # 2. compute placement of this service instance (adds DC names to
         # VNFDs)
@@ -261,9 +265,17 @@ class Service(object):
         self._trigger_emulator_stop_scripts_in_vnfis(vnf_instances)
         time.sleep(VNF_STOP_WAIT_TIME)
 
+        # remove the E-Lines (and release their tags) while the VNFs and
+        # SAPs are still connected to the switches
+        self._disconnect_elines(instance_uuid)
+
         for v in vnf_instances:
             self._stop_vnfi(v)
 
+        # release the vlan tags of the E-LANs
+        for tag in self.instances[instance_uuid].get("elan_tags", list()):
+            GK.net.removeLAN(tag)
+
         for sap_name in self.saps_ext:
             ext_sap = self.saps[sap_name]
             target_dc = ext_sap.get("dc")
@@ -438,6 +450,7 @@ class Service(object):
             intf = vnfi.intf(intf=if_name)
             if intf is not None:
                 intf.setIP(net_str)
+                vnfi.invalidateNetworkStatus()
                 LOG.debug("Reconfigured network of %s:%s to %r" %
                           (vnfi.name, if_name, net_str))
             else:
@@ -624,6 +637,8 @@ class Service(object):
         # cookie is used as identifier for the flowrules installed by the dummygatekeeper
         # eg. different services get a unique cookie for their flowrules
         cookie = 1
+        # all E-Lines are installed at once
+        chain_requests = list()
         for link in eline_fwd_links:
             # check if we need to deploy this link when its a management link:
             if USE_DOCKER_MGMT:
@@ -695,13 +710,33 @@ class Service(object):
 
             # Set the chaining
             if setChaining:
-                GK.net.setChain(
-                    src_id, dst_id,
+                chain_requests.append(dict(
+                    vnf_src_name=src_id, vnf_dst_name=dst_id,
                     vnf_src_interface=src_if_name, vnf_dst_interface=dst_if_name,
-                    bidirectional=BIDIRECTIONAL_CHAIN, cmd="add-flow", cookie=cookie, priority=10)
+                    bidirectional=BIDIRECTIONAL_CHAIN, cmd="add-flow", cookie=cookie, priority=10))
                 LOG.debug(
                     "Setting up E-Line link. (%s:%s) -> (%s:%s)" % (
                         src_id, src_if_name, dst_id, dst_if_name))
+        if len(chain_requests) > 0:
+            results = GK.net.setChains(chain_requests)
+            for chain_request, result in zip(chain_requests, results):
+                if not result["success"]:
+                    LOG.warning("E-Line setup failed: {}".format(result["message"]))
+                else:
+                    self.instances[instance_uuid]["eline_requests"].append(chain_request)
+
+    def _disconnect_elines(self, instance_uuid):
+        """
+        Remove the E-LINE links of a service instance installed by
+        _connect_elines.
+        :param: instance_uuid of the service
+        """
+        chain_requests = [dict(chain_request, cmd="del-flows") for chain_request in
+                          self.instances[instance_uuid].get("eline_requests", list())]
+        if len(chain_requests) > 0:
+            for result in GK.net.setChains(chain_requests):
+                if not result["success"]:
+                    LOG.warning("E-Line removal failed: {}".format(result["message"]))
 
     def _connect_elans(self, elan_fwd_links, instance_uuid):
         """
@@ -765,7 +800,8 @@ class Service(object):
                         {'name': src_docker_name, 'interface': intf_name})
 
             # install the VLAN tags for this E-LAN
-            GK.net.setLAN(elan_vnf_list)
+            tag = GK.net.setLAN(elan_vnf_list)
+            self.instances[instance_uuid]["elan_tags"].append(tag)
 
     def _load_docker_files(self):
         """
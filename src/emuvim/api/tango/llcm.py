@@ -209,6 +209,10 @@ class Service(object):
         self.instances[instance_uuid]["ssiid"] = self._instance_counter
         self.instances[instance_uuid]["name"] = get_triple_id(self.nsd)
         self.instances[instance_uuid]["vnf_instances"] = list()
+        # vlan tags of the E-LANs of this instance (released on stop)
+        self.instances[instance_uuid]["elan_tags"] = list()
+        # chain requests of the E-Lines of this instance (removed on stop)
+        self.instances[instance_uuid]["eline_requests"] = list()
         self.instances[instance_uuid]["created_at"] = str(datetime.datetime.now())
         # increase for next instance
         self._instance_counter += 1
@@ -260,9 +264,15 @@ class Service(object):
         # completion
         self._trigger_emulator_stop_scripts_in_vnfis(vnf_instances)
         time.sleep(VNF_STOP_WAIT_TIME)
+        # remove the E-Lines (and release their tags) while the VNFs
+        # are still connected to the switches
+        self._disconnect_elines(instance_uuid)
         # stop all vnfs
         for v in vnf_instances:
             self._stop_vnfi(v)
+        # release the vlan tags of the E-LANs
+        for tag in self.instances[instance_uuid].get("elan_tags", list()):
+            GK.net.removeLAN(tag)
         # last step: remove the instance from the list of all instances
         del self.instances[instance_uuid]
 
@@ -519,6 +529,7 @@ class Service(object):
             intf = vnfi.intf(intf=if_name)
             if intf is not None:
                 intf.setIP(net_str)
+                vnfi.invalidateNetworkStatus()
                 LOG.debug("Reconfigured network of %s:%s to %r" %
                           (vnfi.name, if_name, net_str))
             else:
@@ -661,6 +672,8 @@ class Service(object):
         # cookie is used as identifier for the flowrules installed by the dummygatekeeper
         # eg. different services get a unique cookie for their flowrules
         cookie = 1
+        # all E-Lines are installed at once
+        chain_requests = list()
         for link in eline_fwd_links:
             LOG.info("Found E-Line: {}".format(link))
             src_id, src_if_name = parse_interface(
@@ -675,7 +688,7 @@ class Service(object):
             if src_units is None or dst_units is None:
                 LOG.info("No VNF-VNF link. Skipping: src={}, src_if={}, dst={}, dst_if={}"
                          .format(src_id, src_if_name, dst_id, dst_if_name))
-                return
+                break
             # we only support VNFs with one V/CDU right now
             if len(src_units) != 1 or len(dst_units) != 1:
                 raise BaseException("LLCM does not support E-LINES for multi V/CDU VNFs.")
@@ -713,10 +726,30 @@ class Service(object):
                     self._vnf_reconfigure_network(dst_vnfi, dst_if_name, ip2)
             # set the chaining
             if setChaining:
-                GK.net.setChain(
-                    src_id, dst_id,
+                chain_requests.append(dict(
+                    vnf_src_name=src_id, vnf_dst_name=dst_id,
                     vnf_src_interface=src_if_name, vnf_dst_interface=dst_if_name,
-                    bidirectional=BIDIRECTIONAL_CHAIN, cmd="add-flow", cookie=cookie, priority=10)
+                    bidirectional=BIDIRECTIONAL_CHAIN, cmd="add-flow", cookie=cookie, priority=10))
+        if len(chain_requests) > 0:
+            results = GK.net.setChains(chain_requests)
+            for chain_request, result in zip(chain_requests, results):
+                if not result["success"]:
+                    LOG.warning("E-Line setup failed: {}".format(result["message"]))
+                else:
+                    self.instances[instance_uuid]["eline_requests"].append(chain_request)
+
+    def _disconnect_elines(self, instance_uuid):
+        """
+        Remove the E-LINE links of a service instance installed by
+        _connect_elines.
+        :param: instance_uuid of the service
+        """
+        chain_requests = [dict(chain_request, cmd="del-flows") for chain_request in
+                          self.instances[instance_uuid].get("eline_requests", list())]
+        if len(chain_requests) > 0:
+            for result in GK.net.setChains(chain_requests):
+                if not result["success"]:
+                    LOG.warning("E-Line removal failed: {}".format(result["message"]))
 
     def _get_vnfd_cp_from_vnfi(self, vnfi, ifname):
         """
@@ -787,7 +820,8 @@ class Service(object):
                         elan_vnf_list.append(
                             {'name': container_name, 'interface': intf_name})
             # install the VLAN tags for this E-LAN
-            GK.net.setLAN(elan_vnf_list)
+            tag = GK.net.setLAN(elan_vnf_list)
+            self.instances[instance_uuid]["elan_tags"].append(tag)
 
     def _load_docker_files(self):
         """
@@ -0,0 +1,106 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mininet.node import OVSKernelSwitch
+from mininet.link import TCIntf
+from mininet.util import errRun
+
+LOG = logging.getLogger("dcemulator.boot")
+LOG.setLevel(logging.DEBUG)
+
+# max. length of one merged ovs-vsctl call (the kernel limits a single
+# argument, i.e. the command line passed to the shell, to 128 KiB)
+MAX_VSCTL_LENGTH = 100000
+# max. number of switches whose links are configured at the same time
+MAX_BOOT_WORKERS = 16
+
+
+class BatchOVSSwitch(OVSKernelSwitch):
+    """
+    OVS switch that is started together with all other switches of the
+    network: the ovs-vsctl commands of all bridges (del-br/add-br,
+    controllers, fail mode, protocols, dpid and ports) are merged into a
+    few ovs-vsctl calls, i.e. a few OVSDB transactions, and the tc config
+    of the links, which OVS resets when it adds a port, is restored for
+    all switches in parallel.
+
+    Only switches that exist when the network is started can be batched,
+    Mininet.start() calls batchStartup() for them.
+    """
+
+    def __init__(self, name, boot_timings=None, **params):
+        """
+        :param boot_timings: dict the durations of the startup phases are
+                             written to (shared by all switches of a network)
+        """
+        self.boot_timings = boot_timings if boot_timings is not None else {}
+        params['batch'] = True
+        OVSKernelSwitch.__init__(self, name, **params)
+
+    @classmethod
+    def batchStartup(cls, switches, run=errRun):
+        if not switches:
+            return switches
+        timings = switches[0].boot_timings
+
+        start = time.time()
+        calls = 0
+        cmds = ''
+        for switch in switches:
+            for cmd in switch.commands:
+                cmd = cmd.strip()
+                if cmds and len(cmds) + len(cmd) >= MAX_VSCTL_LENGTH:
+                    run('ovs-vsctl' + cmds, shell=True)
+                    calls += 1
+                    cmds = ''
+                cmds += ' ' + cmd
+            switch.commands = []
+            # later vsctl calls of the switch are executed right away
+            switch.batch = False
+        if cmds:
+            run('ovs-vsctl' + cmds, shell=True)
+            calls += 1
+        timings['bridges'] = time.time() - start
+        LOG.info("Created {0} bridges with {1} ovs-vsctl call(s) in {2:.3f}s".format(
+            len(switches), calls, timings['bridges']))
+
+        start = time.time()
+        executor = ThreadPoolExecutor(max_workers=min(MAX_BOOT_WORKERS, len(switches)))
+        try:
+            # each switch runs its commands in its own shell
+            list(executor.map(cls._reapplyLinkConfig, switches))
+        finally:
+            executor.shutdown(wait=True)
+        timings['link_config'] = time.time() - start
+        return switches
+
+    @staticmethod
+    def _reapplyLinkConfig(switch):
+        for intf in switch.intfList():
+            if isinstance(intf, TCIntf):
+                intf.config(**intf.params)
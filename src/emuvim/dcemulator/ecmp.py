@@ -0,0 +1,117 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+from collections import OrderedDict
+from itertools import islice
+import networkx as nx
+
+LOG = logging.getLogger("dcemulator.ecmp")
+LOG.setLevel(logging.DEBUG)
+
+# OpenFlow group ids used for ECMP chains (one id per chain, the same
+# id is used on all switches of the chain)
+GROUP_ID_MIN = 0x10000
+GROUP_ID_MAX = 0xfffff
+# max. number of equal-cost paths used by a single chain
+MAX_ECMP_PATHS = 16
+
+
+def equal_cost_paths(graph, src, dst, weight=None, max_paths=MAX_ECMP_PATHS):
+    """
+    All shortest paths between two switches (at most max_paths).
+    """
+    return list(islice(nx.all_shortest_paths(
+        graph, source=src, target=dst, weight=weight), max_paths))
+
+
+class EcmpDag(object):
+    """
+    The union of the equal-cost paths of a chain: a directed acyclic graph
+    from the source to the destination switch. Parallel links between two
+    switches are separate ports of the same next hop.
+    """
+
+    def __init__(self, graph, paths):
+        """
+        :param graph: DCNetwork_graph (networkx MultiDiGraph)
+        :param paths: list of equal-cost paths (lists of switch names)
+        """
+        self.graph = graph
+        self.paths = paths
+        self.src = paths[0][0]
+        self.dst = paths[0][-1]
+        self.next_hops = OrderedDict()
+        self.prev_hops = OrderedDict()
+        # path (and position in it) each switch is compiled for
+        self.positions = OrderedDict()
+        for path in paths:
+            for i, node in enumerate(path):
+                self.positions.setdefault(node, (path, i))
+                self.next_hops.setdefault(node, [])
+                self.prev_hops.setdefault(node, [])
+                if i < len(path) - 1 and path[i + 1] not in self.next_hops[node]:
+                    self.next_hops[node].append(path[i + 1])
+                if i > 0 and path[i - 1] not in self.prev_hops[node]:
+                    self.prev_hops[node].append(path[i - 1])
+
+    @property
+    def nodes(self):
+        return list(self.positions.keys())
+
+    def out_ports(self, node):
+        """
+        Ports towards all next hops of a switch (one per parallel link).
+        """
+        return [edge['src_port_nr'] for next_hop in self.next_hops[node]
+                for edge in self.graph[node][next_hop].values()]
+
+    def in_ports(self, node):
+        """
+        Ports a switch receives the chain's traffic on (one per parallel link).
+        """
+        return [edge['dst_port_nr'] for prev_hop in self.prev_hops[node]
+                for edge in self.graph[prev_hop][node].values()]
+
+
+def select_group_ryu(dpid, group_id, ports):
+    """
+    Ryu REST payload of a select group that hashes flows over the given ports.
+    """
+    return {
+        'dpid': dpid,
+        'type': 'SELECT',
+        'group_id': group_id,
+        'buckets': [{'weight': 1, 'actions': [{'type': 'OUTPUT', 'port': port}]}
+                    for port in ports]
+    }
+
+
+def select_group_ofctl(group_id, ports):
+    """
+    ovs-ofctl add-group spec of a select group over the given ports.
+    """
+    return '-O OpenFlow13 group_id=%s,type=select,%s' % (
+        group_id, ','.join('bucket=output:%s' % port for port in ports))
@@ -0,0 +1,377 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+LOG = logging.getLogger("dcemulator.flows")
+LOG.setLevel(logging.DEBUG)
+
+# max. number of switches that are programmed in parallel
+MAX_FLOW_WORKERS = 16
+
+# OpenFlow bundles need OpenFlow 1.4
+OFCTL_BUNDLE_PROTOCOL = 'OpenFlow14'
+# flow_mod keywords used in an ovs-ofctl add-flows file
+OFCTL_BUNDLE_COMMANDS = {
+    'add-flow': 'add',
+    'del-flows': 'delete',
+}
+# group commands (ECMP chains), they can not be part of a flow bundle
+OFCTL_GROUP_COMMANDS = ['add-group', 'del-groups']
+
+
+class FlowEntry(object):
+    """
+    A single compiled flow entry for one hop of a chain.
+    Holds everything needed to push it to the switch later on:
+    the Ryu REST payload (or the ovs-ofctl command) and the
+    OVS port tags that have to be set before.
+    """
+
+    def __init__(self, switch, cmd, prefix=None, flow=None, ofcmd=None,
+                 vlan_ports=None, cookie=None, wait=False):
+        self.switch = switch  # switch node object
+        self.cmd = cmd  # 'add-flow' or 'del-flows'
+        self.cookie = cookie  # OpenFlow cookie of the entry (if any)
+        # later entries of the switch depend on this one (e.g. a group),
+        # so it has to be applied before they are pushed
+        self.wait = wait
+        self.prefix = prefix  # Ryu REST prefix, e.g. stats/flowentry/add
+        self.flow = flow  # Ryu REST payload
+        self.ofcmd = ofcmd  # ovs-ofctl flow string (dpctl backend)
+        # list of (port_name, tag) tuples to be set in the ovs instance
+        self.vlan_ports = vlan_ports if vlan_ports is not None else []
+        # set by the chain compiler
+        self.chain = None
+        self.hop = None
+        # set when the entry is pushed
+        self.status = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "chain": self.chain,
+            "hop": self.hop,
+            "switch": self.switch.name,
+            "cmd": self.cmd,
+            "status": self.status,
+            "error": self.error
+        }
+
+
+class FlowBatch(object):
+    """
+    Collects the compiled flow entries of one or more chains.
+    Entries are pushed per switch (in the order they were added)
+    so that all switches of a batch can be programmed in parallel.
+    """
+
+    def __init__(self):
+        self.entries = []
+        # one result message per compiled chain
+        self.messages = []
+
+    def add(self, entry, chain=None, hop=None):
+        entry.chain = chain
+        entry.hop = hop
+        self.entries.append(entry)
+        return entry
+
+    def per_switch(self):
+        """
+        Group the entries by switch name, keeping their order.
+        :return: OrderedDict switch name -> list of FlowEntry
+        """
+        switches = OrderedDict()
+        for entry in self.entries:
+            switches.setdefault(entry.switch.name, []).append(entry)
+        return switches
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FlowBatchResult(object):
+    """
+    Outcome of a pushed FlowBatch, lists the result of every hop.
+    """
+
+    def __init__(self, batch, duration):
+        self.entries = batch.entries
+        self.messages = batch.messages
+        self.duration = duration
+
+    @property
+    def hops(self):
+        return [e.to_dict() for e in self.entries]
+
+    @property
+    def failed(self):
+        return [e for e in self.entries if e.status != 'ok']
+
+    @property
+    def success(self):
+        return len(self.failed) == 0
+
+    def to_dict(self):
+        return {
+            "success": self.success,
+            "duration": self.duration,
+            "messages": self.messages,
+            "hops": self.hops
+        }
+
+    def __str__(self):
+        lines = list(self.messages)
+        for e in self.failed:
+            lines.append("failed: {0} hop {1} on {2}: {3}".format(
+                e.chain, e.hop, e.switch.name, e.error))
+        return '\n'.join(lines)
+
+
+def apply_flow_batch(batch, push, executor, push_bundle=None):
+    """
+    Push all entries of a batch. Each switch is handled by a single worker
+    (entries of one switch are submitted in order), different switches in parallel.
+    :param batch: FlowBatch
+    :param push: function that pushes a single FlowEntry, raises on error.
+                 It may return a Future instead of waiting for the switch,
+                 the worker collects all of them before it finishes.
+    :param executor: concurrent.futures executor to run the workers
+    :param push_bundle: function that pushes all ovs-ofctl entries of one
+                        switch at once (switch, entries), raises on error
+    :return: FlowBatchResult
+    """
+    start = time.time()
+
+    def _failed(entry, ex):
+        entry.status = 'error'
+        entry.error = str(ex)
+        LOG.warning("Flow entry {0} hop {1} failed on {2}: {3}".format(
+            entry.chain, entry.hop, entry.switch.name, ex))
+
+    def _program_switch(entries):
+        pending = []
+        if push_bundle is not None:
+            ofctl_entries = [e for e in entries if e.flow is None]
+            entries = [e for e in entries if e.flow is not None]
+            if ofctl_entries:
+                try:
+                    push_bundle(ofctl_entries[0].switch, ofctl_entries)
+                    for entry in ofctl_entries:
+                        entry.status = 'ok'
+                except Exception as ex:
+                    for entry in ofctl_entries:
+                        _failed(entry, ex)
+        for entry in entries:
+            try:
+                ret = push(entry)
+            except Exception as ex:
+                _failed(entry, ex)
+                continue
+            if isinstance(ret, Future) and entry.wait:
+                try:
+                    ret.result()
+                    entry.status = 'ok'
+                except Exception as ex:
+                    _failed(entry, ex)
+            elif isinstance(ret, Future):
+                pending.append((entry, ret))
+            else:
+                entry.status = 'ok'
+        for entry, future in pending:
+            try:
+                future.result()
+                entry.status = 'ok'
+            except Exception as ex:
+                _failed(entry, ex)
+
+    # consume the iterator to wait for all workers
+    list(executor.map(_program_switch, batch.per_switch().values()))
+    result = FlowBatchResult(batch, time.time() - start)
+    LOG.debug("Pushed {0} flow entries to {1} switches in {2:.3f}s".format(
+        len(batch), len(batch.per_switch()), result.duration))
+    return result
+
+
+class CookieIndex(object):
+    """
+    Remembers which switches (dpids) received flow entries with a cookie,
+    so that flows can be deleted by cookie on these switches only
+    instead of on every switch of the topology.
+    """
+
+    def __init__(self):
+        self._dpids = {}  # cookie -> set of dpids
+        self._lock = threading.Lock()
+
+    def add(self, cookie, dpid):
+        if not cookie:
+            return
+        with self._lock:
+            self._dpids.setdefault(int(cookie), set()).add(int(dpid))
+
+    def dpids(self, cookie):
+        """
+        :return: sorted list of dpids with flows of this cookie
+        """
+        with self._lock:
+            return sorted(self._dpids.get(int(cookie), set()))
+
+    def pop(self, cookie):
+        """
+        Forget a cookie (after its flows were deleted).
+        :return: sorted list of dpids with flows of this cookie
+        """
+        with self._lock:
+            return sorted(self._dpids.pop(int(cookie), set()))
+
+    def __contains__(self, cookie):
+        with self._lock:
+            return int(cookie) in self._dpids
+
+    def __len__(self):
+        with self._lock:
+            return len(self._dpids)
+
+
+def ofctl_cookie(ofcmd):
+    """
+    Cookie of an ovs-ofctl flow spec, None if it has no (or a masked) cookie.
+    """
+    m = re.search(r'cookie=(\w+)(?=,|"|\s|$)', ofcmd)
+    if m is None:
+        return None
+    try:
+        return int(m.group(1), 0)
+    except ValueError:
+        return None
+
+
+def ofctl_bundle_line(cmd, ofcmd):
+    """
+    Turn an ovs-ofctl command into a line of an add-flows file.
+    :param cmd: 'add-flow' or 'del-flows'
+    :param ofcmd: flow spec as given to ovs-ofctl, may contain options
+                  (e.g. -O OpenFlow13) and shell quotes
+    """
+    flow = re.sub(r'-O\s*\S+\s+', '', ofcmd.strip())
+    flow = flow.strip().strip('"')
+    command = OFCTL_BUNDLE_COMMANDS[cmd]
+    if cmd == 'del-flows':
+        # a cookie without mask would mean 'set cookie', which is not
+        # allowed for deletions: match the complete cookie instead
+        flow = re.sub(r'cookie=(\w+)(?=,|$)', r'cookie=\1/-1', flow)
+        if flow.startswith('--strict'):
+            command = 'delete_strict'
+            flow = flow[len('--strict'):].strip()
+    return '{0} {1}'.format(command, flow)
+
+
+def push_ofctl_bundle(switch, lines):
+    """
+    Apply all flow_mods for a switch atomically with a single
+    ovs-ofctl --bundle add-flows call (one process per switch).
+    Raises an exception if the switch rejects the bundle, in this case
+    none of the flow_mods is applied.
+    :param switch: switch node object
+    :param lines: list of add-flows file lines (see ofctl_bundle_line)
+    """
+    if not lines:
+        return
+    f = tempfile.NamedTemporaryFile(
+        mode='w', prefix='bundle-%s-' % switch.name, suffix='.flows', delete=False)
+    try:
+        f.write('\n'.join(lines) + '\n')
+        f.close()
+        out = switch.dpctl('-O %s --bundle add-flows' % OFCTL_BUNDLE_PROTOCOL, f.name)
+    finally:
+        os.remove(f.name)
+    if out and ('ovs-ofctl:' in out or 'OFPT_ERROR' in out):
+        raise Exception(out.strip())
+    LOG.debug("Bundle of {0} flow_mods applied to {1}".format(
+        len(lines), switch.name))
+
+
+class OfctlBundle(object):
+    """
+    Collects ovs-ofctl flow_mods per switch, e.g. all rules of a
+    load balancer, and applies them with one bundle per switch.
+    """
+
+    def __init__(self, use_bundles=True, cookie_index=None):
+        """
+        :param use_bundles: if False, fall back to one ovs-ofctl call per flow_mod
+        :param cookie_index: CookieIndex that records the switches of added flows
+        """
+        self.use_bundles = use_bundles
+        self.cookie_index = cookie_index
+        # switch name -> (switch, list of (cmd, ofcmd))
+        self.switches = OrderedDict()
+
+    def add(self, switch, ofcmd, cmd='add-flow'):
+        if self.cookie_index is not None and cmd == 'add-flow':
+            self.cookie_index.add(ofctl_cookie(ofcmd), int(switch.dpid, 16))
+        self.switches.setdefault(switch.name, (switch, []))[1].append(
+            (cmd, ofcmd))
+
+    def apply(self, executor=None):
+        """
+        Push the bundles of all switches, in parallel if an executor is given.
+        Raises the first error after all switches were handled.
+        """
+        bundles = list(self.switches.values())
+        if executor is None:
+            results = [self._apply_switch(b) for b in bundles]
+        else:
+            results = list(executor.map(self._apply_switch, bundles))
+        self.switches.clear()
+        errors = [r for r in results if r is not None]
+        if errors:
+            raise errors[0]
+
+    def _apply_switch(self, bundle):
+        switch, flow_mods = bundle
+        try:
+            if self.use_bundles:
+                push_ofctl_bundle(
+                    switch, [ofctl_bundle_line(cmd, ofcmd) for cmd, ofcmd in flow_mods])
+            else:
+                for cmd, ofcmd in flow_mods:
+                    switch.dpctl('%s -OOpenFlow13' % cmd, ofcmd)
+        except Exception as ex:
+            LOG.warning("Flow_mods for {0} failed: {1}".format(switch.name, ex))
+            return ex
+        return None
+
+    def __len__(self):
+        return sum(len(flow_mods) for _, flow_mods in self.switches.values())
@@ -0,0 +1,239 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+
+LOG = logging.getLogger("dcemulator.labels")
+LOG.setLevel(logging.DEBUG)
+
+# usable 802.1Q VLAN ids
+VLAN_MIN = 1
+VLAN_MAX = 4094
+
+
+class TagPoolExhausted(Exception):
+    """
+    Raised if no free tag is left in a TagAllocator.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class TagAllocator(object):
+    """
+    Bitmap allocator for path isolation tags (VLAN ids by default).
+    One bit per tag marks it as used, an owner is recorded for every
+    allocated tag. Allocation and release are O(1): tags are handed out
+    from a stack of released tags first and from a high-water mark
+    afterwards.
+    """
+
+    def __init__(self, first=VLAN_MIN, last=VLAN_MAX):
+        self.first = first
+        self.last = last
+        self._bitmap = bytearray((last - first) // 8 + 1)
+        self._owners = dict()
+        # tags that were released and can be re-used
+        self._released = []
+        # all tags above this one were never handed out
+        self._next = first
+        self._lock = threading.Lock()
+
+    def _is_set(self, tag):
+        i = tag - self.first
+        return bool(self._bitmap[i >> 3] & (1 << (i & 7)))
+
+    def _set(self, tag, used):
+        i = tag - self.first
+        if used:
+            self._bitmap[i >> 3] |= (1 << (i & 7))
+        else:
+            self._bitmap[i >> 3] &= ~(1 << (i & 7)) & 0xff
+
+    def allocate(self, owner=None):
+        """
+        Get a free tag.
+        :param owner: anything that identifies the user of this tag
+        :return: tag (int)
+        """
+        with self._lock:
+            tag = None
+            while self._released:
+                candidate = self._released.pop()
+                # skip tags that got reserved explicitly in the meantime
+                if not self._is_set(candidate):
+                    tag = candidate
+                    break
+            while tag is None and self._next <= self.last:
+                if not self._is_set(self._next):
+                    tag = self._next
+                self._next += 1
+            if tag is None:
+                raise TagPoolExhausted(
+                    "No free tag left in range {0}-{1}".format(self.first, self.last))
+            self._set(tag, True)
+            self._owners[tag] = owner
+            return tag
+
+    def reserve(self, tag, owner=None):
+        """
+        Mark a pre-defined tag as used.
+        :return: True if the tag was free before
+        """
+        with self._lock:
+            if tag < self.first or tag > self.last or self._is_set(tag):
+                return False
+            self._set(tag, True)
+            self._owners[tag] = owner
+            return True
+
+    def free(self, tag, owner=None):
+        """
+        Release a tag so that it can be re-used.
+        :param owner: if given, the tag is only released if it belongs to this owner
+        :return: True if the tag was released
+        """
+        with self._lock:
+            if tag is None or tag < self.first or tag > self.last \
+                    or not self._is_set(tag):
+                return False
+            if owner is not None and self._owners.get(tag) != owner:
+                return False
+            self._set(tag, False)
+            del self._owners[tag]
+            self._released.append(tag)
+            return True
+
+    def owner(self, tag):
+        return self._owners.get(tag)
+
+    def is_used(self, tag):
+        return self.first <= tag <= self.last and self._is_set(tag)
+
+    @property
+    def size(self):
+        return self.last - self.first + 1
+
+    def __len__(self):
+        """
+        Number of allocated tags.
+        """
+        return len(self._owners)
+
+
+# label modes used to isolate chains from each other
+LABEL_MODE_VLAN = 'vlan'
+LABEL_MODE_MPLS = 'mpls'
+LABEL_MODES = [LABEL_MODE_VLAN, LABEL_MODE_MPLS]
+
+# MPLS labels 0-15 are reserved
+MPLS_LABEL_MIN = 16
+MPLS_LABEL_MAX = 2 ** 20 - 1
+ETH_TYPE_MPLS = 0x8847
+# an MPLS header does not carry the ethertype of its payload, so we encode
+# it in the traffic class bits to be able to restore it at the last switch
+MPLS_PAYLOAD_TC = {
+    0x0800: 0,  # IPv4
+    0x0806: 1,  # ARP
+    0x86dd: 2,  # IPv6
+}
+
+
+def create_label_allocator(label_mode):
+    """
+    Get a TagAllocator covering the label space of the given mode.
+    """
+    if label_mode == LABEL_MODE_VLAN:
+        return TagAllocator(VLAN_MIN, VLAN_MAX)
+    if label_mode == LABEL_MODE_MPLS:
+        return TagAllocator(MPLS_LABEL_MIN, MPLS_LABEL_MAX)
+    raise Exception("Unknown label mode: {0}. Use one of {1}".format(
+        label_mode, LABEL_MODES))
+
+
+def mpls_payload_types(match=None):
+    """
+    Ethertypes an MPLS chain has to carry: the one given in the custom
+    match (dl_type/eth_type) or all supported ones.
+    :param match: custom match string, e.g. 'dl_type=0x0800,nw_proto=6'
+    :return: list of ethertypes
+    """
+    for m in (match or '').split(','):
+        kv = m.split('=')
+        if len(kv) == 2 and kv[0].strip() in ['dl_type', 'eth_type']:
+            eth_type = int(kv[1], 0)
+            if eth_type not in MPLS_PAYLOAD_TC:
+                raise Exception(
+                    "ethertype {0} can not be carried over MPLS chains".format(kv[1]))
+            return [eth_type]
+    return sorted(MPLS_PAYLOAD_TC)
+
+
+def mpls_match(label, eth_type=None):
+    """
+    Match string for MPLS labeled packets.
+    :param eth_type: match only packets that carry this payload type
+    """
+    match = 'dl_type={0},mpls_label={1}'.format(hex(ETH_TYPE_MPLS), label)
+    if eth_type is not None:
+        match += ',mpls_tc={0}'.format(MPLS_PAYLOAD_TC[eth_type])
+    return match
+
+
+def mpls_push_actions(label, eth_type):
+    """
+    Ryu REST actions to put a packet of the given type onto an MPLS chain.
+    """
+    return [{'type': 'PUSH_MPLS', 'ethertype': ETH_TYPE_MPLS},
+            {'type': 'SET_FIELD', 'field': 'mpls_label', 'value': label},
+            {'type': 'SET_FIELD', 'field': 'mpls_tc',
+             'value': MPLS_PAYLOAD_TC[eth_type]}]
+
+
+def mpls_pop_actions(eth_type):
+    """
+    Ryu REST actions to take a packet of the given type off an MPLS chain.
+    """
+    return [{'type': 'POP_MPLS', 'ethertype': eth_type}]
+
+
+def mpls_push_ofctl(label, eth_type):
+    """
+    ovs-ofctl version of mpls_push_actions.
+    """
+    return 'push_mpls:{0},set_field:{1}->mpls_label,set_field:{2}->mpls_tc'.format(
+        hex(ETH_TYPE_MPLS), label, MPLS_PAYLOAD_TC[eth_type])
+
+
+def mpls_pop_ofctl(eth_type):
+    """
+    ovs-ofctl version of mpls_pop_actions.
+    """
+    return 'pop_mpls:{0}'.format('0x%04x' % eth_type)
@@ -23,3 +23,313 @@
 # the Horizon 2020 and 5G-PPP programmes. The authors would like to
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.sonata-nfv.eu).
+import logging
+import re
+import socket
+import threading
+from mininet.link import Link, Intf, TCIntf
+from mininet.util import makeIntfPair
+
+try:
+    from pyroute2 import IPRoute, NetNS
+    from pyroute2.netlink.exceptions import NetlinkError
+    NETLINK_AVAILABLE = True
+except ImportError:
+    NetlinkError = OSError
+    NETLINK_AVAILABLE = False
+
+LOG = logging.getLogger("dcemulator.link")
+LOG.setLevel(logging.DEBUG)
+
+# TCIntf options that are only supported by the tc command line
+TC_SHELL_PARAMS = ['gro', 'txo', 'rxo', 'speedup', 'use_hfsc', 'use_tbf',
+                   'latency_ms', 'enable_ecn', 'enable_red']
+# qdisc handles, the same as TCIntf uses (5:0 htb, 5:1 htb class, 10: netem)
+HTB_HANDLE = 0x50000
+HTB_CLASS = 0x50001
+NETEM_HANDLE = 0x100000
+HTB_BURST = 15 * 1024
+
+TIME_UNITS = {'': 1, 'us': 1, 'usec': 1, 'ms': 1000, 'msec': 1000, 's': 1000000, 'sec': 1000000}
+
+
+def time_usec(value):
+    """
+    Convert a tc time ('10ms', '5us', '1s', numbers are usec) to usec.
+    """
+    match = re.match(r'^\s*([0-9]*\.?[0-9]+)\s*([a-z]*)\s*$', str(value))
+    if match is None or match.group(2) not in TIME_UNITS:
+        raise ValueError("Invalid time: {0}".format(value))
+    return int(float(match.group(1)) * TIME_UNITS[match.group(2)])
+
+
+class NetlinkSockets(object):
+    """
+    Open netlink sockets (pyroute2) of the network namespaces of the
+    nodes, so that a link operation is a few netlink messages instead
+    of one ip/tc process per command. Nodes that are not in a namespace
+    (e.g. the OVS switches) share the socket of the root namespace.
+    pyroute2 sockets are not thread-safe, all requests are serialized.
+    """
+
+    def __init__(self):
+        # pid of the namespace (None: root namespace) -> socket
+        self._sockets = {}
+        self._lock = threading.RLock()
+
+    def run(self, node, func):
+        """
+        Call func(socket) with the socket of the namespace of a node.
+        """
+        key = node.pid if node.inNamespace else None
+        with self._lock:
+            ipr = self._sockets.get(key)
+            if ipr is None:
+                if key is None:
+                    ipr = IPRoute()
+                else:
+                    ipr = NetNS('/proc/{0}/ns/net'.format(key))
+                self._sockets[key] = ipr
+            return func(ipr)
+
+    def close(self, node=None):
+        """
+        Close the socket of the namespace of a node (None: all sockets).
+        """
+        with self._lock:
+            if node is None:
+                keys = list(self._sockets.keys())
+            elif node.inNamespace:
+                keys = [node.pid]
+            else:
+                keys = []
+            for key in keys:
+                ipr = self._sockets.pop(key, None)
+                if ipr is not None:
+                    ipr.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sockets)
+
+
+# shared by all links, Mininet creates links without a reference to the network
+NETLINK = NetlinkSockets()
+
+
+def link_index(ipr, name):
+    indexes = ipr.link_lookup(ifname=name)
+    if not indexes:
+        raise NetlinkError(19, "No such device: {0}".format(name))
+    return indexes[0]
+
+
+def make_veth_pair(intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
+                   deleteIntfs=True):
+    """
+    Create a veth pair with one end in the namespace of each node
+    (replacement of mininet.util.makeIntfPair).
+    """
+    if node1 is None or node2 is None:
+        return makeIntfPair(intf1, intf2, addr1, addr2, node1, node2,
+                            deleteIntfs=deleteIntfs)
+    if deleteIntfs:
+        for node, name in [(node1, intf1), (node2, intf2)]:
+            try:
+                NETLINK.run(node, lambda ipr: ipr.link('del', index=link_index(ipr, name)))
+            except NetlinkError:
+                pass
+    peer = {'ifname': intf2, 'net_ns_pid': node2.pid}
+    kwargs = {}
+    if addr1 is not None:
+        kwargs['address'] = addr1
+    if addr2 is not None:
+        peer['address'] = addr2
+    try:
+        NETLINK.run(node1, lambda ipr: ipr.link(
+            'add', ifname=intf1, kind='veth', peer=peer, **kwargs))
+    except NetlinkError as ex:
+        raise Exception("Error creating interface pair ({0},{1}): {2}".format(
+            intf1, intf2, ex))
+
+
+def interface_status(node, names):
+    """
+    Read the state of the interfaces of a node from the kernel: one link
+    and one address dump of its namespace (the root namespace is not
+    dumped, its interfaces are requested one by one).
+    :param names: interface names
+    :return: dict interface name -> {ip, prefixlen, mac, up},
+             missing interfaces are left out
+    """
+    def read(ipr):
+        if node.inNamespace:
+            links = ipr.get_links()
+            addrs = ipr.get_addr(family=socket.AF_INET)
+        else:
+            links, addrs = [], []
+            for name in names:
+                indexes = ipr.link_lookup(ifname=name)
+                if indexes:
+                    links += ipr.get_links(indexes[0])
+                    addrs += ipr.get_addr(family=socket.AF_INET, index=indexes[0])
+        status = {}
+        by_index = {}
+        for link in links:
+            name = link.get_attr('IFLA_IFNAME')
+            if name not in names:
+                continue
+            status[name] = {'ip': None, 'prefixlen': None,
+                            'mac': link.get_attr('IFLA_ADDRESS'),
+                            # IFF_UP
+                            'up': bool(link['flags'] & 1)}
+            by_index[link['index']] = status[name]
+        for addr in addrs:
+            intf = by_index.get(addr['index'])
+            # the first IPv4 address, like Intf.IP()
+            if intf is not None and intf['ip'] is None:
+                intf['ip'] = addr.get_attr('IFA_ADDRESS')
+                intf['prefixlen'] = addr['prefixlen']
+        return status
+    return NETLINK.run(node, read)
+
+
+def invalidate_network_status(node):
+    """
+    Drop the cached network status of a node (if it keeps one).
+    """
+    invalidate = getattr(node, 'invalidateNetworkStatus', None)
+    if invalidate is not None:
+        invalidate()
+
+
+class NetlinkIntf(Intf):
+    """
+    Interface whose address, MAC and state are configured over netlink.
+    """
+
+    def _netlink(self, func):
+        return NETLINK.run(self.node, lambda ipr: func(ipr, link_index(ipr, self.name)))
+
+    def setIP(self, ipstr, prefixLen=None):
+        if '/' in ipstr:
+            self.ip, self.prefixLen = ipstr.split('/')
+        else:
+            if prefixLen is None:
+                raise Exception('No prefix length set for IP address %s'
+                                % (ipstr, ))
+            self.ip, self.prefixLen = ipstr, prefixLen
+
+        def set_ip(ipr, index):
+            # like ifconfig: replace the IPv4 address and bring the interface up
+            ipr.flush_addr(index=index, family=2)
+            ipr.addr('add', index=index, address=self.ip, prefixlen=int(self.prefixLen))
+            ipr.link('set', index=index, state='up')
+        self._netlink(set_ip)
+        invalidate_network_status(self.node)
+        return ''
+
+    def setMAC(self, macstr):
+        self.mac = macstr
+
+        def set_mac(ipr, index):
+            ipr.link('set', index=index, state='down')
+            ipr.link('set', index=index, address=macstr)
+            ipr.link('set', index=index, state='up')
+        self._netlink(set_mac)
+        invalidate_network_status(self.node)
+        return ''
+
+    def isUp(self, setUp=False):
+        if setUp:
+            self._netlink(lambda ipr, index: ipr.link('set', index=index, state='up'))
+            return True
+        links = self._netlink(lambda ipr, index: ipr.get_links(index))
+        # IFF_UP
+        return bool(links) and bool(links[0]['flags'] & 1)
+
+    def delete(self):
+        try:
+            self._netlink(lambda ipr, index: ipr.link('del', index=index))
+        except NetlinkError:
+            # already removed together with its peer
+            pass
+        self.node.delIntf(self)
+        self.link = None
+
+
+class NetlinkTCIntf(NetlinkIntf, TCIntf):
+    """
+    NetlinkIntf with the bw/delay/jitter/loss/max_queue_size options of
+    TCIntf, installed over netlink with the same qdisc layout (htb root
+    5:0 with class 5:1, netem 10: below it or as root).
+    The other TCIntf options are applied with tc.
+    """
+
+    def config(self, bw=None, delay=None, jitter=None, loss=None,
+               max_queue_size=None, **params):
+        if any(params.get(p) is not None for p in TC_SHELL_PARAMS):
+            return TCIntf.config(self, bw=bw, delay=delay, jitter=jitter, loss=loss,
+                                 max_queue_size=max_queue_size, **params)
+        result = Intf.config(self, **params)
+        if bw is None and not delay and not loss and max_queue_size is None:
+            return result
+
+        def set_tc(ipr, index):
+            # replace an existing config (e.g. after OVS added the port)
+            try:
+                ipr.tc('del', index=index, handle=0, parent=0xffffffff)
+            except NetlinkError:
+                pass
+            parent = 0xffffffff
+            if bw is not None:
+                ipr.tc('add', kind='htb', index=index, handle=HTB_HANDLE, default=1)
+                ipr.tc('add-class', kind='htb', index=index, handle=HTB_CLASS,
+                       parent=HTB_HANDLE, rate='{0}kbit'.format(int(float(bw) * 1000)),
+                       burst=HTB_BURST)
+                parent = HTB_CLASS
+            if delay or jitter or loss or max_queue_size is not None:
+                netem = {}
+                if delay:
+                    netem['delay'] = time_usec(delay)
+                if jitter:
+                    netem['jitter'] = time_usec(jitter)
+                if loss:
+                    netem['loss'] = float(loss)
+                if max_queue_size is not None:
+                    netem['limit'] = int(max_queue_size)
+                ipr.tc('add', kind='netem', index=index, handle=NETEM_HANDLE,
+                       parent=parent, **netem)
+        self._netlink(set_tc)
+        LOG.debug("tc config of {0}: bw={1} delay={2} jitter={3} loss={4} queue={5}".format(
+            self.name, bw, delay, jitter, loss, max_queue_size))
+        return result
+
+
+class NetlinkLink(Link):
+    """
+    Link whose veth pair is created directly in the namespaces of its
+    nodes over netlink (needs pyroute2).
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('cls1', NetlinkIntf)
+        kwargs.setdefault('cls2', NetlinkIntf)
+        Link.__init__(self, *args, **kwargs)
+
+    @staticmethod
+    def makeIntfPair(intfname1, intfname2, addr1=None, addr2=None,
+                     node1=None, node2=None, deleteIntfs=True):
+        return make_veth_pair(intfname1, intfname2, addr1, addr2, node1, node2,
+                              deleteIntfs=deleteIntfs)
+
+
+class NetlinkTCLink(NetlinkLink):
+    """
+    NetlinkLink with the traffic control options of TCLink.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('cls1', NetlinkTCIntf)
+        kwargs.setdefault('cls2', NetlinkTCIntf)
+        NetlinkLink.__init__(self, *args, **kwargs)
@@ -0,0 +1,158 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+import time
+
+LOG = logging.getLogger("dcemulator.loadaware")
+LOG.setLevel(logging.DEBUG)
+
+# seconds between two port stats polls (and rebalancing runs)
+DEFAULT_LOAD_INTERVAL = 5
+# max. number of chains moved to another path per rebalancing run
+DEFAULT_MAX_REROUTES = 2
+# links above this utilization are hot, chains are moved away from them
+DEFAULT_HOT_THRESHOLD = 0.8
+# weight of the EWMA (0..1), higher values follow rate changes faster
+EWMA_ALPHA = 0.3
+# capacity assumed for links without a bw attribute (Mbit/s)
+LOAD_REFERENCE_MBPS = 1000.0
+# path cost of a fully utilized link, in hops
+LOAD_WEIGHT = 10.0
+
+
+class LinkLoad(object):
+    """
+    EWMA tx rates of switch ports, computed from Ryu port stats.
+    """
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self._last = dict()  # (dpid, port_no) -> (tx_bytes, timestamp)
+        self._rates = dict()  # (dpid, port_no) -> bytes/s
+        self._lock = threading.Lock()
+
+    def update(self, dpid, reply, timestamp=None):
+        """
+        Update the rates with a stats/port reply of a switch.
+        :param dpid: dpid of the switch (int)
+        :param reply: decoded Ryu reply {"<dpid>": [{port_no, tx_bytes, ...}]}
+        """
+        if not isinstance(reply, dict):
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for port in reply.get(str(dpid), []):
+                key = (int(dpid), port.get('port_no'))
+                tx_bytes = port.get('tx_bytes', 0)
+                last = self._last.get(key)
+                self._last[key] = (tx_bytes, timestamp)
+                if last is None or timestamp <= last[1] or tx_bytes < last[0]:
+                    # first sample or counter reset
+                    continue
+                rate = (tx_bytes - last[0]) / float(timestamp - last[1])
+                old = self._rates.get(key)
+                if old is None:
+                    self._rates[key] = rate
+                else:
+                    self._rates[key] = self.alpha * rate + (1 - self.alpha) * old
+
+    def rate(self, dpid, port_no):
+        """
+        EWMA tx rate of a port in Mbit/s.
+        """
+        with self._lock:
+            return self._rates.get((int(dpid), port_no), 0.0) * 8 / 1e6
+
+    def utilization(self, dpid, port_no, capacity=None):
+        """
+        :param capacity: link capacity in Mbit/s (default: LOAD_REFERENCE_MBPS)
+        :return: utilization of the link behind a port (0..1, can exceed 1)
+        """
+        if not capacity:
+            capacity = LOAD_REFERENCE_MBPS
+        return self.rate(dpid, port_no) / capacity
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rates)
+
+
+class LoadPoller(object):
+    """
+    Polls the port stats of all switches via Ryu to update a LinkLoad and
+    lets the network move chains off hot links after every poll.
+    """
+
+    def __init__(self, net, interval=DEFAULT_LOAD_INTERVAL,
+                 max_reroutes=DEFAULT_MAX_REROUTES, rebalance=True):
+        """
+        :param net: DCNetwork
+        :param interval: seconds between two polls
+        :param max_reroutes: max. number of chains moved per interval
+        :param rebalance: move chains, otherwise only the rates are updated
+        """
+        self.net = net
+        self.interval = interval
+        self.max_reroutes = max_reroutes
+        self.rebalance = rebalance
+        self.reroutes = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if not self.interval or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def poll(self):
+        dpids = [int(sw.dpid, 16) for sw in self.net.switches]
+        now = time.time()
+        replies = self.net.ryu_REST_batch(
+            [{'prefix': 'stats/port', 'dpid': dpid} for dpid in dpids])
+        for dpid, reply in zip(dpids, replies):
+            self.net.link_load.update(dpid, reply, timestamp=now)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                if self.rebalance:
+                    self.reroutes += self.net.rebalanceChains(
+                        max_reroutes=self.max_reroutes)
+            except Exception as ex:
+                LOG.warning("Load poll failed: {0}".format(ex))
@@ -112,26 +112,18 @@ class DCNetworkMonitor():
 
         flow_metric = {}
 
-        # check if port is specified (vnf:port)
-        if vnf_interface is None:
-            # take first interface by default
-            connected_sw = self.net.DCNetwork_graph.neighbors(vnf_name)[0]
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            vnf_interface = link_dict[0]['src_port_id']
+        # check if port is specified (vnf:port), else take first interface
+        vnf_switch = None
+        port = self.net.getConnectedSwitchPort(vnf_name, vnf_interface)
+        if port is not None:
+            if vnf_interface is None:
+                vnf_interface = port.intf_id
+            vnf_switch = port.switch
+            flow_metric['mon_port'] = port.port_nr
 
         flow_metric['vnf_name'] = vnf_name
         flow_metric['vnf_interface'] = vnf_interface
 
-        vnf_switch = None
-        for connected_sw in self.net.DCNetwork_graph.neighbors(vnf_name):
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            for link in link_dict:
-                if link_dict[link]['src_port_id'] == vnf_interface:
-                    # found the right link and connected switch
-                    vnf_switch = connected_sw
-                    flow_metric['mon_port'] = link_dict[link]['dst_port_nr']
-                    break
-
         if not vnf_switch:
             logging.exception("vnf switch of {0}:{1} not found!".format(
                 vnf_name, vnf_interface))
@@ -175,9 +167,9 @@ class DCNetworkMonitor():
         # check if port is specified (vnf:port)
         if vnf_interface is None and metric is not None:
             # take first interface by default
-            connected_sw = self.net.DCNetwork_graph.neighbors(vnf_name)[0]
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            vnf_interface = link_dict[0]['src_port_id']
+            port = self.net.getConnectedSwitchPort(vnf_name)
+            if port is not None:
+                vnf_interface = port.intf_id
 
         for flow_dict in self.flow_metrics:
             if flow_dict['vnf_name'] == vnf_name and flow_dict['vnf_interface'] == vnf_interface \
@@ -211,24 +203,20 @@ class DCNetworkMonitor():
 
         network_metric = {}
 
-        # check if port is specified (vnf:port)
-        if vnf_interface is None or vnf_interface == '':
-            # take first interface by default
-            connected_sw = self.net.DCNetwork_graph.neighbors(vnf_name)[0]
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            vnf_interface = link_dict[0]['src_port_id']
+        # check if port is specified (vnf:port), else take first interface
+        if vnf_interface == '':
+            vnf_interface = None
+        vnf_switch = None
+        port = self.net.getConnectedSwitchPort(vnf_name, vnf_interface)
+        if port is not None:
+            if vnf_interface is None:
+                vnf_interface = port.intf_id
+            vnf_switch = port.switch
+            network_metric['mon_port'] = port.port_nr
 
         network_metric['vnf_name'] = vnf_name
         network_metric['vnf_interface'] = vnf_interface
 
-        for connected_sw in self.net.DCNetwork_graph.neighbors(vnf_name):
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            for link in link_dict:
-                if link_dict[link]['src_port_id'] == vnf_interface:
-                    # found the right link and connected switch
-                    network_metric['mon_port'] = link_dict[link]['dst_port_nr']
-                    break
-
         if 'mon_port' not in network_metric:
             logging.exception("vnf interface {0}:{1} not found!".format(
                 vnf_name, vnf_interface))
@@ -281,9 +269,9 @@ class DCNetworkMonitor():
         # check if port is specified (vnf:port)
         if vnf_interface is None and metric is not None:
             # take first interface by default
-            connected_sw = self.net.DCNetwork_graph.neighbors(vnf_name)[0]
-            link_dict = self.net.DCNetwork_graph[vnf_name][connected_sw]
-            vnf_interface = link_dict[0]['src_port_id']
+            port = self.net.getConnectedSwitchPort(vnf_name)
+            if port is not None:
+                vnf_interface = port.intf_id
 
         for metric_dict in deepcopy(self.network_metrics):
             if metric_dict['vnf_name'] == vnf_name and metric_dict['vnf_interface'] == vnf_interface \
@@ -343,6 +331,7 @@ class DCNetworkMonitor():
 
             self.monitor_flow_lock.acquire()
 
+            requests = []
             for flow_dict in self.flow_metrics:
                 data = {}
 
@@ -354,9 +343,16 @@ class DCNetworkMonitor():
                 elif 'rx' in flow_dict['metric_key']:
                     data['out_port'] = flow_dict['mon_port']
 
-                # query Ryu
-                ret = self.net.ryu_REST(
-                    'stats/flow', dpid=flow_dict['switch_dpid'], data=data)
+                requests.append({'prefix': 'stats/flow',
+                                 'dpid': flow_dict['switch_dpid'], 'data': data})
+
+            # query Ryu for all flows at once
+            replies = self.net.ryu_REST_batch(requests)
+
+            for flow_dict, ret in zip(self.flow_metrics, replies):
+                if isinstance(ret, Exception):
+                    logging.warning('flow stats request failed: {0}'.format(ret))
+                    continue
                 if isinstance(ret, dict):
                     flow_stat_dict = ret
                 elif isinstance(ret, str):
@@ -387,14 +383,20 @@ class DCNetworkMonitor():
             # group metrics by dpid to optimize the rest api calls
             dpid_list = [metric_dict['switch_dpid']
                          for metric_dict in self.network_metrics]
-            dpid_set = set(dpid_list)
+            dpid_set = list(set(dpid_list))
 
-            for dpid in dpid_set:
+            # query Ryu for all switches at once
+            replies = self.net.ryu_REST_batch(
+                [{'prefix': 'stats/port', 'dpid': dpid} for dpid in dpid_set])
 
-                # query Ryu
-                ret = self.net.ryu_REST('stats/port', dpid=dpid)
+            for dpid, ret in zip(dpid_set, replies):
+                if isinstance(ret, Exception):
+                    logging.warning('port stats request failed: {0}'.format(ret))
+                    continue
                 if isinstance(ret, dict):
                     port_stat_dict = ret
+                    # the port counters also feed the load-aware routing
+                    self.net.link_load.update(int(dpid), ret)
                 elif isinstance(ret, str):
                     port_stat_dict = ast.literal_eval(ret.rstrip())
                 else:
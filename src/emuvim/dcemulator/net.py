@@ -24,21 +24,49 @@
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.sonata-nfv.eu).
 import logging
+import threading
 import time
 import re
-import requests
 import os
 import json
 import networkx as nx
 from subprocess import Popen
+from concurrent.futures import ThreadPoolExecutor
 # from gevent import monkey
 from mininet.net import ContainernetWifi
 #from containernet.net import ContainernetWifi
 from mininet.node import OVSSwitch, OVSKernelSwitch, Docker, RemoteController
 from mininet.cli import CLI
-from mininet.link import TCLink
+from mininet.link import Link, TCLink
 from mininet.clean import cleanup
 from emuvim.dcemulator.monitoring import DCNetworkMonitor
+from emuvim.dcemulator.flows import FlowBatch, FlowBatchResult, FlowEntry, CookieIndex, \
+    apply_flow_batch, push_ofctl_bundle, ofctl_bundle_line, MAX_FLOW_WORKERS, OFCTL_GROUP_COMMANDS
+from emuvim.dcemulator.topology import InterfaceIndex, NodeRegistry, PathCache
+from emuvim.dcemulator.ryu_client import RyuClient
+from emuvim.dcemulator.reconcile import DesiredFlowTable, FlowReconciler, DEFAULT_RECONCILE_INTERVAL
+from emuvim.dcemulator.timing import PhaseTimer, timed_operation
+from prometheus_client import CollectorRegistry, start_http_server
+from emuvim.dcemulator.labels import TagAllocator, create_label_allocator, \
+    mpls_payload_types, mpls_match, mpls_push_actions, mpls_pop_actions, \
+    mpls_push_ofctl, mpls_pop_ofctl, LABEL_MODE_VLAN, LABEL_MODE_MPLS, VLAN_MIN
+from emuvim.dcemulator.ecmp import EcmpDag, equal_cost_paths, select_group_ryu, \
+    select_group_ofctl, GROUP_ID_MIN, GROUP_ID_MAX
+from emuvim.dcemulator.routing import BandwidthReservations, NoFeasiblePath, constrained_path, \
+    switch_graph
+from emuvim.dcemulator.loadaware import LinkLoad, LoadPoller, DEFAULT_LOAD_INTERVAL, \
+    DEFAULT_MAX_REROUTES, DEFAULT_HOT_THRESHOLD, LOAD_WEIGHT
+from emuvim.dcemulator.protection import ChainEdgeIndex, backup_path, path_alive, \
+    fast_failover_group_ryu, fast_failover_group_ofctl, GROUP_SELECT, GROUP_FAST_FAILOVER
+from emuvim.dcemulator.qos import QosQueues, QUEUE_ID_MIN, QUEUE_ID_MAX
+from emuvim.dcemulator.pipeline import PathLabels, path_entry_ryu, path_entry_ofctl, \
+    label_block_ryu, label_block_ofctl, PATH_LABEL_MIN, PATH_TABLE_ID, PATH_COOKIE
+from emuvim.dcemulator.boot import BatchOVSSwitch
+from emuvim.dcemulator.link import NetlinkLink, NetlinkTCLink, NETLINK, NETLINK_AVAILABLE, \
+    invalidate_network_status
+from emuvim.dcemulator.ovsdb import OvsdbClient, port_tag_vsctl, OVSDB_SOCKET
+from emuvim.dcemulator.pool import WarmPoolMetrics
+from emuvim.dcemulator.status import ContainerStatusCache
 from emuvim.dcemulator.node import Datacenter, EmulatorCompute
 from emuvim.dcemulator.resourcemodel import ResourceModelRegistrar
 
@@ -59,6 +87,17 @@ DEFAULT_COOKIE = 10
 
 SAP_PREFIX = 'sap.'
 
+# options of a chain that are needed to compile its flow entries again
+CHAIN_OPTIONS = ['cookie', 'match', 'priority', 'mod_dl_dst', 'skip_vlan_tag',
+                 'monitor', 'routing', 'weight', 'protect', 'max_delay', 'min_bw',
+                 'min_rate', 'max_rate']
+
+# operation names used in the timing metrics of chains
+CHAIN_OPERATIONS = {
+    'add-flow': 'chain_add',
+    'del-flows': 'chain_delete',
+}
+
 class DCNetwork(ContainernetWifi):
     """
     Wraps the original Mininet/Containernet class and provides
@@ -74,10 +113,46 @@ class DCNetwork(ContainernetWifi):
                  # functionality
                  dc_emulation_max_cpu=1.0,  # fraction of overall CPU time for emulation
                  dc_emulation_max_mem=512,  # emulation max mem in MB
+                 label_mode=LABEL_MODE_VLAN,
+                 ofctl_bundles=True,
+                 reconcile_interval=DEFAULT_RECONCILE_INTERVAL,
+                 load_balancing=False,
+                 load_interval=DEFAULT_LOAD_INTERVAL,
+                 max_reroutes=DEFAULT_MAX_REROUTES,
+                 hot_threshold=DEFAULT_HOT_THRESHOLD,
+                 pipeline=False,
+                 ovsdb_socket=OVSDB_SOCKET,
+                 batch_startup=False,
+                 netlink_links=False,
                  **kwargs):
         """
         Create an extended version of a Containernet network
         :param dc_emulation_max_cpu: max. CPU time used by containers in data centers
+        :param label_mode: how chains are isolated: 'vlan' (802.1Q tag, max. 4094 chains)
+                           or 'mpls' (MPLS label, max. ~1M chains)
+        :param ofctl_bundles: without Ryu, apply the flows of a switch in one
+                              atomic ovs-ofctl bundle (needs OVS >= 2.6)
+        :param reconcile_interval: seconds between two runs of the flow reconciler
+                                   that repairs the Ryu flow tables (0 or None: off)
+        :param load_balancing: poll the port stats of all switches and move chains off
+                               hot links (needs Ryu)
+        :param load_interval: seconds between two port stats polls / rebalancing runs
+        :param max_reroutes: max. number of chains moved per rebalancing run
+        :param hot_threshold: utilization above which a link is hot (0..1)
+        :param pipeline: two-table pipeline: table 0 of the first switch assigns the
+                         chain to a path label, table 1 forwards on path labels that
+                         are shared by all chains with the same switch path and
+                         destination port (vlan tags of chains and E-LANs stay below
+                         the path labels)
+        :param ovsdb_socket: unix socket of the ovsdb-server, port changes are sent
+                             over one persistent connection and batched into one
+                             transaction (None: use ovs-vsctl)
+        :param batch_startup: create the bridges of all switches that exist at start()
+                              with a few merged ovs-vsctl calls and restore their
+                              link config in parallel (see getBootTimings)
+        :param netlink_links: create the veth pairs of links and configure their addresses
+                              and tc options over netlink instead of ip/tc processes
+                              (needs pyroute2)
         :param kwargs: path through for Mininet parameters
         :return:
         """
@@ -89,7 +164,18 @@ class DCNetwork(ContainernetWifi):
         self.deployed_nsds = []
         self.deployed_elines = []
         self.deployed_elans = []
-        self.installed_chains = []
+        # installed chains and E-LANs, indexed by their vlan tag
+        self.installed_chains = {}
+        self.installed_lans = {}
+        # serializes all changes of the installed chains, they are changed by
+        # API calls and by the load poller thread (rebalanceChains)
+        self.chain_lock = threading.RLock()
+        # link between two switches -> tags of the chains routed over it
+        self.chain_edges = ChainEdgeIndex()
+        # (switch name, port name) -> vlan tag set on this port
+        self.port_tags = {}
+        # cookie -> dpids of the switches with flows of this cookie
+        self.cookie_index = CookieIndex()
 
         # always cleanup environment before we start the emulator
         # self.killRyu()
@@ -118,15 +204,48 @@ class DCNetwork(ContainernetWifi):
         #
         # # graph of the complete DC network
         self.DCNetwork_graph = nx.MultiDiGraph()
+        # index (node, interface) -> connected switch port
+        self.intf_index = InterfaceIndex()
+        # name -> node of all containers, switches, SAPs, hosts and stations
+        self.node_registry = NodeRegistry()
+        # shortest paths between switches, invalidated on topology changes
+        self.path_cache = PathCache()
+        # link bandwidth reserved by chains with a min_bw constraint
+        self.reservations = BandwidthReservations()
+        # EWMA rates of the switch ports (load-aware routing)
+        self.link_load = LinkLoad()
+        self.hot_threshold = hot_threshold
+        self.load_balancing = load_balancing
+        self.load_poller = LoadPoller(
+            self, interval=load_interval, max_reroutes=max_reroutes)
         #
         # # initialize pool of vlan tags to setup the SDN paths
-        self.vlans = list(range(1, 4095))[::-1]
+        self.pipeline = pipeline
+        if pipeline:
+            self.vlans = TagAllocator(VLAN_MIN, PATH_LABEL_MIN - 1)
+        else:
+            self.vlans = TagAllocator()
+        # shared path labels of the two-table pipeline
+        self.path_labels = PathLabels()
+        # labels used to isolate chains (E-LANs always use vlan tags)
+        self.label_mode = label_mode
+        if label_mode == LABEL_MODE_VLAN:
+            self.chain_labels = self.vlans
+        else:
+            self.chain_labels = create_label_allocator(label_mode)
+        # OpenFlow group ids of ECMP chains
+        self.group_ids = TagAllocator(GROUP_ID_MIN, GROUP_ID_MAX)
+        # HTB queues of chains with a min_rate/max_rate
+        self.queue_ids = TagAllocator(QUEUE_ID_MIN, QUEUE_ID_MAX)
+        self.qos = QosQueues()
         #
         # link to Ryu REST_API
         ryu_ip = 'localhost'
         ryu_port = '8080'
         self.ryu_REST_api = 'http://{0}:{1}'.format(ryu_ip, ryu_port)
-        self.RyuSession = requests.Session()
+        self.ofctl_bundles = ofctl_bundles
+        # workers used to program the switches of a flow batch in parallel
+        self.flow_workers = ThreadPoolExecutor(max_workers=MAX_FLOW_WORKERS)
 
         # monitoring agent
         if monitor:
@@ -134,6 +253,37 @@ class DCNetwork(ContainernetWifi):
         else:
             self.monitor_agent = None
 
+        # metrics of the network operations are exported together with the
+        # monitoring metrics (if enabled), else see startMetricsServer
+        if self.monitor_agent is not None:
+            self.metrics_registry = self.monitor_agent.registry
+        else:
+            self.metrics_registry = CollectorRegistry()
+        # per phase timing of chain, E-LAN and load balancer setup
+        self.timer = PhaseTimer(registry=self.metrics_registry)
+        # hits/misses of the warm container pools of the data centers
+        self.pool_metrics = WarmPoolMetrics(registry=self.metrics_registry)
+        # docker inspect results of the containers, updated by docker events
+        self.container_status = ContainerStatusCache()
+
+        # pooled Ryu REST client
+        self.ryu = RyuClient(self.ryu_REST_api, registry=self.metrics_registry)
+        # persistent OVSDB connection for port configuration (falls back to ovs-vsctl)
+        self.ovsdb = OvsdbClient(ovsdb_socket) if ovsdb_socket else None
+        # durations of the startup phases of the last start()
+        self.batch_startup = batch_startup
+        self.boot_timings = {}
+        self.started = False
+        if netlink_links and not NETLINK_AVAILABLE:
+            LOG.warning("pyroute2 is not installed, links are created with ip/tc")
+        self.netlink_links = netlink_links and NETLINK_AVAILABLE
+        # desired state of all flow entries installed via Ryu, the switches
+        # are periodically compared against it and repaired
+        self.flow_table = DesiredFlowTable()
+        self.reconciler = FlowReconciler(
+            self.flow_table, self.ryu, interval=reconcile_interval,
+            registry=self.metrics_registry)
+
         # initialize resource model registrar
         self.rm_registrar = ResourceModelRegistrar(
             dc_emulation_max_cpu, dc_emulation_max_mem)
@@ -191,6 +341,11 @@ class DCNetwork(ContainernetWifi):
         # https://github.com/mpeuster/containernet/issues/3
         if "cls" not in params:
             params["cls"] = TCLink
+        if self.netlink_links:
+            if params["cls"] == TCLink:
+                params["cls"] = NetlinkTCLink
+            elif params["cls"] == Link:
+                params["cls"] = NetlinkLink
 
         link = ContainernetWifi.addLink(self, node1, node2, **params)
 
@@ -240,11 +395,41 @@ class DCNetwork(ContainernetWifi):
         self.DCNetwork_graph.add_edge(
             node2.name, node1.name, **attr_dict2)
 
+        self.path_cache.bump()
+        # index both link end points
+        self.intf_index.add(node1.name, node1_port_id, node1_port_name,
+                            node2.name, node2.ports[link.intf2], node2_port_name)
+        self.intf_index.add(node2.name, node2_port_id, node2_port_name,
+                            node1.name, node1.ports[link.intf1], node1_port_name)
+
+        invalidate_network_status(node1)
+        invalidate_network_status(node2)
+
         LOG.debug("addLink: n1={0} intf1={1} -- n2={2} intf2={3}".format(
             str(node1), node1_port_name, str(node2), node2_port_name))
 
         return link
 
+    @timed_operation('link_add')
+    def addLinks(self, links, **params):
+        """
+        Add many links at once, e.g. when a topology is built.
+        With netlink_links the links share the netlink socket of each
+        namespace, so a link costs a few netlink messages.
+
+        :param links: list of (node1, node2) or (node1, node2, params) tuples
+        :param params: parameters of all links (overridden by the link params)
+        :return: list of the created links
+        """
+        ret = []
+        for link in links:
+            link_params = dict(params)
+            if len(link) > 2:
+                link_params.update(link[2])
+            ret.append(self.addLink(link[0], link[1], **link_params))
+        LOG.debug("addLinks: added {0} links".format(len(ret)))
+        return ret
+
     def removeLink(self, link=None, node1=None, node2=None):
         """
         Remove the link from the Containernet and the networkx graph
@@ -254,9 +439,9 @@ class DCNetwork(ContainernetWifi):
             node2 = link.intf2.node
         assert node1 is not None
         assert node2 is not None
-        LOG.debug("Net graph before removing link")
-        print(self.DCNetwork_graph)
         ContainernetWifi.removeLink(self, link=link, node1=node1, node2=node2)
+        invalidate_network_status(node1)
+        invalidate_network_status(node2)
         # TODO we might decrease the loglevel to debug:
         try:
             self.DCNetwork_graph.remove_edge(node2.name, node1.name)
@@ -268,16 +453,66 @@ class DCNetwork(ContainernetWifi):
         except BaseException:
             LOG.warning("%s, %s not found in DCNetwork_graph." %
                         ((node1.name, node2.name)))
-        LOG.debug("Net graph after removing link")
-        print(self.DCNetwork_graph)
+        self.path_cache.bump()
+        # re-index the remaining links of both end points
+        self.intf_index.rebuild_node(self.DCNetwork_graph, node1.name)
+        self.intf_index.rebuild_node(self.DCNetwork_graph, node2.name)
+        # move the chains routed over this link to another path
+        if self.chain_edges.chains(node1.name, node2.name):
+            self.repairChains(node1.name, node2.name)
 
     def addDocker(self, label, **params):
         """
         Wrapper for addDocker method to use custom container class.
         """
         self.DCNetwork_graph.add_node(label, type=params.get('type', 'docker'))
-        return ContainernetWifi.addDocker(
+        d = ContainernetWifi.addDocker(
             self, label, cls=EmulatorCompute, **params)
+        self.node_registry.add(label, d, 'container')
+        return d
+
+    def addHost(self, name, cls=None, **params):
+        """
+        Wrapper for addHost method to register the host by name.
+        """
+        h = ContainernetWifi.addHost(self, name, cls=cls, **params)
+        self.node_registry.add(name, h, 'host')
+        return h
+
+    def addStation(self, name, **params):
+        """
+        Wrapper for addStation method to register the station by name.
+        """
+        sta = ContainernetWifi.addStation(self, name, **params)
+        self.node_registry.add(name, sta, 'station')
+        return sta
+
+    def addExistingDocker(self, d, label):
+        """
+        Add a container that was created outside of addDocker (e.g. by the
+        workers of Datacenter.startComputeBatch) to the network. Goes
+        through Containernet's addHost, so the container gets the same
+        bookkeeping and default parameters (ip, mac) as with addDocker.
+        """
+        def existing(name, **defaults):
+            for key, value in defaults.items():
+                d.params.setdefault(key, value)
+            return d
+
+        self.DCNetwork_graph.add_node(label, type='docker')
+        ContainernetWifi.addHost(self, label, cls=existing)
+        self.node_registry.add(label, d, 'container')
+        return d
+
+    def addPooledDocker(self, d, label, flavor_name=None):
+        """
+        Add a running container that was taken from a warm pool
+        under a new name (instead of creating it with addDocker).
+        """
+        d.dcli.rename(d.did, "%s.%s" % (d.dnameprefix, label))
+        d.name = label
+        d.flavor_name = flavor_name
+        return self.addExistingDocker(d, label)
 
     def addNode(self, label, **params):
         self.DCNetwork_graph.add_node(label, type=params.get('type', 'docker'))
@@ -288,6 +523,8 @@ class DCNetwork(ContainernetWifi):
         Method for moving a docker running from a dc to anoter dc
         """
         self.DCNetwork_graph.remove_node(label)
+        self.intf_index.remove_node(label)
+        self.path_cache.bump()
     #    self.DCNetwork_graph.add_node(label)
     
     def removeDocker(self, label, **params):
@@ -295,7 +532,15 @@ class DCNetwork(ContainernetWifi):
         Wrapper for removeDocker method to update graph.
         """
         self.DCNetwork_graph.remove_node(label)
-        return ContainernetWifi.removeDocker(self, label, **params)
+        self.intf_index.remove_node(label)
+        self.path_cache.bump()
+        node = self.getNodeByName(label) if NETLINK_AVAILABLE else None
+        ret = ContainernetWifi.removeDocker(self, label, **params)
+        self.node_registry.remove(label)
+        if node is not None:
+            # the namespace is gone with the container
+            NETLINK.close(node)
+        return ret
 
     def addExtSAP(self, sap_name, sap_ip, **params):
         """
@@ -311,6 +556,9 @@ class DCNetwork(ContainernetWifi):
         Wrapper for removeExtSAP method to remove SAP  also from graph.
         """
         self.DCNetwork_graph.remove_node(sap_name)
+        self.intf_index.remove_node(sap_name)
+        self.path_cache.bump()
+        self.node_registry.remove(sap_name)
         return ContainernetWifi.removeExtSAP(self, sap_name)
 
     def addSwitch(self, name, add_to_graph=True, **params):
@@ -322,6 +570,7 @@ class DCNetwork(ContainernetWifi):
         if add_to_graph:
             self.DCNetwork_graph.add_node(
                 name, type=params.get('type', 'switch'))
+            self.path_cache.bump()
 
         # set the learning switch behavior
         if 'failMode' in params:
@@ -329,8 +578,16 @@ class DCNetwork(ContainernetWifi):
         else:
             failMode = self.failMode
 
+        # switches added after start() are started on their own
+        if self.batch_startup and not self.started and 'cls' not in params:
+            params['cls'] = BatchOVSSwitch
+            params['boot_timings'] = self.boot_timings
+
+        # OpenFlow14 is needed to apply flows as bundles (ovs-ofctl --bundle)
         s = ContainernetWifi.addSwitch(
-            self, name, protocols='OpenFlow10,OpenFlow12,OpenFlow13', failMode=failMode, **params)
+            self, name, protocols='OpenFlow10,OpenFlow12,OpenFlow13,OpenFlow14', failMode=failMode, **params)
+        # SAPs are switches as well
+        self.node_registry.add(name, s, params.get('type', 'switch'))
 
         return s
 
@@ -345,9 +602,25 @@ class DCNetwork(ContainernetWifi):
 
     def start(self):
         # start
+        start = time.time()
         for dc in self.dcs.values():
             dc.start()
+        self.boot_timings['datacenters'] = time.time() - start
+        start = time.time()
         ContainernetWifi.start(self)
+        self.boot_timings['network'] = time.time() - start
+        self.started = True
+        self.container_status.start()
+        backend = 'batch' if self.batch_startup else 'serial'
+        for phase, duration in self.boot_timings.items():
+            self.timer.observe('boot', backend, phase, duration)
+        LOG.info("Network started in {0:.3f}s ({1})".format(
+            self.boot_timings['datacenters'] + self.boot_timings['network'], backend))
+        # the reconciler needs Ryu
+        if self.ryu_process is not None:
+            self.reconciler.start()
+            if self.load_balancing:
+                self.load_poller.start()
 
     def stop(self):
 
@@ -355,6 +628,19 @@ class DCNetwork(ContainernetWifi):
         if self.monitor_agent is not None:
             self.monitor_agent.stop()
 
+        # stop the flow workers
+        self.load_poller.stop()
+        self.reconciler.stop()
+        self.flow_workers.shutdown(wait=True)
+        self.ryu.close()
+        if self.ovsdb is not None:
+            self.ovsdb.close()
+        if NETLINK_AVAILABLE:
+            NETLINK.close()
+        for dc in self.dcs.values():
+            dc.stop()
+        self.container_status.stop()
+
         # stop emulator net
         ContainernetWifi.stop(self)
 
@@ -364,63 +650,506 @@ class DCNetwork(ContainernetWifi):
     def CLI(self):
         CLI(self)
 
+    @property
+    def flow_backend(self):
+        """
+        How flow entries are installed: 'ryu' (REST api) or 'ofctl' (ovs-ofctl)
+        """
+        if self.controller == RemoteController:
+            return 'ryu'
+        return 'ofctl'
+
+    def startMetricsServer(self, port=9091):
+        """
+        Serve the metrics of the network (operation timing, Ryu client,
+        flow reconciler) over http, e.g. if the monitoring agent is not used.
+        """
+        start_http_server(port, registry=self.metrics_registry)
+        LOG.info("Serving network metrics on port {0}".format(port))
+
+    @timed_operation('lan_setup')
     def setLAN(self, vnf_list):
         """
         setup an E-LAN network by assigning the same VLAN tag to each DC interface of the VNFs in the E-LAN
 
         :param vnf_list: names of the VNFs in this E-LAN  [{name:,interface:},...]
-        :return:
+        :return: vlan tag of the E-LAN (needed to remove it again)
         """
         src_sw = None
         src_sw_inport_name = None
+        ports = []
 
         # get a vlan tag for this E-LAN
-        vlan = self.vlans.pop()
+        vlan = self.vlans.allocate(owner='elan')
+        self.installed_lans[vlan] = list(vnf_list)
 
         for vnf in vnf_list:
             vnf_src_name = vnf['name']
             vnf_src_interface = vnf['interface']
 
-            # check if port is specified (vnf:port)
-            if vnf_src_interface is None:
-                # take first interface by default
-                connected_sw = self.DCNetwork_graph.neighbors(vnf_src_name)[0]
-                link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-                vnf_src_interface = link_dict[0]['src_port_id']
-
-            for connected_sw in self.DCNetwork_graph.neighbors(vnf_src_name):
-                link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-                for link in link_dict:
-                    if (link_dict[link]['src_port_id'] == vnf_src_interface or
-                            link_dict[link]['src_port_name'] == vnf_src_interface):  # Fix: we might also get interface names, e.g, from a son-emu-cli call
-                        # found the right link and connected switch
-                        src_sw = connected_sw
-                        src_sw_inport_name = link_dict[link]['dst_port_name']
-                        break
+            # check if port is specified (vnf:port), else take first interface
+            src_port = self.getConnectedSwitchPort(
+                vnf_src_name, vnf_src_interface)
+            if src_port is not None:
+                vnf_src_interface = src_port.intf_id
+                src_sw = src_port.switch
+                src_sw_inport_name = src_port.port_name
 
             # set the tag on the dc switch interface
             LOG.debug('set E-LAN: vnf name: {0} interface: {1} tag: {2}'.format(
                 vnf_src_name, vnf_src_interface, vlan))
-            switch_node = self.getNodeByName(src_sw)
-            self._set_vlan_tag(switch_node, src_sw_inport_name, vlan)
+            ports.append((self.getNodeByName(src_sw), src_sw_inport_name, vlan))
+        # all ports are tagged in one OVSDB transaction
+        with self.timer.phase('lan_setup', self.flow_backend, 'vlan_tag'):
+            self._set_vlan_tags(ports)
+        return vlan
+
+    @timed_operation('lan_remove')
+    def removeLAN(self, vlan):
+        """
+        Remove an E-LAN that was set up by setLAN and release its vlan tag.
+
+        :param vlan: vlan tag returned by setLAN
+        :return: True if the E-LAN was found
+        """
+        if self.installed_lans.pop(vlan, None) is None:
+            LOG.warning("No E-LAN found with vlan tag {0}".format(vlan))
+            return False
+        self._release_vlan(vlan, owner='elan')
+        return True
+
+    def _release_vlan(self, vlan, owner=None):
+        """
+        Give a vlan tag back to the pool and clear it from all switch ports
+        that are still tagged with it.
+        """
+        if not self.vlans.free(vlan, owner=owner):
+            return
+        ports = []
+        for (sw_name, port_name), tag in list(self.port_tags.items()):
+            if tag != vlan:
+                continue
+            switch_node = self.getNodeByName(sw_name)
+            if switch_node is not None:
+                ports.append((switch_node, port_name, None))
+        self._set_vlan_tags(ports)
+        LOG.debug("released vlan tag {0}".format(vlan))
+
+    def getConnectedSwitchPort(self, vnf_name, vnf_interface=None):
+        """
+        Find the switch port a VNF interface is connected to.
+
+        :param vnf_name: name of the VNF (or other node)
+        :param vnf_interface: interface id or name, None = first interface
+        :return: SwitchPort(switch, port_nr, port_name, intf_id, intf_name)
+                 or None if the interface is not connected
+        """
+        return self.intf_index.lookup(vnf_name, vnf_interface)
+
+    def getShortestPath(self, src_sw, dst_sw, weight=None):
+        """
+        Shortest path between two switches (served from the path cache).
+        Raises a networkx exception if no path can be found.
+
+        :param src_sw: name of the first switch
+        :param dst_sw: name of the last switch
+        :param weight: edge attribute used as weight (e.g. delay)
+        :return: list of switch names
+        """
+        return self.path_cache.get(
+            self.DCNetwork_graph, src_sw, dst_sw, weight=weight)
+
+    def getConstrainedPath(self, src_sw, dst_sw, max_delay=None, min_bw=None, weight=None):
+        """
+        Path between two switches that satisfies a delay budget and has enough
+        residual bandwidth (taking the reservations of installed chains into account).
+        Raises NoFeasiblePath (with the reason) if there is none.
+
+        :param src_sw: name of the first switch
+        :param dst_sw: name of the last switch
+        :param max_delay: max. end-to-end delay in ms
+        :param min_bw: min. residual bandwidth in Mbit/s
+        :param weight: link metric used to order the candidate paths (default: hop count)
+        :return: list of switch names
+        """
+        return constrained_path(
+            self.DCNetwork_graph, src_sw, dst_sw,
+            min_bw=float(min_bw) if min_bw else None,
+            max_delay=float(max_delay) if max_delay is not None else None,
+            reservations=self.reservations, weight=weight)
+
+    def getLinkReservations(self):
+        """
+        Bandwidth (Mbit/s) reserved by chains per link, e.g. {"s1->s2": 10.0}
+        """
+        return self.reservations.to_dict()
+
+    def getLoadAwarePath(self, src_sw, dst_sw):
+        """
+        Path between two switches that avoids utilized links: every link
+        costs one hop plus LOAD_WEIGHT hops times its utilization (EWMA).
+
+        :param src_sw: name of the first switch
+        :param dst_sw: name of the last switch
+        :return: list of switch names
+        """
+        g = switch_graph(self.DCNetwork_graph)
+        util = self.getLinkUtilization()
+        for u, v, d in g.edges(data=True):
+            d['load'] = 1.0 + LOAD_WEIGHT * util.get((u, v), 0.0)
+        return nx.shortest_path(g, src_sw, dst_sw, weight='load')
+
+    def getLinkUtilization(self):
+        """
+        Utilization (EWMA tx rate / bw) of the links between switches.
+        :return: dict (src switch, dst switch) -> utilization
+        """
+        util = {}
+        for u, v, d in switch_graph(self.DCNetwork_graph).edges(data=True):
+            # chains use the first link between two switches
+            port = self.DCNetwork_graph[u][v][0]['src_port_nr']
+            util[(u, v)] = self.link_load.utilization(
+                int(self.getNodeByName(u).dpid, 16), port, capacity=d.get('bw'))
+        return util
+
+    def rebalanceChains(self, max_reroutes=DEFAULT_MAX_REROUTES):
+        """
+        Move chains off hot links (utilization above hot_threshold) to a
+        load-aware path, at most max_reroutes chains per call. Chains with a
+        custom path or constraints and ECMP chains are not moved.
+        :return: number of moved chains
+        """
+        util = self.getLinkUtilization()
+        hot = set(link for link, u in util.items() if u >= self.hot_threshold)
+        if not hot:
+            return 0
+        moved = 0
+        with self.chain_lock:
+            for chain_dict in list(self.installed_chains.values()):
+                if moved >= max_reroutes:
+                    break
+                path = chain_dict.get('path')
+                if path is None or chain_dict.get('pinned') or chain_dict['monitor']:
+                    continue
+                links = list(zip(path[:-1], path[1:]))
+                if not hot.intersection(links):
+                    continue
+                new_path = self.getLoadAwarePath(path[0], path[-1])
+                new_links = list(zip(new_path[:-1], new_path[1:]))
+                if new_path == path or max([util.get(link, 0.0) for link in new_links] or [0.0]) >= \
+                        max(util.get(link, 0.0) for link in links):
+                    continue
+                if self._rerouteChain(chain_dict, new_path):
+                    moved += 1
+        return moved
+
+    def _rerouteChain(self, chain_dict, new_path):
+        """
+        Move an installed chain to another path (make-before-break):
+        the entries of the new path behind the first switch (and of a new
+        backup path) are installed first, then the entry of the first switch
+        is overwritten to use the new path and finally the old entries that
+        are not used any more are removed. The chain keeps its tag. The old
+        entries are taken from the chain record, so the old path does not
+        have to be in the graph any more (see repairChains). Monitor
+        entries of the chain are moved together with its first switch.
+        If the move fails, everything installed for the new path is
+        removed again and the chain stays on its old path.
+        :return: True if the chain was moved
+        """
+        names = (chain_dict['vnf_src_name'], chain_dict['vnf_dst_name'],
+                 chain_dict['vnf_src_interface'], chain_dict['vnf_dst_interface'])
+        chain_label = "{0}:{2}->{1}:{3}".format(*names)
+        old_label = chain_dict.get('path_label')
+        if old_label is not None and list(new_path) == chain_dict['path']:
+            return True
+        src_port = self.getConnectedSwitchPort(names[0], names[2])
+        dst_port = self.getConnectedSwitchPort(names[1], names[3])
+        options = dict(chain_dict['options'], cmd='add-flow',
+                       queue_id=chain_dict.get('queue_id'))
+        backup = None
+        if options.get('protect'):
+            backup = self.getBackupPath(new_path, weight=options.get('weight'))
+        queue_ports = None
+        old_queue_ports = None
+        if chain_dict.get('queue_id') is not None:
+            old_queue_ports = set((switch_name, port_name) for switch_name, port_name, _ in
+                                  self.qos.queues(chain_dict['queue_owner']))
+            queue_ports = self._addChainQueues(chain_dict, [new_path, backup], dst_port)
+        group_id = None
+        new_batch = FlowBatch()
+        backup_batch = FlowBatch()
+        if backup is not None:
+            group_id = self.group_ids.allocate(owner=chain_label)
+            backup_batch.add(self._compile_failover_group(new_path, backup, group_id),
+                             chain=chain_label, hop=0)
+            self._compileChainPath(backup, src_port, dst_port, chain_dict['tag'], chain_label,
+                                   backup_batch, hops=range(1, len(backup)), **options)
+        hops = None
+        label_batch = FlowBatch()
+        if old_label is not None:
+            # the chain moves to the (shared) entries of another path label
+            options['path_label'] = self._acquirePathLabel(
+                chain_dict['tag'], new_path, dst_port, chain_label, label_batch)
+            hops = [0]
+        ret = self._compileChainPath(new_path, src_port, dst_port, chain_dict['tag'],
+                                     chain_label, new_batch, hops=hops, group_id=group_id,
+                                     **options)
+        # the monitor entries of the chain (see _addMonitorFlow) move with it
+        monitors = chain_dict.get('monitors', {})
+        monitor_batches = {}
+        for key, monitor in monitors.items():
+            if ret is not None:
+                break
+            monitor_batches[key] = FlowBatch()
+            ret = self._compileMonitorPath(new_path, src_port, dst_port, chain_dict['tag'],
+                                           chain_label, monitor_batches[key],
+                                           **dict(monitor['options'], cmd='add-flow',
+                                                  path_label=options.get('path_label')))
+        old_monitor_entries = [e for monitor in monitors.values() for e in monitor['entries']]
+        new_monitor_entries = [e for batch in monitor_batches.values() for e in batch.entries]
+        old_entries = chain_dict.get('entries', []) + chain_dict.get('backup_entries', [])
+        if ret is not None:
+            LOG.warning("Moving chain {0} failed: {1}".format(names, ret))
+            self._abortChainMove(chain_dict, chain_label, options.get('path_label'), group_id,
+                                 old_queue_ports, old_entries + old_monitor_entries, [], [])
+            return False
+
+        LOG.info("Moving chain {0} from {1} to {2}".format(
+            names, chain_dict['path'], new_path))
+        new_keys = set((e.switch.name, self._entry_in_port(e))
+                       for e in new_batch.entries + backup_batch.entries if e.cmd == 'add-flow')
+        new_monitor_keys = set((e.switch.name, self._entry_in_port(e)) for e in new_monitor_entries)
+        # (removal entry, old entry)
+        removals = [(self._removal_entry(e), e) for e in old_entries
+                    if e.cmd != 'add-flow' or
+                    (e.switch.name, self._entry_in_port(e)) not in new_keys]
+        removals += [(self._removal_entry(e), e) for e in old_monitor_entries
+                     if (e.switch.name, self._entry_in_port(e)) not in new_monitor_keys]
+        steps = [label_batch.entries + backup_batch.entries +
+                 [e for e in new_batch.entries if e.hop != 0],
+                 [e for e in new_batch.entries if e.hop == 0] + new_monitor_entries,
+                 [removal for removal, _ in removals]]
+        pushed = []
+        for entries in steps:
+            batch = FlowBatch()
+            for e in entries:
+                batch.add(e, chain=e.chain, hop=e.hop)
+            result = self._apply_flow_batch(batch)
+            pushed.extend(e for e in entries if e.status == 'ok')
+            if not result.success:
+                LOG.warning("Moving chain {0} failed: {1}".format(names, result))
+                self._abortChainMove(chain_dict, chain_label, options.get('path_label'), group_id,
+                                     old_queue_ports, old_entries + old_monitor_entries,
+                                     [e for e in pushed if e not in label_batch.entries],
+                                     [old for removal, old in removals if removal.status == 'ok'])
+                return False
+        if old_label is not None:
+            # the old label is not used by this chain any more
+            batch = FlowBatch()
+            for e in self.path_labels.release(chain_dict['tag'], old_label):
+                batch.add(self._removal_entry(e), chain=e.chain, hop=e.hop)
+            if batch.entries and not self._apply_flow_batch(batch).success:
+                LOG.warning("Could not remove the entries of path label {0}".format(old_label))
+        if chain_dict.get('group_id') is not None:
+            self.group_ids.free(chain_dict['group_id'], owner=chain_dict['group_owner'])
+        chain_dict['group_id'] = group_id
+        chain_dict['group_owner'] = chain_label
+        chain_dict['path'] = list(new_path)
+        chain_dict['backup'] = backup
+        chain_dict['entries'] = new_batch.entries
+        chain_dict['backup_entries'] = backup_batch.entries
+        chain_dict['path_label'] = options.get('path_label')
+        for key, batch in monitor_batches.items():
+            monitors[key]['entries'] = batch.entries
+        self.chain_edges.add(chain_dict['tag'], [new_path, backup])
+        if queue_ports is not None:
+            self.qos.remove(chain_dict['queue_owner'], keep=queue_ports)
+        return True
+
+    def _abortChainMove(self, chain_dict, chain_label, new_label, group_id,
+                        old_queue_ports, old_entries, pushed, removed):
+        """
+        Undo a failed _rerouteChain: restore the old entries that were
+        overwritten or removed, remove the entries pushed for the new path
+        and release the label, group id and queues taken for it.
+        :param pushed: entries of the new path that were installed
+        :param removed: old entries whose removal was pushed
+        """
+        old_keys = set((e.switch.name, self._entry_in_port(e))
+                       for e in old_entries if e.cmd == 'add-flow')
+        new_keys = set((e.switch.name, self._entry_in_port(e))
+                       for e in pushed if e.cmd == 'add-flow')
+        # old entries that may have been overwritten by a new entry
+        # (chain and monitor entries of a switch port) or were removed
+        restore = [e for e in old_entries if e in removed or e.cmd == 'add-flow' and
+                   (e.switch.name, self._entry_in_port(e)) in new_keys]
+        undo = [self._removal_entry(e) for e in pushed
+                if e.cmd == 'add-group' or e.cmd == 'add-flow' and
+                (e.switch.name, self._entry_in_port(e)) not in old_keys]
+        if new_label is not None:
+            undo.extend(self._removal_entry(e) for e in
+                        self.path_labels.release(chain_dict['tag'], new_label))
+        # the old entries first, so the first switch uses the old path again
+        for entries in [restore, undo]:
+            batch = FlowBatch()
+            for e in entries:
+                batch.add(e, chain=chain_label, hop=e.hop)
+            if batch.entries and not self._apply_flow_batch(batch).success:
+                LOG.warning("Could not roll back the move of chain {0}".format(chain_label))
+        if group_id is not None:
+            self.group_ids.free(group_id, owner=chain_label)
+        if old_queue_ports is not None:
+            self.qos.remove(chain_dict['queue_owner'], keep=old_queue_ports)
+
+    def getBackupPath(self, path, weight=None):
+        """
+        Backup path of a chain path: the shortest path between its first and
+        last switch that shares no link with it (see protect in setChain).
+
+        :param path: list of switch names
+        :param weight: link metric to minimize (default: number of hops)
+        :return: list of switch names, None if there is no link-disjoint path
+        """
+        return backup_path(self.DCNetwork_graph, path, weight=weight)
+
+    def repairChains(self, src_sw, dst_sw):
+        """
+        Move the chains routed over the link between two switches to another
+        path, e.g. after the link was removed (done by removeLink). Only the
+        chains using the link are touched: protected chains switch to their
+        backup path (and get a new one), all others are routed again with
+        their routing options. ECMP chains are not repaired.
+        The recovery time is exported as operation 'link_repair'.
+
+        :param src_sw: name of the switch at one end of the link
+        :param dst_sw: name of the switch at the other end of the link
+        :return: dict {chains, repaired, failed, seconds} (lists of chain tags)
+        """
+        start = time.time()
+        repaired = []
+        failed = []
+        with self.chain_lock, self.timer.operation('link_repair', self.flow_backend):
+            tags = self.chain_edges.chains(src_sw, dst_sw)
+            for tag in tags:
+                chain_dict = self.installed_chains.get(tag)
+                if chain_dict is None:
+                    continue
+                if chain_dict.get('path') is not None and self._repairChain(chain_dict):
+                    repaired.append(tag)
+                else:
+                    failed.append(tag)
+        seconds = time.time() - start
+        LOG.info("Repaired {0} of {1} chains using link {2}<->{3} in {4:.3f}s".format(
+            len(repaired), len(tags), src_sw, dst_sw, seconds))
+        if failed:
+            LOG.warning("Could not repair the chains with tags {0}".format(failed))
+        return {'chains': tags, 'repaired': repaired, 'failed': failed, 'seconds': seconds}
+
+    def _repairChain(self, chain_dict):
+        path = chain_dict['path']
+        backup = chain_dict.get('backup')
+        options = chain_dict['options']
+        if path_alive(self.DCNetwork_graph, path):
+            # only the backup path is broken, protect the chain again
+            return self._rerouteChain(chain_dict, path)
+        owner = chain_dict.get('reservation')
+        if owner is not None:
+            self.reservations.release(owner)
+        if backup is not None and path_alive(self.DCNetwork_graph, backup):
+            new_path = backup
+        else:
+            try:
+                if options.get('max_delay') or options.get('min_bw'):
+                    new_path = self.getConstrainedPath(
+                        path[0], path[-1], max_delay=options.get('max_delay'),
+                        min_bw=options.get('min_bw'), weight=options.get('weight'))
+                elif options.get('routing') == 'load':
+                    new_path = self.getLoadAwarePath(path[0], path[-1])
+                else:
+                    new_path = self.getShortestPath(
+                        path[0], path[-1], weight=options.get('weight'))
+            except BaseException as ex:
+                LOG.warning("No path to repair chain with tag {0}: {1}".format(
+                    chain_dict['tag'], ex))
+                return False
+        if owner is not None:
+            self.reservations.reserve(owner, new_path, float(options['min_bw']))
+        return self._rerouteChain(chain_dict, new_path)
+
+    def _removal_entry(self, entry):
+        """
+        Entry that removes what an installed entry added (flow or group).
+        """
+        if entry.cmd != 'add-group':
+            return self._strict_delete_entry(entry)
+        if entry.flow is not None:
+            group_id = entry.flow['group_id']
+        else:
+            group_id = int(re.search(r'group_id=(\d+)', entry.ofcmd).group(1))
+        return self._compile_group_entry(entry.switch, 'del-groups', group_id)
+
+    def _entry_in_port(self, entry):
+        if entry.flow is not None:
+            return entry.flow['match'].get('in_port')
+        m = re.search(r'in_port=(\w+)', entry.ofcmd)
+        return int(m.group(1)) if m else None
+
+    def _strict_delete_entry(self, entry):
+        """
+        Entry that removes exactly the flow an add-flow entry installs.
+        """
+        if entry.flow is not None:
+            flow = dict(entry.flow)
+            flow.pop('actions', None)
+            return FlowEntry(entry.switch, 'del-flows', prefix='stats/flowentry/delete_strict',
+                             flow=flow, cookie=entry.cookie)
+        match = entry.ofcmd.split(',action=')[0]
+        match = re.sub(r'cookie=(\w+)(?=,|$)', r'cookie=\1/-1', match)
+        return FlowEntry(entry.switch, 'del-flows', ofcmd='--strict ' + match,
+                         cookie=entry.cookie)
+
+    def getPathCacheStats(self):
+        """
+        Hit/miss counters of the shortest path cache.
+        """
+        return self.path_cache.stats()
 
     def getNodeByName(self, name):
         """
         Wraps Containernet's getNodeByName method to avoid
         key not found exceptions.
+        :return: node or None
         """
-        try:
-            return super(DCNetwork, self).getNodeByName(name)
-        except BaseException as ex:
-            LOG.warning("Node not found: {}".format(name))
-            LOG.debug("Node not found: {}".format(ex))
-        return None
+        node = self.node_registry.get(name)
+        if node is None:
+            # e.g. controllers are not registered
+            node = self.nameToNode.get(name)
+        if node is None:
+            LOG.debug("Node not found: {}".format(name))
+        return node
+
+    def hasNode(self, name, kind=None):
+        """
+        Check if a node name is in use.
+        :param kind: only nodes of this kind ('container', 'switch', 'sap_ext', 'host', 'station')
+        """
+        if kind is None:
+            return name in self.node_registry or name in self.nameToNode
+        return self.node_registry.get(name, kind=kind) is not None
+
+    def getNodeNames(self, kind=None):
+        """
+        Names of all registered nodes (of a kind).
+        """
+        return self.node_registry.names(kind=kind)
 
     def _addMonitorFlow(self, vnf_src_name, vnf_dst_name, vnf_src_interface=None, vnf_dst_interface=None,
                         tag=None, **kwargs):
         """
         Add a monitoring flow entry that adds a special flowentry/counter at the begin or end of a chain.
         So this monitoring flowrule exists on top of a previously defined chain rule and uses the same vlan tag/routing.
+        The entry is placed on the path the chain is installed on and is moved with the chain (see _rerouteChain).
         :param vnf_src_name:
         :param vnf_dst_name:
         :param vnf_src_interface:
@@ -430,144 +1159,121 @@ class DCNetwork(ContainernetWifi):
         :return:
         """
 
-        src_sw = None
-        src_sw_inport_nr = 0
-        src_sw_inport_name = None
-        dst_sw = None
-        dst_sw_outport_nr = 0
-        dst_sw_outport_name = None
-
         LOG.debug("call AddMonitorFlow vnf_src_name=%r, vnf_src_interface=%r, vnf_dst_name=%r, vnf_dst_interface=%r",
                   vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface)
 
-        # check if port is specified (vnf:port)
+        # check if port is specified (vnf:port), else take first interface
+        # (we might also get interface names, e.g, from a son-emu-cli call)
+        src_port = self.getConnectedSwitchPort(vnf_src_name, vnf_src_interface)
+        vnf_dst_name = vnf_dst_name.split(':')[0]
+        dst_port = self.getConnectedSwitchPort(vnf_dst_name, vnf_dst_interface)
+        if src_port is None or dst_port is None:
+            return "No path could be found between {0} and {1}".format(
+                vnf_src_name, vnf_dst_name)
         if vnf_src_interface is None:
-            # take first interface by default
-            connected_sw = self.DCNetwork_graph.neighbors(vnf_src_name)[0]
-            link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-            vnf_src_interface = link_dict[0]['src_port_id']
-
-        for connected_sw in self.DCNetwork_graph.neighbors(vnf_src_name):
-            link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-            for link in link_dict:
-                if (link_dict[link]['src_port_id'] == vnf_src_interface or
-                        link_dict[link]['src_port_name'] == vnf_src_interface):  # Fix: we might also get interface names, e.g, from a son-emu-cli call
-                    # found the right link and connected switch
-                    src_sw = connected_sw
-                    src_sw_inport_nr = link_dict[link]['dst_port_nr']
-                    src_sw_inport_name = link_dict[link]['dst_port_name']
-                    break
-
+            vnf_src_interface = src_port.intf_id
         if vnf_dst_interface is None:
-            # take first interface by default
-            connected_sw = self.DCNetwork_graph.neighbors(vnf_dst_name)[0]
-            link_dict = self.DCNetwork_graph[connected_sw][vnf_dst_name]
-            vnf_dst_interface = link_dict[0]['dst_port_id']
-
-        vnf_dst_name = vnf_dst_name.split(':')[0]
-        for connected_sw in self.DCNetwork_graph.neighbors(vnf_dst_name):
-            link_dict = self.DCNetwork_graph[connected_sw][vnf_dst_name]
-            for link in link_dict:
-                if link_dict[link]['dst_port_id'] == vnf_dst_interface or \
-                        link_dict[link]['dst_port_name'] == vnf_dst_interface:  # Fix: we might also get interface names, e.g, from a son-emu-cli call
-                    # found the right link and connected switch
-                    dst_sw = connected_sw
-                    dst_sw_outport_nr = link_dict[link]['src_port_nr']
-                    dst_sw_outport_name = link_dict[link]['src_port_name']
-                    break
+            vnf_dst_interface = dst_port.intf_id
 
         if not tag >= 0:
             LOG.exception('tag not valid: {0}'.format(tag))
 
-        # get shortest path
-        try:
-            # returns the first found shortest path
-            # if all shortest paths are wanted, use: all_shortest_paths
-            path = nx.shortest_path(
-                self.DCNetwork_graph, src_sw, dst_sw, weight=kwargs.get('weight'))
-        except BaseException:
-            LOG.exception("No path could be found between {0} and {1} using src_sw={2} and dst_sw={3}".format(
-                vnf_src_name, vnf_dst_name, src_sw, dst_sw))
-            LOG.debug("Graph nodes: %r" % self.DCNetwork_graph.nodes())
-            LOG.debug("Graph edges: %r" % self.DCNetwork_graph.edges())
-            for e, v in self.DCNetwork_graph.edges():
-                LOG.debug("%r" % self.DCNetwork_graph[e][v])
-            return "No path could be found between {0} and {1}".format(
-                vnf_src_name, vnf_dst_name)
+        chain_dict = self.installed_chains.get(tag)
+        path = chain_dict.get('path') if chain_dict is not None else None
+        if path is None:
+            # chains without a recorded path
+            try:
+                # returns the first found shortest path
+                # if all shortest paths are wanted, use: all_shortest_paths
+                path = self.getShortestPath(
+                    src_port.switch, dst_port.switch, weight=kwargs.get('weight'))
+            except BaseException:
+                LOG.exception("No path could be found between {0} and {1} using src_sw={2} and dst_sw={3}".format(
+                    vnf_src_name, vnf_dst_name, src_port.switch, dst_port.switch))
+                return "No path could be found between {0} and {1}".format(
+                    vnf_src_name, vnf_dst_name)
 
         LOG.debug("Creating path between {0} and {1}: {2}".format(
             vnf_src_name, vnf_dst_name, path))
 
-        current_hop = src_sw
-        switch_inport_nr = src_sw_inport_nr
-
         cmd = kwargs.get('cmd')
-
-        # iterate through the path to install the flow-entries
-        for i in range(0, len(path)):
-            current_node = self.getNodeByName(current_hop)
-
-            if path.index(current_hop) < len(path) - 1:
-                next_hop = path[path.index(current_hop) + 1]
+        chain_label = "{0}:{1}->{2}:{3}".format(
+            vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface)
+        if chain_dict is not None:
+            kwargs['path_label'] = chain_dict.get('path_label')
+        batch = FlowBatch()
+        ret = self._compileMonitorPath(path, src_port, dst_port, tag, chain_label, batch, **kwargs)
+        if ret is not None:
+            return ret
+        result = self._apply_flow_batch(batch)
+        if not result.success:
+            return str(result)
+
+        if chain_dict is not None:
+            # remember the monitor entries, they are moved with the chain
+            key = (kwargs.get('monitor_placement'), kwargs.get('cookie'), kwargs.get('match'))
+            monitors = chain_dict.setdefault('monitors', {})
+            if cmd == 'add-flow':
+                monitors[key] = {'options': dict(kwargs), 'entries': batch.entries}
             else:
-                # last switch reached
-                next_hop = vnf_dst_name
+                monitors.pop(key, None)
 
-            next_node = self.getNodeByName(next_hop)
+        return "path {2} between {0} and {1}".format(
+            vnf_src_name, vnf_dst_name, cmd)
 
-            if next_hop == vnf_dst_name:
-                switch_outport_nr = dst_sw_outport_nr
-                LOG.debug("end node reached: {0}".format(vnf_dst_name))
-            elif not isinstance(next_node, OVSSwitch):
+    def _compileMonitorPath(self, path, src_port, dst_port, vlan, chain_label, batch, **kwargs):
+        """
+        Compile the monitor entry of a chain at the first ('tx') or last
+        ('rx') switch of its path.
+        Chains of the two-table pipeline (path_label) only support 'tx':
+        the entry pushes the path label and continues in table 1 like the
+        entry of the chain. Their packets reach the last switch with the
+        path label that other chains share, so they can not be counted there.
+        :return: error message, None if the entry was compiled
+        """
+        monitor_placement = kwargs.get('monitor_placement').strip()
+        if monitor_placement not in ['rx', 'tx']:
+            LOG.exception(
+                'invalid monitor command: {0}'.format(monitor_placement))
+            return None
+        if monitor_placement == 'rx' and kwargs.get('path_label') is not None:
+            LOG.warning("rx monitoring is not supported for chain {0}, it uses path label {1}".format(
+                chain_label, kwargs.get('path_label')))
+            return "rx monitoring is not supported for chains with a path label"
+        # put monitor flow at the src switch (tx) or the dst switch (rx)
+        i = 0 if monitor_placement == 'tx' else len(path) - 1
+        current_hop = path[i]
+        current_node = self.getNodeByName(current_hop)
+        if i == 0:
+            switch_inport_nr = src_port.port_nr
+        else:
+            # take first link between switches by default
+            switch_inport_nr = self.DCNetwork_graph[path[i - 1]][current_hop][0]['dst_port_nr']
+        if i < len(path) - 1:
+            next_hop = path[i + 1]
+            if not isinstance(self.getNodeByName(next_hop), OVSSwitch):
                 LOG.info("Next node: {0} is not a switch".format(next_hop))
                 return "Next node: {0} is not a switch".format(next_hop)
-            else:
-                # take first link between switches by default
-                index_edge_out = 0
-                switch_outport_nr = self.DCNetwork_graph[current_hop][next_hop][index_edge_out]['src_port_nr']
-
-            # set of entry via ovs-ofctl
-            if isinstance(current_node, OVSSwitch):
-                kwargs['vlan'] = tag
-                kwargs['path'] = path
-                kwargs['current_hop'] = current_hop
-                kwargs['switch_inport_name'] = src_sw_inport_name
-                kwargs['switch_outport_name'] = dst_sw_outport_name
-                kwargs['skip_vlan_tag'] = True
-                kwargs['pathindex'] = i
-
-                monitor_placement = kwargs.get('monitor_placement').strip()
-                # put monitor flow at the dst switch
-                insert_flow = False
-                # first node:
-                if monitor_placement == 'tx' and path.index(current_hop) == 0:
-                    insert_flow = True
-                # put monitoring flow at the src switch
-                # last node:
-                elif monitor_placement == 'rx' and path.index(current_hop) == len(path) - 1:
-                    insert_flow = True
-                elif monitor_placement not in ['rx', 'tx']:
-                    LOG.exception(
-                        'invalid monitor command: {0}'.format(monitor_placement))
-
-                if self.controller == RemoteController and insert_flow:
-                    # set flow entry via ryu rest api
-                    self._set_flow_entry_ryu_rest(
-                        current_node, switch_inport_nr, switch_outport_nr, **kwargs)
-                    break
-                elif insert_flow:
-                    # set flow entry via ovs-ofctl
-                    self._set_flow_entry_dpctl(
-                        current_node, switch_inport_nr, switch_outport_nr, **kwargs)
-                    break
-
-            # take first link between switches by default
-            if isinstance(next_node, OVSSwitch):
-                switch_inport_nr = self.DCNetwork_graph[current_hop][next_hop][0]['dst_port_nr']
-                current_hop = next_hop
-
-        return "path {2} between {0} and {1}".format(
-            vnf_src_name, vnf_dst_name, cmd)
+            switch_outport_nr = self.DCNetwork_graph[current_hop][next_hop][0]['src_port_nr']
+        else:
+            switch_outport_nr = dst_port.port_nr
+        if not isinstance(current_node, OVSSwitch):
+            return None
+
+        kwargs['vlan'] = vlan
+        kwargs['path'] = path
+        kwargs['current_hop'] = current_hop
+        kwargs['switch_inport_name'] = src_port.port_name
+        kwargs['switch_outport_name'] = dst_port.port_name
+        kwargs['skip_vlan_tag'] = True
+        kwargs['pathindex'] = i
+        # MPLS chains need one monitor entry per payload type
+        for eth_type in self._hop_payload_types(i, path, vlan, kwargs.get('match')):
+            kwargs['eth_type'] = eth_type
+            batch.add(self._compile_chain_entry(
+                current_node, switch_inport_nr, switch_outport_nr, **kwargs),
+                chain=chain_label, hop=i)
+        return None
 
     def setChain(self, vnf_src_name, vnf_dst_name,
                  vnf_src_interface=None, vnf_dst_interface=None, **kwargs):
@@ -588,107 +1294,451 @@ class DCNetwork(ContainernetWifi):
         :param tag: vlan tag to be used for this chain (pre-defined or new one if none is specified)
         :param skip_vlan_tag: boolean to indicate if a vlan tag should be appointed to this flow or not
         :param path: custom path between the two VNFs (list of switches)
+        :param ecmp: spread the flows of the chain over all equal-cost paths
+                     (and parallel links) using OpenFlow select groups
+        :param routing: 'load' to prefer links with a low utilization (see load_balancing),
+                        default: shortest path
+        :param max_delay: max. end-to-end delay of the path in ms (link delay)
+        :param min_bw: min. residual bandwidth of the path in Mbit/s, the bandwidth
+                       is reserved for the chain until it is removed
+        :param protect: also install a link-disjoint backup path, the first switch
+                        forwards the chain to a fast-failover group that switches to
+                        the backup path if the port of the primary path goes down
+        :param min_rate: guaranteed rate of the chain in Mbit/s
+        :param max_rate: max. rate of the chain in Mbit/s, a chain with a rate gets an
+                         HTB queue on every switch port it is sent out of (the OVS QoS
+                         replaces the tc configuration of these ports)
         :return: output log string
         """
 
-        # special procedure for monitoring flows
-        if kwargs.get('monitor'):
-
-            # check if chain already exists
-            found_chains = [chain_dict for chain_dict in self.installed_chains if
-                            (chain_dict['vnf_src_name'] == vnf_src_name and
-                             chain_dict['vnf_src_interface'] == vnf_src_interface and
-                             chain_dict['vnf_dst_name'] == vnf_dst_name and
-                             chain_dict['vnf_dst_interface'] == vnf_dst_interface)]
-
-            if len(found_chains) > 0:
-                # this chain exists, so need an extra monitoring flow
-                # assume only 1 chain per vnf/interface pair
-                LOG.debug('*** installing monitoring chain on top of pre-defined chain from {0}:{1} -> {2}:{3}'.
-                          format(vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface))
-                tag = found_chains[0]['tag']
-                ret = self._addMonitorFlow(vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface,
-                                           tag=tag, table_id=0, **kwargs)
-                return ret
-            else:
-                # no chain existing (or E-LAN) -> install normal chain
-                LOG.warning('*** installing monitoring chain without pre-defined NSD chain from {0}:{1} -> {2}:{3}'.
-                            format(vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface))
-                pass
+        request = dict(kwargs)
+        request.update({'vnf_src_name': vnf_src_name,
+                        'vnf_dst_name': vnf_dst_name,
+                        'vnf_src_interface': vnf_src_interface,
+                        'vnf_dst_interface': vnf_dst_interface})
+        return self.setChains([request])[0]['message']
 
-        cmd = kwargs.get('cmd', 'add-flow')
-        if cmd == 'add-flow' or cmd == 'del-flows':
+    def setChains(self, chain_requests, **kwargs):
+        """
+        Set up (or remove) many chains at once.
+        The flow entries of all chains are compiled first (paths between the
+        same switches are only computed once, see getShortestPath), then
+        grouped per switch and pushed to all switches in parallel.
+
+        :param chain_requests: list of dicts, each one with the arguments of setChain:
+                               vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface,
+                               cmd, cookie, match, priority, bidirectional, path, ...
+        :param kwargs: defaults for all chains (overridden by the single requests)
+        :return: list with one result dict per request (same order):
+                 {vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface,
+                  cmd, success, message, hops}
+        """
+        cmds = set(r.get('cmd', kwargs.get('cmd', 'add-flow')) for r in chain_requests)
+        if len(cmds) == 1:
+            operation = CHAIN_OPERATIONS.get(cmds.pop(), 'chain_other')
+        else:
+            operation = 'chain_mixed'
+        with self.chain_lock, self.timer.operation(operation, self.flow_backend):
+            return self._setChains(chain_requests, operation, **kwargs)
+
+    def _setChains(self, chain_requests, operation, **kwargs):
+        backend = self.flow_backend
+        compile_start = time.time()
+        results = [None] * len(chain_requests)
+        batch = FlowBatch()
+        # (request index, options, chains, entries slice, messages slice)
+        compiled = []
+
+        for i, request in enumerate(chain_requests):
+            options = dict(kwargs)
+            options.update(request)
+            options['cmd'] = options.get('cmd', 'add-flow')
+            vnf_src_name = options.pop('vnf_src_name')
+            vnf_dst_name = options.pop('vnf_dst_name')
+            vnf_src_interface = options.pop('vnf_src_interface', None)
+            vnf_dst_interface = options.pop('vnf_dst_interface', None)
+
+            # special procedure for monitoring flows
+            if options.get('monitor'):
+                tag = self._findChainTag(vnf_src_name, vnf_dst_name,
+                                         vnf_src_interface, vnf_dst_interface)
+                if tag is not None:
+                    # this chain exists, so need an extra monitoring flow
+                    # assume only 1 chain per vnf/interface pair
+                    LOG.debug('*** installing monitoring chain on top of pre-defined chain from {0}:{1} -> {2}:{3}'.
+                              format(vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface))
+                    ret = self._addMonitorFlow(vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface,
+                                               tag=tag, table_id=0, **options)
+                    results[i] = self._chainResult(request, options['cmd'], [ret], [])
+                    continue
+                else:
+                    # no chain existing (or E-LAN) -> install normal chain
+                    LOG.warning('*** installing monitoring chain without pre-defined NSD chain from {0}:{1} -> {2}:{3}'.
+                                format(vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface))
+
+            if options['cmd'] not in ['add-flow', 'del-flows']:
+                results[i] = self._chainResult(
+                    request, options['cmd'], ["Command unknown"], [], success=False)
+                continue
+
+            path = options.pop('path', None)
+            chains = [{'vnf_src_name': vnf_src_name,
+                       'vnf_dst_name': vnf_dst_name,
+                       'vnf_src_interface': vnf_src_interface,
+                       'vnf_dst_interface': vnf_dst_interface,
+                       'path': path}]
+            if options.get('bidirectional'):
+                if path is not None:
+                    path = list(reversed(path))
+                chains.append({'vnf_src_name': vnf_dst_name,
+                               'vnf_dst_name': vnf_src_name,
+                               'vnf_src_interface': vnf_dst_interface,
+                               'vnf_dst_interface': vnf_src_interface,
+                               'path': path})
+            first_entry = len(batch.entries)
+            first_message = len(batch.messages)
+            known_tags = set(self.installed_chains)
+            try:
+                self._compileChains(chains, batch, **options)
+            except Exception as ex:
+                # do not push a half compiled request and release everything
+                # its chains allocated so far
+                LOG.exception("Could not compile chain request {0}".format(request))
+                del batch.entries[first_entry:]
+                del batch.messages[first_message:]
+                for tag in set(self.installed_chains) - known_tags:
+                    self._releaseChainRecord(tag)
+                results[i] = self._chainResult(
+                    request, options['cmd'], [str(ex)], [], success=False)
+                continue
+            compiled.append((i, options, chains,
+                             (first_entry, len(batch.entries)),
+                             (first_message, len(batch.messages))))
+
+        self.timer.observe(operation, backend, 'compile', time.time() - compile_start)
+
+        with self.timer.phase(operation, backend, 'push'):
+            self._apply_flow_batch(batch)
+
+        for i, options, chains, entries, messages in compiled:
+            if options['cmd'] == 'del-flows':
+                if any(entry.status != 'ok' for entry in batch.entries[entries[0]:entries[1]]):
+                    # the flows may still be on the switches, so keep the
+                    # records (and their tags) until they are deleted
+                    LOG.warning("Keeping the chains of {0}, not all of their entries were deleted".format(
+                        chain_requests[i]))
+                    chains = []
+                for chain in chains:
+                    self._removeChainRecord(
+                        chain['vnf_src_name'], chain['vnf_dst_name'],
+                        chain['vnf_src_interface'], chain['vnf_dst_interface'])
+            results[i] = self._chainResult(
+                chain_requests[i], options['cmd'],
+                batch.messages[messages[0]:messages[1]],
+                batch.entries[entries[0]:entries[1]])
+        return results
+
+    def _findChainTag(self, vnf_src_name, vnf_dst_name,
+                      vnf_src_interface=None, vnf_dst_interface=None):
+        """
+        Tag of an installed (non-monitoring) chain, None if there is none.
+        """
+        chain_dict = self._findChain(vnf_src_name, vnf_dst_name,
+                                     vnf_src_interface, vnf_dst_interface)
+        if chain_dict is None:
+            return None
+        return chain_dict['tag']
+
+    def _findChain(self, vnf_src_name, vnf_dst_name,
+                   vnf_src_interface=None, vnf_dst_interface=None):
+        """
+        Record of an installed (non-monitoring) chain, None if there is none.
+        """
+        for chain_dict in self.installed_chains.values():
+            if (not chain_dict['monitor'] and
+                    chain_dict['vnf_src_name'] == vnf_src_name and
+                    chain_dict['vnf_src_interface'] == vnf_src_interface and
+                    chain_dict['vnf_dst_name'] == vnf_dst_name and
+                    chain_dict['vnf_dst_interface'] == vnf_dst_interface):
+                return chain_dict
+        return None
+
+    def _chainResult(self, request, cmd, messages, entries, success=None):
+        part = FlowBatch()
+        part.messages = list(messages)
+        part.entries = list(entries)
+        result = FlowBatchResult(part, None)
+        if success is None:
+            # _chainAddFlow only returns a success message if it found a path
+            success = result.success and all(
+                str(m).startswith('success') or str(m).startswith('path')
+                for m in messages)
+        return {'vnf_src_name': request.get('vnf_src_name'),
+                'vnf_dst_name': request.get('vnf_dst_name'),
+                'vnf_src_interface': request.get('vnf_src_interface'),
+                'vnf_dst_interface': request.get('vnf_dst_interface'),
+                'cmd': cmd,
+                'success': success,
+                'message': str(result),
+                'hops': result.hops}
+
+    def programChains(self, chains, **kwargs):
+        """
+        Compile the flow entries of all given chains first and push them to the
+        switches afterwards. Switches are programmed in parallel, the entries of
+        a single switch are pushed in order.
+
+        :param chains: list of dicts with the keys vnf_src_name, vnf_dst_name,
+                       vnf_src_interface, vnf_dst_interface and (optional) path.
+                       Any other key (e.g. match) overrides the shared flow option.
+        :param kwargs: flow options shared by all chains (see setChain)
+        :return: FlowBatchResult listing the outcome of every hop
+        """
+        batch = FlowBatch()
+        with self.chain_lock:
+            self._compileChains(chains, batch, **kwargs)
+            return self._apply_flow_batch(batch)
+
+    def _compileChains(self, chains, batch, **kwargs):
+        endpoint_keys = ['vnf_src_name', 'vnf_dst_name',
+                         'vnf_src_interface', 'vnf_dst_interface']
+        for chain in chains:
+            options = dict(kwargs)
+            options.update((k, v) for k, v in chain.items()
+                           if k not in endpoint_keys and v is not None)
             ret = self._chainAddFlow(
-                vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface, **kwargs)
-            if kwargs.get('bidirectional'):
-                if kwargs.get('path') is not None:
-                    kwargs['path'] = list(reversed(kwargs.get('path')))
-                ret = ret + '\n' + \
-                    self._chainAddFlow(
-                        vnf_dst_name, vnf_src_name, vnf_dst_interface, vnf_src_interface, **kwargs)
+                chain['vnf_src_name'], chain['vnf_dst_name'],
+                chain.get('vnf_src_interface'), chain.get('vnf_dst_interface'),
+                batch=batch, **options)
+            batch.messages.append(ret)
 
+    def _removeChainRecord(self, vnf_src_name, vnf_dst_name,
+                           vnf_src_interface=None, vnf_dst_interface=None):
+        """
+        Forget an installed chain and release its vlan tag.
+        Interfaces that are not given match any interface.
+        :return: list of FlowEntries removing the shared entries of path
+                 labels that are no longer used by any chain
+        """
+        vnf_dst_name = vnf_dst_name.split(':')[0]
+        removed = []
+        with self.chain_lock:
+            for tag, chain_dict in list(self.installed_chains.items()):
+                if chain_dict['vnf_src_name'] != vnf_src_name or \
+                        chain_dict['vnf_dst_name'] != vnf_dst_name:
+                    continue
+                if vnf_src_interface is not None and \
+                        chain_dict['vnf_src_interface'] != vnf_src_interface:
+                    continue
+                if vnf_dst_interface is not None and \
+                        chain_dict['vnf_dst_interface'] != vnf_dst_interface:
+                    continue
+                removed.extend(self._releaseChainRecord(tag))
+        return removed
+
+    def _releaseChainRecord(self, tag):
+        """
+        Forget the chain with the given tag and release everything it
+        allocated (tag, path label, reservation, group id, queue).
+        :return: list of FlowEntries removing the shared entries of its
+                 path label if no other chain uses the label
+        """
+        chain_dict = self.installed_chains.pop(tag)
+        self.chain_edges.remove(tag)
+        removed = [self._removal_entry(entry) for entry in
+                   self.path_labels.release(tag, chain_dict.get('path_label'))]
+        if chain_dict.get('reservation') is not None:
+            self.reservations.release(chain_dict['reservation'])
+        if chain_dict.get('group_id') is not None:
+            self.group_ids.free(chain_dict['group_id'], owner=chain_dict['group_owner'])
+        if chain_dict.get('queue_id') is not None:
+            self.qos.remove(chain_dict['queue_owner'])
+            self.queue_ids.free(chain_dict['queue_id'], owner=chain_dict['queue_owner'])
+        if self.chain_labels is self.vlans:
+            self._release_vlan(tag, owner=chain_dict['owner'])
         else:
-            ret = "Command unknown"
+            self.chain_labels.free(tag, owner=chain_dict['owner'])
+        return removed
 
-        return ret
+    def _hop_payload_types(self, index, path, label, match=None):
+        """
+        MPLS chains need a separate entry per payload ethertype at their
+        first and last switch (see labels.MPLS_PAYLOAD_TC).
+        :return: list of ethertypes, [None] if a single entry is enough
+        """
+        if self.label_mode != LABEL_MODE_MPLS or label is None or \
+                len(path) < 2 or 0 < index < len(path) - 1:
+            return [None]
+        return mpls_payload_types(match)
+
+    def _label_match_input(self, match_input, index, path):
+        """
+        Custom matches can only be applied before the MPLS label is pushed,
+        OVS does not look into the payload of MPLS packets.
+        """
+        if self.label_mode == LABEL_MODE_MPLS and path is not None \
+                and len(path) > 1 and index:
+            return None
+        return match_input
+
+    def _apply_flow_batch(self, batch):
+        push_bundle = self._push_flow_bundle if self.ofctl_bundles else None
+        return apply_flow_batch(batch, self._push_flow_entry, self.flow_workers,
+                                push_bundle=push_bundle)
+
+    def _push_flow_bundle(self, switch, entries):
+        """
+        Push all ovs-ofctl entries of a switch in one bundle
+        (one process per switch instead of one per entry).
+        """
+        groups = [e for e in entries if e.cmd in OFCTL_GROUP_COMMANDS]
+        entries = [e for e in entries if e.cmd not in OFCTL_GROUP_COMMANDS]
+        # groups can not be bundled, add them before the flows using them
+        for entry in groups:
+            if entry.cmd == 'add-group':
+                switch.dpctl(entry.cmd, entry.ofcmd)
+        self._set_entry_vlan_tags(*entries)
+        for entry in entries:
+            self._index_cookie(entry)
+        push_ofctl_bundle(
+            switch, [ofctl_bundle_line(e.cmd, e.ofcmd) for e in entries])
+        for entry in groups:
+            if entry.cmd == 'del-groups':
+                switch.dpctl(entry.cmd, entry.ofcmd)
+        LOG.info("{0} flow entries in switch: {1} (bundle)".format(
+            len(entries), switch.name))
+
+    def _push_flow_entry(self, entry):
+        """
+        Push a single compiled FlowEntry to its switch.
+        Raises an exception if the switch (or Ryu) rejects it.
+        :return: Future of the Ryu request (None for ovs-ofctl)
+        """
+        self._set_entry_vlan_tags(entry)
+        self._index_cookie(entry)
+        if entry.flow is not None:
+            # remember the intended state, even if the request fails
+            self.flow_table.apply(entry.cmd, entry.flow,
+                                  strict=entry.prefix == 'stats/flowentry/delete_strict')
+            # set flow entry via ryu rest api, do not wait for the reply,
+            # but keep the order of the entries of a switch
+            return self.ryu.submit(entry.prefix, data=entry.flow, check=True,
+                                   key=entry.switch.name)
+        else:
+            # set flow entry via ovs-ofctl
+            entry.switch.dpctl(entry.cmd, entry.ofcmd)
+            LOG.info("{1} in switch: {0} flow: {2}".format(
+                entry.switch.name, entry.cmd, entry.ofcmd))
+
+    def _set_entry_vlan_tags(self, *entries):
+        # the ports of all given entries are changed in one transaction
+        ports = [(entry.switch, port_name, tag)
+                 for entry in entries for port_name, tag in entry.vlan_ports or []]
+        if not ports:
+            return
+        with self.timer.phase(CHAIN_OPERATIONS.get(entries[0].cmd, 'chain_other'),
+                              self.flow_backend, 'vlan_tag'):
+            self._set_vlan_tags(ports)
+
+    def _index_cookie(self, entry):
+        # deletions can leave other flows with the same cookie on the
+        # switch, so only additions update the index
+        if entry.cmd == 'add-flow':
+            self.cookie_index.add(entry.cookie, int(entry.switch.dpid, 16))
 
     def _chainAddFlow(self, vnf_src_name, vnf_dst_name,
-                      vnf_src_interface=None, vnf_dst_interface=None, **kwargs):
+                      vnf_src_interface=None, vnf_dst_interface=None,
+                      batch=None, **kwargs):
+        """
+        Compile the flow entries of a single chain into the given FlowBatch.
+        If no batch is given, the entries are pushed right away.
+        """
+        if batch is None:
+            batch = FlowBatch()
+            ret = self._chainAddFlow(vnf_src_name, vnf_dst_name, vnf_src_interface,
+                                     vnf_dst_interface, batch=batch, **kwargs)
+            self._apply_flow_batch(batch)
+            return ret
 
         src_sw = None
-        src_sw_inport_nr = 0
-        src_sw_inport_name = None
         dst_sw = None
-        dst_sw_outport_nr = 0
-        dst_sw_outport_name = None
 
         LOG.debug("call chainAddFlow vnf_src_name=%r, vnf_src_interface=%r, vnf_dst_name=%r, vnf_dst_interface=%r",
                   vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface)
 
-        # check if port is specified (vnf:port)
-        if vnf_src_interface is None:
-            # take first interface by default
-            connected_sw = list(self.DCNetwork_graph.neighbors(vnf_src_name))[0]
-            link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-            vnf_src_interface = link_dict[0]['src_port_id']
-
-        for connected_sw in self.DCNetwork_graph.neighbors(vnf_src_name):
-            link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-            for link in link_dict:
-                if (link_dict[link]['src_port_id'] == vnf_src_interface or
-                        link_dict[link]['src_port_name'] == vnf_src_interface):  # Fix: we might also get interface names, e.g, from a son-emu-cli call
-                    # found the right link and connected switch
-                    src_sw = connected_sw
-                    src_sw_inport_nr = link_dict[link]['dst_port_nr']
-                    src_sw_inport_name = link_dict[link]['dst_port_name']
-                    break
-
-        if vnf_dst_interface is None:
-            # take first interface by default
-            connected_sw = list(self.DCNetwork_graph.neighbors(vnf_dst_name))[0]
-            link_dict = self.DCNetwork_graph[connected_sw][vnf_dst_name]
-            vnf_dst_interface = link_dict[0]['dst_port_id']
+        # check if port is specified (vnf:port), else take first interface
+        # (we might also get interface names, e.g, from a son-emu-cli call)
+        src_port = self.getConnectedSwitchPort(vnf_src_name, vnf_src_interface)
+        if src_port is not None:
+            if vnf_src_interface is None:
+                vnf_src_interface = src_port.intf_id
+            src_sw = src_port.switch
 
         vnf_dst_name = vnf_dst_name.split(':')[0]
-        for connected_sw in self.DCNetwork_graph.neighbors(vnf_dst_name):
-            link_dict = self.DCNetwork_graph[connected_sw][vnf_dst_name]
-            for link in link_dict:
-                if link_dict[link]['dst_port_id'] == vnf_dst_interface or \
-                        link_dict[link]['dst_port_name'] == vnf_dst_interface:  # Fix: we might also get interface names, e.g, from a son-emu-cli call
-                    # found the right link and connected switch
-                    dst_sw = connected_sw
-                    dst_sw_outport_nr = link_dict[link]['src_port_nr']
-                    dst_sw_outport_name = link_dict[link]['src_port_name']
-                    break
-
-        path = kwargs.get('path')
+        dst_port = self.getConnectedSwitchPort(vnf_dst_name, vnf_dst_interface)
+        if dst_port is not None:
+            if vnf_dst_interface is None:
+                vnf_dst_interface = dst_port.intf_id
+            dst_sw = dst_port.switch
+
+        if kwargs.get('path') is None and src_sw is not None and dst_sw is not None \
+                and src_sw != dst_sw:
+            constrained = kwargs.get('max_delay') or kwargs.get('min_bw')
+            if kwargs.get('ecmp') and not constrained and kwargs.get('cmd') == 'add-flow' or \
+                    kwargs.get('cmd') == 'del-flows' and self._findEcmpChains(
+                        vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface):
+                return self._chainAddFlowEcmp(
+                    vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface,
+                    src_port, dst_port, batch, **kwargs)
+
+        chain_label = "{0}:{1}->{2}:{3}".format(
+            vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface)
+
+        record = None
+        if kwargs.get('cmd') == 'del-flows' and kwargs.get('path') is None:
+            # remove the chain from the path it was installed on
+            record = self._findChain(vnf_src_name, vnf_dst_name,
+                                     vnf_src_interface, vnf_dst_interface)
+            if record is not None and record.get('path') is not None:
+                if record.get('path_label') is not None or \
+                        not path_alive(self.DCNetwork_graph, record['path']):
+                    # chains with a path label (their other entries are shared)
+                    # and chains whose path is gone are removed with exactly
+                    # the entries they installed
+                    for entry in record.get('entries', []) + record.get('backup_entries', []):
+                        batch.add(self._removal_entry(entry), chain=chain_label, hop=entry.hop)
+                    for entry in self.path_labels.release(record['tag'], record.get('path_label')):
+                        batch.add(self._removal_entry(entry), chain=chain_label, hop=entry.hop)
+                    return "success: del-flows between {0} and {1} (recorded entries)".format(
+                        vnf_src_name, vnf_dst_name)
+                kwargs['path'] = record['path']
+
+        path = kwargs.pop('path', None)
+        custom_path = path is not None
+        if path is None and kwargs.get('cmd') == 'add-flow' and \
+                (kwargs.get('max_delay') or kwargs.get('min_bw')):
+            try:
+                path = self.getConstrainedPath(
+                    src_sw, dst_sw, max_delay=kwargs.get('max_delay'),
+                    min_bw=kwargs.get('min_bw'), weight=kwargs.get('weight'))
+            except NoFeasiblePath as ex:
+                LOG.warning("No feasible path between {0} and {1}: {2}".format(
+                    vnf_src_name, vnf_dst_name, ex))
+                return "No feasible path between {0} and {1}: {2}".format(
+                    vnf_src_name, vnf_dst_name, ex)
+        if path is None and kwargs.get('cmd') == 'add-flow' and \
+                kwargs.get('routing') == 'load':
+            try:
+                path = self.getLoadAwarePath(src_sw, dst_sw)
+            except BaseException:
+                LOG.exception("No load-aware path between {0} and {1}".format(src_sw, dst_sw))
         if path is None:
             # get shortest path
             try:
                 # returns the first found shortest path
                 # if all shortest paths are wanted, use: all_shortest_paths
-                path = nx.shortest_path(
-                    self.DCNetwork_graph, src_sw, dst_sw, weight=kwargs.get('weight'))
+                path = self.getShortestPath(
+                    src_sw, dst_sw, weight=kwargs.get('weight'))
             except BaseException:
                 LOG.exception("No path could be found between {0} and {1} using src_sw={2} and dst_sw={3}".format(
                     vnf_src_name, vnf_dst_name, src_sw, dst_sw))
@@ -702,91 +1752,528 @@ class DCNetwork(ContainernetWifi):
         LOG.debug("Creating path between {0} and {1}: {2}".format(
             vnf_src_name, vnf_dst_name, path))
 
-        current_hop = src_sw
-        switch_inport_nr = src_sw_inport_nr
-
         # choose free vlan
         cmd = kwargs.get('cmd')
-        vlan = None
-        if cmd == 'add-flow':
-            if kwargs.get('tag'):
-                # use pre-defined tag
-                vlan = kwargs.get('tag')
-            else:
-                vlan = self.vlans.pop()
+        vlan, chain_dict = self._allocateChainLabel(
+            chain_label, vnf_src_name, vnf_dst_name,
+            vnf_src_interface, vnf_dst_interface, **kwargs)
+        if kwargs.get('min_bw') and chain_dict is not None:
+            self.reservations.reserve(chain_label, path, float(kwargs.get('min_bw')))
+            chain_dict['reservation'] = chain_label
+        backup = None
+        if chain_dict is not None:
+            # needed to move the chain to another path later on
+            chain_dict['path'] = list(path)
+            chain_dict['options'] = dict((k, kwargs.get(k)) for k in CHAIN_OPTIONS)
+            chain_dict['pinned'] = bool(custom_path or kwargs.get('max_delay') or
+                                        kwargs.get('min_bw'))
+            if kwargs.get('protect'):
+                backup = self.getBackupPath(path, weight=kwargs.get('weight'))
+                if backup is None:
+                    LOG.warning("No backup path for chain {0}, it is not protected".format(
+                        chain_label))
+            if kwargs.get('min_rate') or kwargs.get('max_rate'):
+                chain_dict['queue_id'] = self.queue_ids.allocate(owner=chain_label)
+                chain_dict['queue_owner'] = chain_label
+                kwargs['queue_id'] = chain_dict['queue_id']
+                self._addChainQueues(chain_dict, [path, backup], dst_port)
+
+        # protected chains: fast-failover group at the first switch and
+        # the entries of the backup path behind it
+        group_id = None
+        backup_batch = FlowBatch()
+        if backup is not None:
+            group_id = self.group_ids.allocate(owner=chain_label)
+            if chain_dict is not None:
+                chain_dict['group_id'] = group_id
+                chain_dict['group_owner'] = chain_label
+            backup_batch.add(self._compile_failover_group(path, backup, group_id),
+                             chain=chain_label, hop=0)
+            self._compileChainPath(backup, src_port, dst_port, vlan, chain_label,
+                                   backup_batch, hops=range(1, len(backup)), **kwargs)
+
+        # two-table pipeline: only the entry of the first switch is compiled
+        # for the chain, the path label forwards it behind that switch
+        hops = None
+        label_entry = len(batch.entries)
+        if self._usePathLabel(chain_dict, path, **kwargs):
+            kwargs['path_label'] = chain_dict['path_label'] = self._acquirePathLabel(
+                chain_dict['tag'], path, dst_port, chain_label, batch)
+            hops = [0]
+
+        # iterate through the path to compile the flow-entries
+        first_entry = len(batch.entries)
+        ret = self._compileChainPath(path, src_port, dst_port, vlan, chain_label,
+                                     batch, hops=hops, group_id=group_id, **kwargs)
+        if ret is not None:
+            # nothing of this chain is pushed
+            del batch.entries[label_entry:]
+            if chain_dict is not None:
+                self._releaseChainRecord(chain_dict['tag'])
+            elif group_id is not None:
+                self.group_ids.free(group_id, owner=chain_label)
+            return ret
+        if chain_dict is not None:
+            # entries as installed, the chain can be moved or removed
+            # with them even if its path is gone from the graph
+            chain_dict['entries'] = batch.entries[first_entry:]
+            chain_dict['backup'] = backup
+            chain_dict['backup_entries'] = backup_batch.entries
+            chain_dict['path_label'] = kwargs.get('path_label')
+            self.chain_edges.add(vlan, [path, backup])
+        if backup_batch.entries:
+            # the group has to exist before the entry that points to it
+            batch.entries.insert(first_entry, backup_batch.entries[0])
+            batch.entries.extend(backup_batch.entries[1:])
+        if cmd == 'del-flows' and record is not None:
+            for entry in record.get('backup_entries', []):
+                batch.add(self._removal_entry(entry), chain=chain_label, hop=entry.hop)
 
-        # store the used vlan tag to identify this chain
-        if not kwargs.get('monitor'):
-            chain_dict = {}
-            chain_dict['vnf_src_name'] = vnf_src_name
-            chain_dict['vnf_dst_name'] = vnf_dst_name
-            chain_dict['vnf_src_interface'] = vnf_src_interface
-            chain_dict['vnf_dst_interface'] = vnf_dst_interface
-            chain_dict['tag'] = vlan
-            self.installed_chains.append(chain_dict)
-
-        # iterate through the path to install the flow-entries
+        flow_options = {
+            'priority': kwargs.get('priority', DEFAULT_PRIORITY),
+            'cookie': kwargs.get('cookie', DEFAULT_COOKIE),
+            'vlan': vlan,
+            'path': path,
+            'backup_path': backup,
+            'path_label': kwargs.get('path_label'),
+            'match_input': kwargs.get('match')
+        }
+        flow_options_str = json.dumps(flow_options, indent=1)
+        LOG.info("Compiled flow rule: ({}:{}) -> ({}:{}) with options: {}"
+                 .format(vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface, flow_options))
+        return "success: {2} between {0} and {1} with options: {3}".format(
+            vnf_src_name, vnf_dst_name, cmd, flow_options_str)
+
+    def _usePathLabel(self, chain_dict, path, **kwargs):
+        """
+        Chains with a per chain treatment behind the first switch (backup
+        path, monitoring, queues) do not use the two-table pipeline.
+        """
+        return self.pipeline and chain_dict is not None and len(path) > 1 and \
+            kwargs.get('cmd') == 'add-flow' and \
+            not any(kwargs.get(k) for k in ['protect', 'monitor', 'min_rate', 'max_rate'])
+
+    def _acquirePathLabel(self, owner, path, dst_port, chain_label, batch):
+        """
+        Reference the path label of a chain. The shared entries of a new
+        label and the table 0 entries of switches that get their first
+        label are compiled into the batch.
+        :return: path label
+        """
+        label, created, switches = self.path_labels.acquire(owner, path, dst_port.port_nr)
+        if created:
+            entries = []
+            for i, node_name in enumerate(path):
+                if i < len(path) - 1:
+                    port = self.DCNetwork_graph[node_name][path[i + 1]][0]['src_port_nr']
+                else:
+                    port = dst_port.port_nr
+                entries.append(batch.add(self._compile_path_entry(
+                    self.getNodeByName(node_name), label, port, pop=i == len(path) - 1),
+                    chain=chain_label, hop=i))
+            self.path_labels.set_entries(label, entries)
+        for node_name in switches:
+            self.path_labels.set_switch_entry(node_name, batch.add(
+                self._compile_label_block_entry(self.getNodeByName(node_name)),
+                chain=chain_label))
+        return label
+
+    def _compile_path_entry(self, node, label, port, pop=False):
+        """
+        Shared table 1 entry of a path label at a switch.
+        :return: FlowEntry
+        """
+        if self.controller == RemoteController:
+            return FlowEntry(node, 'add-flow', prefix='stats/flowentry/add',
+                             flow=path_entry_ryu(int(node.dpid, 16), label, port, pop),
+                             cookie=PATH_COOKIE)
+        return FlowEntry(node, 'add-flow', ofcmd=path_entry_ofctl(label, port, pop),
+                         cookie=PATH_COOKIE)
+
+    def _compile_label_block_entry(self, node):
+        """
+        Table 0 entry that sends all packets with a path label to table 1.
+        :return: FlowEntry
+        """
+        if self.controller == RemoteController:
+            return FlowEntry(node, 'add-flow', prefix='stats/flowentry/add',
+                             flow=label_block_ryu(int(node.dpid, 16)), cookie=PATH_COOKIE)
+        return FlowEntry(node, 'add-flow', ofcmd=label_block_ofctl(), cookie=PATH_COOKIE)
+
+    def getPathLabels(self):
+        """
+        Path labels of the two-table pipeline.
+        :return: list of dicts {label, path, port, chains}
+        """
+        return self.path_labels.to_list()
+
+    def _compileChainPath(self, path, src_port, dst_port, vlan, chain_label, batch,
+                          hops=None, group_id=None, **kwargs):
+        """
+        Compile the flow entries of a chain along a path of switches.
+        :param src_port: switch port of the source VNF interface
+        :param dst_port: switch port of the destination VNF interface
+        :param hops: indexes of the switches of the path to compile (default: all)
+        :param group_id: group the first switch forwards the chain to (protected chains)
+        :return: error message, None if the path was compiled
+        """
+        current_hop = src_port.switch
+        switch_inport_nr = src_port.port_nr
         for i in range(0, len(path)):
             current_node = self.getNodeByName(current_hop)
 
             if i < len(path) - 1:
                 next_hop = path[i + 1]
-            else:
-                # last switch reached
-                next_hop = vnf_dst_name
-
-            next_node = self.getNodeByName(next_hop)
-
-            if next_hop == vnf_dst_name:
-                switch_outport_nr = dst_sw_outport_nr
-                LOG.debug("end node reached: {0}".format(vnf_dst_name))
-            elif not isinstance(next_node, OVSSwitch):
-                LOG.info("Next node: {0} is not a switch".format(next_hop))
-                return "Next node: {0} is not a switch".format(next_hop)
-            else:
+                next_node = self.getNodeByName(next_hop)
+                if not isinstance(next_node, OVSSwitch):
+                    LOG.info("Next node: {0} is not a switch".format(next_hop))
+                    return "Next node: {0} is not a switch".format(next_hop)
                 # take first link between switches by default
                 index_edge_out = 0
                 switch_outport_nr = self.DCNetwork_graph[current_hop][next_hop][index_edge_out]['src_port_nr']
+            else:
+                # last switch reached
+                next_node = None
+                switch_outport_nr = dst_port.port_nr
+                LOG.debug("end node reached: {0}".format(chain_label))
 
             # set OpenFlow entry
-            if isinstance(current_node, OVSSwitch):
+            if isinstance(current_node, OVSSwitch) and (hops is None or i in hops):
                 kwargs['vlan'] = vlan
                 kwargs['path'] = path
                 kwargs['current_hop'] = current_hop
-                kwargs['switch_inport_name'] = src_sw_inport_name
-                kwargs['switch_outport_name'] = dst_sw_outport_name
+                kwargs['switch_inport_name'] = src_port.port_name
+                kwargs['switch_outport_name'] = dst_port.port_name
                 kwargs['pathindex'] = i
+                kwargs['group_id'] = group_id if i == 0 else None
 
-                if self.controller == RemoteController:
-                    # set flow entry via ryu rest api
-                    self._set_flow_entry_ryu_rest(
-                        current_node, switch_inport_nr, switch_outport_nr, **kwargs)
-                else:
-                    # set flow entry via ovs-ofctl
-                    self._set_flow_entry_dpctl(
+                for eth_type in self._hop_payload_types(i, path, vlan, kwargs.get('match')):
+                    kwargs['eth_type'] = eth_type
+                    entry = self._compile_chain_entry(
                         current_node, switch_inport_nr, switch_outport_nr, **kwargs)
+                    batch.add(entry, chain=chain_label, hop=i)
 
             # take first link between switches by default
             if isinstance(next_node, OVSSwitch):
                 switch_inport_nr = self.DCNetwork_graph[current_hop][next_hop][0]['dst_port_nr']
                 current_hop = next_hop
+        return None
+
+    def _allocateChainLabel(self, chain_label, vnf_src_name, vnf_dst_name,
+                            vnf_src_interface, vnf_dst_interface, **kwargs):
+        """
+        Choose the vlan tag (or MPLS label) of a new chain and record the chain.
+        :return: (tag, chain_dict), (None, None) if no tag is needed
+        """
+        vlan = None
+        owner = None
+        if kwargs.get('cmd') == 'add-flow':
+            if kwargs.get('tag'):
+                # use pre-defined tag (owned by the caller, never released here)
+                vlan = kwargs.get('tag')
+            else:
+                owner = chain_label
+                vlan = self.chain_labels.allocate(owner=owner)
+
+        # store the used vlan tag to identify this chain
+        if vlan is None:
+            return None, None
+        chain_dict = {}
+        chain_dict['vnf_src_name'] = vnf_src_name
+        chain_dict['vnf_dst_name'] = vnf_dst_name
+        chain_dict['vnf_src_interface'] = vnf_src_interface
+        chain_dict['vnf_dst_interface'] = vnf_dst_interface
+        chain_dict['tag'] = vlan
+        chain_dict['owner'] = owner
+        chain_dict['monitor'] = bool(kwargs.get('monitor'))
+        self.installed_chains[vlan] = chain_dict
+        return vlan, chain_dict
+
+    def _findEcmpChains(self, vnf_src_name, vnf_dst_name,
+                        vnf_src_interface=None, vnf_dst_interface=None):
+        """
+        Installed ECMP chains between two VNFs (interfaces that are not
+        given match any interface).
+        """
+        vnf_dst_name = vnf_dst_name.split(':')[0]
+        return [chain_dict for chain_dict in self.installed_chains.values()
+                if 'ecmp' in chain_dict and
+                chain_dict['vnf_src_name'] == vnf_src_name and
+                chain_dict['vnf_dst_name'] == vnf_dst_name and
+                vnf_src_interface in (None, chain_dict['vnf_src_interface']) and
+                vnf_dst_interface in (None, chain_dict['vnf_dst_interface'])]
+
+    def _chainAddFlowEcmp(self, vnf_src_name, vnf_dst_name, vnf_src_interface,
+                          vnf_dst_interface, src_port, dst_port, batch, **kwargs):
+        """
+        Compile a chain whose flows are spread over all equal-cost paths
+        between the source and destination switch. Switches with more than
+        one port towards the destination (several next hops or parallel
+        links) forward the chain to a select group that hashes the flows
+        over these ports. One group id is used per chain.
+        """
+        cmd = kwargs.get('cmd')
+        chain_label = "{0}:{1}->{2}:{3}".format(
+            vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface)
+        if kwargs.get('min_rate') or kwargs.get('max_rate'):
+            LOG.warning("min_rate/max_rate are ignored for the ECMP chain {0}".format(chain_label))
+
+        if cmd == 'del-flows':
+            for chain_dict in self._findEcmpChains(
+                    vnf_src_name, vnf_dst_name, vnf_src_interface, vnf_dst_interface):
+                # remove the flows of every hop that was installed, the
+                # groups are removed with them
+                for hop in chain_dict['ecmp']['hops']:
+                    node = self.getNodeByName(hop['switch'])
+                    kwargs['path'] = hop['path']
+                    kwargs['pathindex'] = hop['index']
+                    for in_port in hop['in_ports']:
+                        batch.add(self._compile_chain_entry(
+                            node, in_port, hop['out_ports'][0], **kwargs),
+                            chain=chain_label, hop=hop['index'])
+                for switch_name in chain_dict['ecmp']['groups']:
+                    batch.add(self._compile_group_entry(
+                        self.getNodeByName(switch_name), 'del-groups',
+                        chain_dict['group_id']), chain=chain_label)
+            return "success: {2} between {0} and {1} (ecmp)".format(
+                vnf_src_name, vnf_dst_name, cmd)
+
+        try:
+            paths = equal_cost_paths(self.DCNetwork_graph, src_port.switch,
+                                     dst_port.switch, weight=kwargs.get('weight'))
+        except BaseException:
+            LOG.exception("No path could be found between {0} and {1}".format(
+                vnf_src_name, vnf_dst_name))
+            return "No path could be found between {0} and {1}".format(
+                vnf_src_name, vnf_dst_name)
+        dag = EcmpDag(self.DCNetwork_graph, paths)
+        LOG.debug("Creating ECMP chain between {0} and {1}: {2}".format(
+            vnf_src_name, vnf_dst_name, paths))
+
+        vlan, chain_dict = self._allocateChainLabel(
+            chain_label, vnf_src_name, vnf_dst_name,
+            vnf_src_interface, vnf_dst_interface, **kwargs)
+        group_id = None
+        hops = []
+        groups = []
+        for node_name in dag.nodes:
+            node = self.getNodeByName(node_name)
+            path, index = dag.positions[node_name]
+            if node_name == dag.src:
+                in_ports = [src_port.port_nr]
+            else:
+                in_ports = dag.in_ports(node_name)
+            if node_name == dag.dst:
+                out_ports = [dst_port.port_nr]
+            else:
+                out_ports = dag.out_ports(node_name)
+
+            kwargs['group_id'] = None
+            if len(out_ports) > 1:
+                if group_id is None:
+                    group_id = self.group_ids.allocate(owner=chain_label)
+                kwargs['group_id'] = group_id
+                batch.add(self._compile_group_entry(
+                    node, 'add-group', group_id, out_ports),
+                    chain=chain_label, hop=index)
+                groups.append(node_name)
+
+            kwargs['vlan'] = vlan
+            kwargs['path'] = path
+            kwargs['current_hop'] = node_name
+            kwargs['switch_inport_name'] = src_port.port_name
+            kwargs['switch_outport_name'] = dst_port.port_name
+            kwargs['pathindex'] = index
+            for in_port in in_ports:
+                for eth_type in self._hop_payload_types(index, path, vlan, kwargs.get('match')):
+                    kwargs['eth_type'] = eth_type
+                    batch.add(self._compile_chain_entry(
+                        node, in_port, out_ports[0], **kwargs),
+                        chain=chain_label, hop=index)
+            hops.append({'switch': node_name, 'in_ports': in_ports,
+                         'out_ports': out_ports, 'path': path, 'index': index})
+
+        if chain_dict is not None:
+            chain_dict['ecmp'] = {'paths': paths, 'hops': hops, 'groups': groups}
+            self.chain_edges.add(vlan, paths)
+            chain_dict['group_id'] = group_id
+            chain_dict['group_owner'] = chain_label
+        elif group_id is not None:
+            # nothing to remember the group by
+            self.group_ids.free(group_id, owner=chain_label)
 
         flow_options = {
             'priority': kwargs.get('priority', DEFAULT_PRIORITY),
             'cookie': kwargs.get('cookie', DEFAULT_COOKIE),
-            'vlan': kwargs['vlan'],
-            'path': kwargs['path'],
+            'vlan': vlan,
+            'paths': paths,
+            'group_id': group_id,
             'match_input': kwargs.get('match')
         }
-        flow_options_str = json.dumps(flow_options, indent=1)
-        LOG.info("Installed flow rule: ({}:{}) -> ({}:{}) with options: {}"
+        LOG.info("Compiled ECMP flow rule: ({}:{}) -> ({}:{}) with options: {}"
                  .format(vnf_src_name, vnf_src_interface, vnf_dst_name, vnf_dst_interface, flow_options))
         return "success: {2} between {0} and {1} with options: {3}".format(
-            vnf_src_name, vnf_dst_name, cmd, flow_options_str)
+            vnf_src_name, vnf_dst_name, cmd, json.dumps(flow_options, indent=1))
+
+    def _compile_chain_entry(self, node, switch_inport_nr, switch_outport_nr, **kwargs):
+        if self.controller == RemoteController:
+            return self._compile_flow_entry_ryu_rest(
+                node, switch_inport_nr, switch_outport_nr, **kwargs)
+        return self._compile_flow_entry_dpctl(
+            node, switch_inport_nr, switch_outport_nr, **kwargs)
+
+    def _compile_group_entry(self, node, cmd, group_id, ports=None, group_type=GROUP_SELECT):
+        """
+        Add ('add-group') or remove ('del-groups') the group of a chain: the select
+        group of an ECMP chain or the fast-failover group of a protected chain.
+        Groups are applied before the flows that point to them.
+        :return: FlowEntry
+        """
+        dpid = int(node.dpid, 16)
+        if self.controller == RemoteController:
+            if cmd == 'add-group':
+                if group_type == GROUP_FAST_FAILOVER:
+                    group = fast_failover_group_ryu(dpid, group_id, ports)
+                else:
+                    group = select_group_ryu(dpid, group_id, ports)
+                return FlowEntry(node, cmd, prefix='stats/groupentry/add',
+                                 flow=group, wait=True)
+            return FlowEntry(node, cmd, prefix='stats/groupentry/delete',
+                             flow={'dpid': dpid, 'group_id': group_id})
+        if cmd == 'add-group':
+            if group_type == GROUP_FAST_FAILOVER:
+                group = fast_failover_group_ofctl(group_id, ports)
+            else:
+                group = select_group_ofctl(group_id, ports)
+            return FlowEntry(node, cmd, ofcmd=group, wait=True)
+        return FlowEntry(node, cmd, ofcmd='-O OpenFlow13 group_id=%s' % group_id)
+
+    def _compile_failover_group(self, path, backup, group_id):
+        """
+        Fast-failover group at the first switch of a protected chain: output
+        to the primary path, to the backup path if that port is down.
+        """
+        ports = [self.DCNetwork_graph[p[0]][p[1]][0]['src_port_nr'] for p in [path, backup]]
+        return self._compile_group_entry(self.getNodeByName(path[0]), 'add-group', group_id,
+                                         ports, group_type=GROUP_FAST_FAILOVER)
+
+    def getChainGroups(self, stats=False):
+        """
+        Groups of the installed chains: select groups of ECMP chains and
+        fast-failover groups of protected chains.
+        :param stats: add the per bucket counters of the groups (Ryu only)
+        :return: list of dicts {chain, group_id, type, switches, paths(, stats)}
+        """
+        groups = []
+        for chain_dict in self.installed_chains.values():
+            if chain_dict.get('group_id') is None:
+                continue
+            if 'ecmp' in chain_dict:
+                group_type = GROUP_SELECT
+                switches = list(chain_dict['ecmp']['groups'])
+                paths = chain_dict['ecmp']['paths']
+            else:
+                group_type = GROUP_FAST_FAILOVER
+                switches = [chain_dict['path'][0]]
+                paths = [chain_dict['path'], chain_dict['backup']]
+            groups.append({
+                'chain': chain_dict['group_owner'],
+                'group_id': chain_dict['group_id'],
+                'type': group_type,
+                'switches': switches,
+                'paths': paths
+            })
+        if stats and self.controller == RemoteController:
+            dpids = sorted(set(int(self.getNodeByName(sw).dpid, 16)
+                               for g in groups for sw in g['switches']))
+            replies = dict(zip(dpids, self.ryu_REST_batch(
+                [{'prefix': 'stats/group', 'dpid': dpid} for dpid in dpids])))
+            for g in groups:
+                g['stats'] = {}
+                for sw in g['switches']:
+                    dpid = int(self.getNodeByName(sw).dpid, 16)
+                    reply = replies.get(dpid)
+                    if not isinstance(reply, dict):
+                        continue
+                    g['stats'][sw] = [s for s in reply.get(str(dpid), [])
+                                      if s.get('group_id') == g['group_id']]
+        return groups
+
+    def _addChainQueues(self, chain_dict, paths, dst_port):
+        """
+        Add the HTB queue of a chain to every port its paths send it out of.
+        :param paths: paths of the chain (None entries are ignored)
+        :return: set of (switch name, port name) with a queue of the chain
+        """
+        options = chain_dict['options']
+        ports = set()
+        for path in paths:
+            if not path:
+                continue
+            # ports towards the next switch (first link) and the destination VNF
+            hops = [(u, self.DCNetwork_graph[u][v][0]) for u, v in zip(path[:-1], path[1:])]
+            hops += [(path[-1], edge) for edge in self.DCNetwork_graph[path[-1]].get(
+                chain_dict['vnf_dst_name'], {}).values()
+                if edge['src_port_name'] == dst_port.port_name]
+            for node_name, edge in hops:
+                port_name = edge['src_port_name']
+                if (node_name, port_name) in ports:
+                    continue
+                ports.add((node_name, port_name))
+                self.qos.add(chain_dict['queue_owner'], self.getNodeByName(node_name),
+                             port_name, chain_dict['queue_id'],
+                             min_rate=options.get('min_rate'), max_rate=options.get('max_rate'),
+                             port_rate=edge.get('bw'))
+        return ports
+
+    def getChainQueues(self, stats=False):
+        """
+        HTB queues of the installed chains with a min_rate/max_rate.
+        :param stats: add the counters of the queues per switch (Ryu only)
+        :return: list of dicts {chain, queue_id, min_rate, max_rate, ports(, stats)}
+        """
+        queues = []
+        for chain_dict in self.installed_chains.values():
+            if chain_dict.get('queue_id') is None:
+                continue
+            queues.append({
+                'chain': chain_dict['queue_owner'],
+                'queue_id': chain_dict['queue_id'],
+                'min_rate': chain_dict['options'].get('min_rate'),
+                'max_rate': chain_dict['options'].get('max_rate'),
+                'ports': ["{0}:{1}".format(sw, port) for sw, port, _
+                          in self.qos.queues(chain_dict['queue_owner'])]
+            })
+        if stats and self.controller == RemoteController:
+            switches = sorted(set(p.split(':')[0] for q in queues for p in q['ports']))
+            replies = dict(zip(switches, self.ryu_REST_batch(
+                [{'prefix': 'stats/queue', 'dpid': int(self.getNodeByName(sw).dpid, 16)}
+                 for sw in switches])))
+            for q in queues:
+                q['stats'] = {}
+                for sw in set(p.split(':')[0] for p in q['ports']):
+                    reply = replies.get(sw)
+                    if not isinstance(reply, dict):
+                        continue
+                    dpid = int(self.getNodeByName(sw).dpid, 16)
+                    q['stats'][sw] = [s for s in reply.get(str(dpid), [])
+                                      if s.get('queue_id') == q['queue_id']]
+        return queues
 
     def _set_flow_entry_ryu_rest(
             self, node, switch_inport_nr, switch_outport_nr, **kwargs):
+        entry = self._compile_flow_entry_ryu_rest(
+            node, switch_inport_nr, switch_outport_nr, **kwargs)
+        self._push_flow_entry(entry).result()
+
+    def _compile_flow_entry_ryu_rest(
+            self, node, switch_inport_nr, switch_outport_nr, **kwargs):
+        """
+        Build the Ryu REST request for a single hop without sending it.
+        :return: FlowEntry
+        """
         match = 'in_port=%s' % switch_inport_nr
+        vlan_ports = []
 
         cookie = kwargs.get('cookie')
         match_input = kwargs.get('match')
@@ -796,6 +2283,8 @@ class DCNetwork(ContainernetWifi):
         mod_dl_dst = kwargs.get('mod_dl_dst')
 
         vlan = kwargs.get('vlan')
+        # payload type of this entry (MPLS chains only)
+        eth_type = kwargs.get('eth_type')
         priority = kwargs.get('priority', DEFAULT_PRIORITY)
         # flag to not set the ovs port vlan tag
         skip_vlan_tag = kwargs.get('skip_vlan_tag')
@@ -805,6 +2294,7 @@ class DCNetwork(ContainernetWifi):
             table_id = 0
 
         s = ','
+        match_input = self._label_match_input(match_input, index, path)
         if match_input:
             match = s.join([match, match_input])
 
@@ -824,12 +2314,32 @@ class DCNetwork(ContainernetWifi):
         # http://ryu.readthedocs.io/en/latest/app/ofctl_rest.html#add-a-flow-entry
         if cmd == 'add-flow':
             prefix = 'stats/flowentry/add'
-            if vlan is not None:
+            if kwargs.get('path_label') is not None:
+                # two-table pipeline: push the path label, the shared
+                # entries of the label in table 1 forward the packet
+                flow['actions'].append({'type': 'PUSH_VLAN', 'ethertype': 33024})
+                flow['actions'].append({'type': 'SET_FIELD', 'field': 'vlan_vid',
+                                        'value': kwargs.get('path_label') | 0x1000})
+            elif vlan is not None and self.label_mode == LABEL_MODE_MPLS:
+                # no port tags here, MPLS labels do not fit into a vlan id
+                if len(path) > 1:
+                    if index == 0:  # first node
+                        if eth_type is not None and 'dl_type' not in match \
+                                and 'eth_type' not in match:
+                            match += ',dl_type=0x%04x' % eth_type
+                        flow['actions'].extend(
+                            mpls_push_actions(vlan, eth_type))
+                    elif index == len(path) - 1:  # last node
+                        match += s + mpls_match(vlan, eth_type)
+                        flow['actions'].extend(mpls_pop_actions(eth_type))
+                    else:  # middle nodes
+                        match += s + mpls_match(vlan)
+            elif vlan is not None:
                 if index == 0:  # first node
                     # set vlan tag in ovs instance (to isolate E-LANs)
                     if not skip_vlan_tag:
                         in_port_name = kwargs.get('switch_inport_name')
-                        self._set_vlan_tag(node, in_port_name, vlan)
+                        vlan_ports.append((in_port_name, vlan))
                     # set vlan push action if more than 1 switch in the path
                     if len(path) > 1:
                         action = {}
@@ -851,7 +2361,7 @@ class DCNetwork(ContainernetWifi):
                     # set vlan tag in ovs instance (to isolate E-LANs)
                     if not skip_vlan_tag:
                         out_port_name = kwargs.get('switch_outport_name')
-                        self._set_vlan_tag(node, out_port_name, vlan)
+                        vlan_ports.append((out_port_name, vlan))
                     # set vlan pop action if more than 1 switch in the path
                     if len(path) > 1:
                         match += ',dl_vlan=%s' % vlan
@@ -868,10 +2378,25 @@ class DCNetwork(ContainernetWifi):
                 action['value'] = mod_dl_dst
                 flow['actions'].append(action)
 
+            if kwargs.get('queue_id') is not None:
+                # chains with a rate are sent through their HTB queue
+                action = {}
+                action['type'] = 'SET_QUEUE'
+                action['queue_id'] = kwargs.get('queue_id')
+                flow['actions'].append(action)
+
             # output action must come last
             action = {}
-            action['type'] = 'OUTPUT'
-            action['port'] = switch_outport_nr
+            if kwargs.get('path_label') is not None:
+                action['type'] = 'GOTO_TABLE'
+                action['table_id'] = PATH_TABLE_ID
+            elif kwargs.get('group_id') is not None:
+                # ECMP: the select group outputs the packet
+                action['type'] = 'GROUP'
+                action['group_id'] = kwargs.get('group_id')
+            else:
+                action['type'] = 'OUTPUT'
+                action['port'] = switch_outport_nr
             flow['actions'].append(action)
 
         elif cmd == 'del-flows':
@@ -888,16 +2413,48 @@ class DCNetwork(ContainernetWifi):
             flow['actions'].append(action)
 
         flow['match'] = self._parse_match(match)
-        self.ryu_REST(prefix, data=flow)
+        return FlowEntry(node, cmd, prefix=prefix, flow=flow,
+                         vlan_ports=vlan_ports, cookie=cookie)
 
     def _set_vlan_tag(self, node, switch_port, tag):
-        node.vsctl('set', 'port {0} tag={1}'.format(switch_port, tag))
-        LOG.debug("set vlan in switch: {0} in_port: {1} vlan tag: {2}".format(
-            node.name, switch_port, tag))
+        """
+        Set the vlan tag of a switch port, tag=None clears it.
+        """
+        self._set_vlan_tags([(node, switch_port, tag)])
+
+    def _set_vlan_tags(self, ports):
+        """
+        Set the vlan tags of several switch ports with one OVSDB transaction
+        (or one ovs-vsctl call if OVSDB can not be reached).
+        :param ports: list of (switch node, port name, tag), tag=None clears it
+        """
+        if not ports:
+            return
+        tags = [(port_name, tag) for _, port_name, tag in ports]
+        if self.ovsdb is not None:
+            self.ovsdb.set_port_tags(tags, fallback=ports[0][0])
+        else:
+            ports[0][0].vsctl(' '.join(port_tag_vsctl(p, t) for p, t in tags))
+        for node, switch_port, tag in ports:
+            if tag is None:
+                self.port_tags.pop((node.name, switch_port), None)
+            else:
+                self.port_tags[(node.name, switch_port)] = tag
+            LOG.debug("set vlan in switch: {0} in_port: {1} vlan tag: {2}".format(
+                node.name, switch_port, tag))
 
     def _set_flow_entry_dpctl(
             self, node, switch_inport_nr, switch_outport_nr, **kwargs):
+        entry = self._compile_flow_entry_dpctl(
+            node, switch_inport_nr, switch_outport_nr, **kwargs)
+        self._push_flow_entry(entry)
 
+    def _compile_flow_entry_dpctl(
+            self, node, switch_inport_nr, switch_outport_nr, **kwargs):
+        """
+        Build the ovs-ofctl command for a single hop without executing it.
+        :return: FlowEntry
+        """
         match = 'in_port=%s' % switch_inport_nr
 
         cookie = kwargs.get('cookie')
@@ -906,23 +2463,54 @@ class DCNetwork(ContainernetWifi):
         path = kwargs.get('path')
         index = kwargs.get('pathindex')
         vlan = kwargs.get('vlan')
+        eth_type = kwargs.get('eth_type')
+        if kwargs.get('path_label') is not None:
+            # two-table pipeline: table 1 forwards on the path label
+            output = 'goto_table:%s' % PATH_TABLE_ID
+        elif kwargs.get('group_id') is not None:
+            # ECMP: the select group outputs the packet
+            output = 'group:%s' % kwargs.get('group_id')
+        else:
+            output = 'output:%s' % switch_outport_nr
+        if kwargs.get('queue_id') is not None:
+            # chains with a rate are sent through their HTB queue
+            output = 'set_queue:%s,%s' % (kwargs.get('queue_id'), output)
 
         s = ','
         if cookie:
             cookie = 'cookie=%s' % cookie
             match = s.join([cookie, match])
+        match_input = self._label_match_input(match_input, index, path)
         if match_input:
             match = s.join([match, match_input])
         if cmd == 'add-flow':
-            action = 'action=%s' % switch_outport_nr
-            if vlan is not None:
+            action = 'action=%s' % output
+            if kwargs.get('path_label') is not None:
+                match = '-O OpenFlow13 ' + match
+                action = 'action=mod_vlan_vid:%s,%s' % (kwargs.get('path_label'), output)
+            elif vlan is not None and self.label_mode == LABEL_MODE_MPLS:
+                if len(path) > 1:
+                    match = '-O OpenFlow13 ' + match
+                    if index == 0:  # first node
+                        if eth_type is not None and 'dl_type' not in match \
+                                and 'eth_type' not in match:
+                            match += ',dl_type=0x%04x' % eth_type
+                        action = 'action=%s,%s' % (
+                            mpls_push_ofctl(vlan, eth_type), output)
+                    elif index == len(path) - 1:  # last node
+                        match += s + mpls_match(vlan, eth_type)
+                        action = 'action=%s,%s' % (
+                            mpls_pop_ofctl(eth_type), output)
+                    else:  # middle nodes
+                        match += s + mpls_match(vlan)
+            elif vlan is not None:
                 if index == 0:  # first node
                     action = ('action=mod_vlan_vid:%s' % vlan) + \
-                        (',output=%s' % switch_outport_nr)
+                        (',%s' % output)
                     match = '-O OpenFlow13 ' + match
                 elif index == len(path) - 1:  # last node
                     match += ',dl_vlan=%s' % vlan
-                    action = 'action=strip_vlan,output=%s' % switch_outport_nr
+                    action = 'action=strip_vlan,%s' % output
                 else:  # middle nodes
                     match += ',dl_vlan=%s' % vlan
             ofcmd = s.join([match, action])
@@ -931,9 +2519,9 @@ class DCNetwork(ContainernetWifi):
         else:
             ofcmd = ''
 
-        node.dpctl(cmd, ofcmd)
-        LOG.info("{3} in switch: {0} in_port: {1} out_port: {2}".format(node.name, switch_inport_nr,
-                                                                        switch_outport_nr, cmd))
+        LOG.debug("{3} in switch: {0} in_port: {1} out_port: {2}".format(node.name, switch_inport_nr,
+                                                                         switch_outport_nr, cmd))
+        return FlowEntry(node, cmd, ofcmd=ofcmd, cookie=kwargs.get('cookie'))
 
     # start Ryu Openflow controller as Remote Controller for the DCNetwork
     def startRyu(self, learning_switch=True):
@@ -978,37 +2566,76 @@ class DCNetwork(ContainernetWifi):
         # ensure its death ;-)
         Popen(['pkill', '-f', 'ryu-manager'])
 
-    def ryu_REST(self, prefix, dpid=None, data=None):
+    def ryu_REST(self, prefix, dpid=None, data=None, check=False):
+        """
+        Send a request to the Ryu REST api (POST if data is given, else GET).
+        :param check: raise an exception if Ryu does not answer with 200 (OK)
+        """
+        return self.ryu.request(prefix, dpid=dpid, data=data, check=check)
 
-        if dpid:
-            url = self.ryu_REST_api + '/' + str(prefix) + '/' + str(dpid)
-        else:
-            url = self.ryu_REST_api + '/' + str(prefix)
+    def ryu_REST_batch(self, requests, check=False):
+        """
+        Send multiple requests to the Ryu REST api concurrently.
+        :param requests: list of dicts with the keys prefix, dpid (optional), data (optional)
+        :return: list of replies in the order of the requests,
+                 failed requests are returned as their exception
+        """
+        return self.ryu.request_many(requests, check=check)
 
-        LOG.debug('sending RYU command: %s, payload: %s', url, data)
-        if data:
-            req = self.RyuSession.post(url, json=data)
-        else:
-            req = self.RyuSession.get(url)
-
-        # do extra logging if status code is not 200 (OK)
-        if req.status_code is not requests.codes.ok:
-            LOG.info(
-                'type {0}  encoding: {1} text: {2} headers: {3} history: {4}'.format(req.headers['content-type'],
-                                                                                     req.encoding, req.text,
-                                                                                     req.headers, req.history))
-            LOG.info('url: {0}'.format(str(url)))
-            if data:
-                LOG.info('POST: {0}'.format(str(data)))
-            LOG.info('status: {0} reason: {1}'.format(
-                req.status_code, req.reason))
-
-        if 'json' in req.headers['content-type']:
-            ret = req.json()
-            return ret
+    def deleteFlows(self, flows):
+        """
+        Delete flow entries via the Ryu REST api (non-strict delete) and
+        remove them from the desired flow table, else the reconciler would
+        reinstall them with its next run.
+        :param flows: list of Ryu flow entries (dpid, cookie, cookie_mask, match, ...)
+        :return: list of replies in the order of the flows
+        """
+        for flow in flows:
+            self.flow_table.delete(flow)
+        return self.ryu_REST_batch(
+            [{'prefix': 'stats/flowentry/delete', 'data': flow} for flow in flows])
 
-        ret = req.text.rstrip()
-        return ret
+    def reconcileFlows(self):
+        """
+        Compare the flow tables of all switches with the desired state
+        now and repair them (instead of waiting for the next periodic run).
+        :return: dict with the number of missing and extra entries
+        """
+        return self.reconciler.reconcile()
+
+    def getReconcileStats(self):
+        """
+        Counters of the flow reconciler (runs, repaired entries, last run).
+        """
+        return self.reconciler.stats()
+
+    def getRyuClientStats(self):
+        """
+        Request counters, latency and queue depth of the Ryu REST client.
+        """
+        return self.ryu.stats()
+
+    def getBootTimings(self):
+        """
+        Durations of the startup phases in seconds: datacenters, network
+        (controllers and switches) and with batch_startup its parts bridges
+        (merged ovs-vsctl calls) and link_config (parallel tc restore).
+        """
+        return dict(self.boot_timings)
+
+    def getContainerStatusStats(self):
+        """
+        Hits, misses and handled docker events of the container status cache.
+        """
+        return self.container_status.stats()
+
+    def getOvsdbStats(self):
+        """
+        Transaction counters of the OVSDB client (None if ovs-vsctl is used).
+        """
+        if self.ovsdb is None:
+            return None
+        return self.ovsdb.stats()
 
     # need to respect that some match fields must be integers
     # http://ryu.readthedocs.io/en/latest/app/ofctl_rest.html#description-of-match-and-actions
@@ -1029,25 +2656,17 @@ class DCNetwork(ContainernetWifi):
 
     def find_connected_dc_interface(
             self, vnf_src_name, vnf_src_interface=None):
-
-        if vnf_src_interface is None:
-            # take first interface by default
-            connected_sw = self.DCNetwork_graph.neighbors(vnf_src_name)[0]
-            link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-            vnf_src_interface = link_dict[0]['src_port_id']
-
-        for connected_sw in self.DCNetwork_graph.neighbors(vnf_src_name):
-            link_dict = self.DCNetwork_graph[vnf_src_name][connected_sw]
-            for link in link_dict:
-                if (link_dict[link]['src_port_id'] == vnf_src_interface or
-                        link_dict[link]['src_port_name'] == vnf_src_interface):
-                    # Fix: we might also get interface names, e.g, from a son-emu-cli call
-                    # found the right link and connected switch
-                    src_sw_inport_name = link_dict[link]['dst_port_name']
-                    return src_sw_inport_name
+        """
+        Name of the switch port the given VNF interface is connected to.
+        """
+        src_port = self.getConnectedSwitchPort(vnf_src_name, vnf_src_interface)
+        if src_port is not None:
+            return src_port.port_name
     
     def buildGraph(self):
         self.DCNetwork_graph = nx.MultiDiGraph()
+        self.intf_index.clear()
+        self.path_cache.bump()
         for vnf in self.getAllContainers():
 
             self.DCNetwork_graph.add_node(vnf.name, type=vnf.params.get('type', 'docker'))
\ No newline at end of file
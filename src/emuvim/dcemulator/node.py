@@ -31,7 +31,12 @@ from os import link
 from mininet.node import Docker
 from mininet.link import Link
 from emuvim.dcemulator.resourcemodel import NotEnoughResourcesAvailable
+from emuvim.dcemulator.pool import WarmPool, DEFAULT_POOL_SIZE, RESOURCE_PARAMS
+from emuvim.dcemulator.link import interface_status, NETLINK_AVAILABLE
+from concurrent.futures import ThreadPoolExecutor
+import docker
 import logging
+import time
 
 
 LOG = logging.getLogger("dcemulator.node")
@@ -40,6 +45,8 @@ LOG.setLevel(logging.DEBUG)
 
 DCDPID_BASE = 1000  # start of switch dpid's used for data center switches
 EXTSAPDPID_BASE = 2000  # start of switch dpid's used for external SAP switches
+# max. number of containers that are pulled/created at the same time by startComputeBatch
+MAX_COMPUTE_WORKERS = 8
 
 
 class EmulatorCompute(Docker):
@@ -68,27 +75,48 @@ class EmulatorCompute(Docker):
         """
         # get all links and find dc switch interface
         networkStatusList = []
+        # all interfaces with one netlink dump instead of commands per interface
+        states = _interface_states(self, self.intfList())
         for i in self.intfList():
             vnf_name = self.name
             vnf_interface = str(i)
             dc_port_name = self.datacenter.net.find_connected_dc_interface(
                 vnf_name, vnf_interface)
             # format list of tuples (name, Ip, MAC, isUp, status, dc_portname)
-            intf_dict = {'intf_name': str(i), 'ip': "{0}/{1}".format(i.IP(), i.prefixLen), 'netmask': i.prefixLen,
-                         'mac': i.MAC(), 'up': i.isUp(), 'status': i.status(), 'dc_portname': dc_port_name}
+            if states is not None:
+                s = states.get(str(i), {})
+                intf_dict = {'intf_name': str(i), 'ip': "{0}/{1}".format(s.get('ip'), s.get('prefixlen')),
+                             'netmask': s.get('prefixlen'), 'mac': s.get('mac'), 'up': s.get('up', False),
+                             'status': 'OK' if s else 'MISSING', 'dc_portname': dc_port_name}
+            else:
+                intf_dict = {'intf_name': str(i), 'ip': "{0}/{1}".format(i.IP(), i.prefixLen), 'netmask': i.prefixLen,
+                             'mac': i.MAC(), 'up': i.isUp(), 'status': i.status(), 'dc_portname': dc_port_name}
             networkStatusList.append(intf_dict)
         return networkStatusList
+
+    def invalidateNetworkStatus(self):
+        """
+        Drop the cached network status, called when the emulator
+        changes the interfaces of this compute instance.
+        """
+        self._network_state_cache = None
     
     
 
-    def getStatus(self):
+    def getStatus(self, fresh=False):
         """
         Helper method to receive information about this compute instance.
+        :param fresh: inspect the container and its networking again
+                      instead of using the cached state
         """
-        # inspect container
-        cinspect = self.dcli.inspect_container(self.dc)
+        # inspect container (cached by the network, updated by docker events)
+        if self.datacenter is not None and self.datacenter.net is not None:
+            cinspect = self.datacenter.net.container_status.inspect(
+                self.did, fresh=fresh)
+        else:
+            cinspect = self.dcli.inspect_container(self.dc)
         # inspect networking (slow, so do only once)
-        if self._network_state_cache is None:
+        if self._network_state_cache is None or fresh:
             self._network_state_cache = self.getNetworkStatus()
         # build status
         status = {}
@@ -152,16 +180,22 @@ class EmulatorExtSAP(object):
         """
         # get all links and find dc switch interface
         networkStatusList = []
-        for i in self.switch.intfList():
+        intfs = [i for i in self.switch.intfList() if str(i) != 'lo']
+        states = _interface_states(self.switch, intfs)
+        for i in intfs:
             vnf_name = self.name
             vnf_interface = str(i)
-            if vnf_interface == 'lo':
-                continue
             dc_port_name = self.datacenter.net.find_connected_dc_interface(
                 vnf_name, vnf_interface)
             # format list of tuples (name, Ip, MAC, isUp, status, dc_portname)
-            intf_dict = {'intf_name': str(i), 'ip': self.ip, 'netmask': i.prefixLen, 'mac': i.MAC(
-            ), 'up': i.isUp(), 'status': i.status(), 'dc_portname': dc_port_name}
+            if states is not None:
+                s = states.get(str(i), {})
+                intf_dict = {'intf_name': str(i), 'ip': self.ip, 'netmask': i.prefixLen, 'mac': s.get('mac'),
+                             'up': s.get('up', False), 'status': 'OK' if s else 'MISSING',
+                             'dc_portname': dc_port_name}
+            else:
+                intf_dict = {'intf_name': str(i), 'ip': self.ip, 'netmask': i.prefixLen, 'mac': i.MAC(
+                ), 'up': i.isUp(), 'status': i.status(), 'dc_portname': dc_port_name}
             networkStatusList.append(intf_dict)
 
         return networkStatusList
@@ -174,6 +208,20 @@ class EmulatorExtSAP(object):
         }
 
 
+def _interface_states(node, intfs):
+    """
+    Netlink state of the given interfaces of a node,
+    None if pyroute2 is not available or the read fails.
+    """
+    if not NETLINK_AVAILABLE:
+        return None
+    try:
+        return interface_status(node, [str(i) for i in intfs])
+    except Exception:
+        LOG.exception("Reading the interfaces of %r over netlink failed" % node.name)
+        return None
+
+
 class Datacenter(object):
     """
     Represents a logical data center to which compute resources
@@ -205,6 +253,8 @@ class Datacenter(object):
         self.extSAPs = {}
         # pointer to assigned resource model
         self._resource_model = None
+        # pre-created containers (see enableWarmPool)
+        self.warm_pool = None
 
     def __repr__(self):
         return self.label
@@ -229,6 +279,37 @@ class Datacenter(object):
     def start(self):
         pass
 
+    def stop(self):
+        if self.warm_pool is not None:
+            self.warm_pool.close()
+            self.warm_pool = None
+
+    def enableWarmPool(self, images, size=DEFAULT_POOL_SIZE, max_size=None):
+        """
+        Keep paused containers of the given images ready, so that startCompute
+        only has to unpause and connect them. Used for calls without command
+        and properties, the resource limits are applied with docker update.
+        Containers taken from the pool have no VNF_NAME environment variable
+        (the environment of a container can not be changed after creation).
+        :param images: list of image names
+        :param size: idle containers per image (int or dict image -> int)
+        :param max_size: max. number of idle containers of all images
+        """
+        if self.warm_pool is not None:
+            self.warm_pool.close()
+        self.warm_pool = WarmPool(self, images, size=size, max_size=max_size,
+                                  container_cls=EmulatorCompute,
+                                  metrics=self.net.pool_metrics)
+        self.warm_pool.refill()
+
+    def getWarmPoolStats(self):
+        """
+        Hits, misses and idle containers of the warm pool (None if disabled).
+        """
+        if self.warm_pool is None:
+            return None
+        return self.warm_pool.stats()
+
     def startComputeQuota(self, name, image=None, command=None, network=None, volume=None, cpu_period=None, cpu_quota=-1, mem_limit=None,
                      flavor_name="tiny", properties=dict(), **params):
         """
@@ -249,7 +330,7 @@ class Datacenter(object):
         assert name is not None
         default_net = {"id": "emu0"}
         # no duplications
-        if name in [c.name for c in self.net.getAllContainers()]:
+        if self.net.hasNode(name):
             raise Exception("Container with name %s already exists." % name)
         # set default parameter
         if image is None:
@@ -336,7 +417,7 @@ class Datacenter(object):
         assert name is not None
         default_net = {"id": "emu0"}
         # no duplications
-        if name in [c.name for c in self.net.getAllContainers()]:
+        if self.net.hasNode(name):
             raise Exception("Container with name %s already exists." % name)
         # set default parameter
         if image is None:
@@ -412,13 +493,14 @@ class Datacenter(object):
         :param command: command (string)
         :param network: networks list({"ip": "10.0.0.254/8"}, {"ip": "11.0.0.254/24"})
         :param flavor_name: name of the flavor for this compute container
-        :param properties: dictionary of properties (key-value) that will be passed as environment variables
+        :param properties: dictionary of properties (key-value) that will be passed as environment variables,
+                           VNF_NAME is always added (except for containers from the warm pool, see enableWarmPool)
         :return:
         """
         assert name is not None
         default_net = {"id": "emu0"}
         # no duplications
-        if name in [c.name for c in self.net.getAllContainers()]:
+        if self.net.hasNode(name):
             raise Exception("Container with name %s already exists." % name)
         # set default parameter
         if image is None:
@@ -442,18 +524,32 @@ class Datacenter(object):
             params['cpu_period'] = self.net.cpu_period
             params['cpu_quota'] = self.net.cpu_period * float(cpu_percentage)
 
-        env = properties
-        properties['VNF_NAME'] = name
-        # create the container
-        d = self.net.addDocker(
-            str(name),
-            dimage=image,
-            dcmd=command,
-            datacenter=self,
-            flavor_name=flavor_name,
-            environment=env,
-            **params
-        )
+        # take a container from the warm pool if only its resources differ,
+        # attention: a pooled container has no VNF_NAME environment variable,
+        # do not enable the pool for images that rely on it
+        d = None
+        if self.warm_pool is not None and command is None and \
+                set(properties) <= set(['VNF_NAME']) and \
+                all(k in RESOURCE_PARAMS or k == 'cpu_percent' for k in params):
+            d = self.warm_pool.claim(image)
+        if d is not None:
+            self.net.addPooledDocker(d, str(name), flavor_name=flavor_name)
+            resources = dict((k, v) for k, v in params.items() if k in RESOURCE_PARAMS)
+            if resources:
+                d.update_resources(**resources)
+        else:
+            env = properties
+            properties['VNF_NAME'] = name
+            # create the container
+            d = self.net.addDocker(
+                str(name),
+                dimage=image,
+                dcmd=command,
+                datacenter=self,
+                flavor_name=flavor_name,
+                environment=env,
+                **params
+            )
 
         # apply resource limits to container if a resource model is defined
         if self._resource_model is not None:
@@ -485,6 +581,178 @@ class Datacenter(object):
         self.containers[name] = d
         return d  # we might use UUIDs for naming later on
 
+    def startComputeBatch(self, specs, max_workers=MAX_COMPUTE_WORKERS):
+        """
+        Start many compute containers at once. The images are pulled and the
+        containers are created concurrently by a bounded pool of workers,
+        the resource model allocation and the links follow in bulk.
+        :param specs: list of dicts with the arguments of startCompute
+                      (name, image, command, network, flavor_name, properties, ...)
+        :param max_workers: max. number of concurrent pulls/creates
+        :return: list of dicts {name, container, error, timings} in the
+                 order of the specs, container is None if the start failed
+        """
+        results = [{'name': s.get('name'), 'container': None, 'error': None,
+                    'timings': {}} for s in specs]
+        names = set()
+        jobs = []
+        for spec, result in zip(specs, results):
+            name = spec.get('name')
+            if name is None or self.net.hasNode(name) or name in names:
+                result['error'] = "Container with name %s already exists." % name \
+                    if name is not None else "Container without name."
+                continue
+            names.add(name)
+            jobs.append((self._compute_spec(spec), result))
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))))
+        try:
+            # 1. pull the missing images, every image once
+            start = time.time()
+            images = set(spec['image'] for spec, _ in jobs)
+            pull_errors = dict(zip(images, executor.map(self._pull_image, images)))
+            pull_time = time.time() - start
+            for spec, result in jobs:
+                result['timings']['pull'] = pull_time
+                if pull_errors[spec['image']] is not None:
+                    result['error'] = pull_errors[spec['image']]
+            jobs = [(spec, result) for spec, result in jobs if result['error'] is None]
+            # 2. create the containers, the network bookkeeping is not
+            # thread-safe and done here one container after another
+            for (spec, result), (d, error, duration) in zip(
+                    jobs, executor.map(self._create_compute, [spec for spec, _ in jobs])):
+                if d is not None:
+                    self.net.addExistingDocker(d, result['name'])
+                result['container'] = d
+                result['error'] = error
+                result['timings']['create'] = duration
+        finally:
+            executor.shutdown(wait=True)
+        jobs = [(spec, result) for spec, result in jobs if result['error'] is None]
+
+        # 3. apply the resource limits one after another (shared resource model)
+        for spec, result in jobs:
+            start = time.time()
+            d = result['container']
+            if self._resource_model is not None:
+                try:
+                    self._resource_model.allocate(d)
+                    self._resource_model.write_allocation_log(
+                        d, self.resource_log_path)
+                except NotEnoughResourcesAvailable as ex:
+                    LOG.warning(
+                        "Allocation of container %r was blocked by resource model." % d.name)
+                    self.net.removeDocker(d.name)
+                    result['container'] = None
+                    result['error'] = str(ex)
+            result['timings']['allocate'] = time.time() - start
+        jobs = [(spec, result) for spec, result in jobs if result['error'] is None]
+
+        # 4. connect the containers to the data center switch
+        for spec, result in jobs:
+            start = time.time()
+            d = result['container']
+            try:
+                self.net.addLinks([(d, self.switch, {'params1': nw, 'cls': Link,
+                                                     'intfName1': nw.get('id')})
+                                   for nw in spec['network']])
+                # do bookkeeping
+                self.containers[result['name']] = d
+            except Exception as ex:
+                LOG.exception("Connecting compute instance %r failed" % d.name)
+                if self._resource_model is not None:
+                    self._resource_model.free(d)
+                self.net.removeDocker(d.name)
+                result['container'] = None
+                result['error'] = str(ex)
+            result['timings']['link'] = time.time() - start
+
+        for result in results:
+            for phase, duration in result['timings'].items():
+                self.net.timer.observe('compute_batch', 'docker', phase, duration)
+        LOG.info("Started %d of %d compute instances in data center %r" %
+                 (len([r for r in results if r['container'] is not None]),
+                  len(specs), str(self)))
+        return results
+
+    def _compute_spec(self, spec):
+        """
+        Apply the defaults of startCompute to a compute spec.
+        """
+        spec = dict(spec)
+        default_net = {"id": "emu0"}
+        if spec.get('image') is None:
+            spec['image'] = "ubuntu:trusty"
+        network = spec.get('network')
+        if network is None or isinstance(network, dict) and len(network) < 1:
+            # create at least one default interface
+            network = dict(default_net)
+        if isinstance(network, dict):
+            network = [network]
+        if len(network) < 1:
+            network = [dict(default_net)]
+        for nw in network:
+            if nw.get("id") is not None:
+                nw["id"] = self._clean_ifname(nw["id"])
+        spec['network'] = network
+        params = dict(spec.get('params', {}))
+        for key in spec:
+            if key not in ['name', 'image', 'command', 'network', 'flavor_name',
+                           'properties', 'params']:
+                params[key] = spec[key]
+        # apply hard-set resource limits=0
+        cpu_percentage = params.get('cpu_percent')
+        if cpu_percentage:
+            params['cpu_period'] = self.net.cpu_period
+            params['cpu_quota'] = self.net.cpu_period * float(cpu_percentage)
+        spec['params'] = params
+        properties = dict(spec.get('properties') or {})
+        properties['VNF_NAME'] = spec['name']
+        spec['properties'] = properties
+        return spec
+
+    @staticmethod
+    def _pull_image(image):
+        """
+        Pull an image if it is not available locally.
+        :return: None or error message
+        """
+        dcli = docker.from_env().api
+        try:
+            dcli.inspect_image(image)
+            return None
+        except docker.errors.NotFound:
+            pass
+        repository, tag = docker.utils.parse_repository_tag(image)
+        LOG.info("Pulling image %r" % image)
+        try:
+            dcli.pull(repository, tag=tag or 'latest')
+        except Exception as ex:
+            return "Pulling image %s failed: %s" % (image, ex)
+        return None
+
+    def _create_compute(self, spec):
+        """
+        Create and start the container of a compute spec (runs in a worker
+        thread, the container is added to the network by the caller).
+        :return: (container, error message, seconds)
+        """
+        start = time.time()
+        try:
+            d = EmulatorCompute(
+                str(spec['name']),
+                dimage=spec['image'],
+                dcmd=spec.get('command'),
+                datacenter=self,
+                flavor_name=spec.get('flavor_name', "tiny"),
+                environment=spec['properties'],
+                **spec['params']
+            )
+        except Exception as ex:
+            LOG.exception("Creating compute instance %r failed" % spec['name'])
+            return None, str(ex), time.time() - start
+        return d, None, time.time() - start
+
     def stopCompute(self, name):
         """
         Stop and remove a container from this data center.
@@ -0,0 +1,227 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import json
+import os
+import socket
+import threading
+import time
+
+LOG = logging.getLogger("dcemulator.ovsdb")
+LOG.setLevel(logging.DEBUG)
+
+# unix socket of the local ovsdb-server (all Mininet switches share it)
+OVSDB_SOCKET = os.path.join(
+    os.environ.get('OVS_RUNDIR', '/var/run/openvswitch'), 'db.sock')
+OVSDB_DATABASE = 'Open_vSwitch'
+# seconds to wait for the reply of a transaction
+OVSDB_TIMEOUT = 10.0
+# seconds before a failed connection is tried again
+OVSDB_RETRY_INTERVAL = 30.0
+
+
+class OvsdbError(Exception):
+    pass
+
+
+def port_tag_op(port_name, tag):
+    """
+    OVSDB operation that sets (or clears, tag=None) the vlan tag of a port.
+    """
+    return {"op": "update",
+            "table": "Port",
+            "where": [["name", "==", port_name]],
+            "row": {"tag": ["set", []] if tag is None else int(tag)}}
+
+
+def port_tag_vsctl(port_name, tag):
+    """
+    The same change as port_tag_op as ovs-vsctl command.
+    """
+    if tag is None:
+        return '-- clear port {0} tag'.format(port_name)
+    return '-- set port {0} tag={1}'.format(port_name, tag)
+
+
+class OvsdbClient(object):
+    """
+    Long-lived JSON-RPC connection to the ovsdb-server (RFC 7047).
+    Several operations are sent as one transaction instead of one
+    ovs-vsctl process (and transaction) per change.
+
+    The connection is opened on first use. If the server cannot be
+    reached, transact() raises OvsdbError and the callers fall back to
+    ovs-vsctl until the connection is tried again.
+    """
+
+    def __init__(self, path=OVSDB_SOCKET, timeout=OVSDB_TIMEOUT):
+        """
+        :param path: unix socket of the ovsdb-server
+        :param timeout: seconds to wait for a reply
+        """
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._buf = ''
+        self._next_id = 0
+        self._retry_at = 0
+        self._lock = threading.Lock()
+        self._transactions = 0
+        self._operations = 0
+        self._fallbacks = 0
+
+    @property
+    def available(self):
+        """
+        False while the server is known to be unreachable.
+        """
+        return self._sock is not None or time.time() >= self._retry_at
+
+    def transact(self, ops, database=OVSDB_DATABASE):
+        """
+        Execute a list of operations in one transaction.
+        :return: list of operation results
+        """
+        if not ops:
+            return []
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            self._next_id += 1
+            req_id = self._next_id
+            try:
+                self._send({"method": "transact",
+                            "params": [database] + list(ops),
+                            "id": req_id})
+                reply = self._receive(req_id)
+            except (socket.error, ValueError) as ex:
+                self._close()
+                raise OvsdbError("OVSDB transaction failed: {0}".format(ex))
+            self._transactions += 1
+            self._operations += len(ops)
+        if reply.get('error') is not None:
+            raise OvsdbError("OVSDB transaction failed: {0}".format(reply['error']))
+        results = reply.get('result') or []
+        for op, result in zip(ops, results):
+            if result is not None and result.get('error') is not None:
+                raise OvsdbError("OVSDB {0} on {1} failed: {2} {3}".format(
+                    op.get('op'), op.get('table'), result['error'], result.get('details', '')))
+        return results
+
+    def set_port_tags(self, tags, fallback=None):
+        """
+        Set (or clear) the vlan tags of several ports in one transaction.
+        :param tags: list of (port name, tag or None)
+        :param fallback: switch node whose vsctl() is used if OVSDB cannot
+                         be reached (all changes in one ovs-vsctl call)
+        :return: 'ovsdb' or 'cli'
+        """
+        tags = list(tags)
+        if not tags:
+            return 'ovsdb'
+        if self.available:
+            try:
+                results = self.transact([port_tag_op(p, t) for p, t in tags])
+                for (port_name, _), result in zip(tags, results):
+                    if not result.get('count'):
+                        LOG.warning("OVSDB has no port {0}".format(port_name))
+                return 'ovsdb'
+            except OvsdbError as ex:
+                if fallback is None:
+                    raise
+                LOG.warning("{0}, falling back to ovs-vsctl".format(ex))
+        if fallback is None:
+            raise OvsdbError("OVSDB server {0} not reachable".format(self.path))
+        with self._lock:
+            self._fallbacks += 1
+        fallback.vsctl(' '.join(port_tag_vsctl(p, t) for p, t in tags))
+        return 'cli'
+
+    def _connect(self):
+        if time.time() < self._retry_at:
+            raise OvsdbError("OVSDB server {0} not reachable".format(self.path))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except socket.error as ex:
+            sock.close()
+            self._retry_at = time.time() + OVSDB_RETRY_INTERVAL
+            raise OvsdbError("Cannot connect to OVSDB server {0}: {1}".format(self.path, ex))
+        self._sock = sock
+        self._buf = ''
+        LOG.info("Connected to OVSDB server {0}".format(self.path))
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except socket.error:
+                pass
+        self._sock = None
+        self._buf = ''
+
+    def _send(self, msg):
+        self._sock.sendall(json.dumps(msg).encode('utf-8'))
+
+    def _receive(self, req_id):
+        """
+        Read messages until the reply to req_id arrives, the
+        echo requests of the server are answered on the way.
+        """
+        decoder = json.JSONDecoder()
+        while True:
+            self._buf = self._buf.lstrip()
+            if self._buf:
+                try:
+                    msg, end = decoder.raw_decode(self._buf)
+                except ValueError:
+                    msg = None  # incomplete message
+                if msg is not None:
+                    self._buf = self._buf[end:]
+                    if msg.get('method') == 'echo':
+                        self._send({"result": msg.get('params', []), "error": None,
+                                    "id": msg.get('id')})
+                    elif msg.get('id') == req_id:
+                        return msg
+                    continue
+            data = self._sock.recv(65536)
+            if not data:
+                raise socket.error("connection closed by OVSDB server")
+            self._buf += data.decode('utf-8')
+
+    def stats(self):
+        with self._lock:
+            return {
+                "connected": self._sock is not None,
+                "transactions": self._transactions,
+                "operations": self._operations,
+                "fallbacks": self._fallbacks
+            }
+
+    def close(self):
+        with self._lock:
+            self._close()
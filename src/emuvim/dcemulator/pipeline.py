@@ -0,0 +1,199 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+from emuvim.dcemulator.labels import TagAllocator
+
+LOG = logging.getLogger("dcemulator.pipeline")
+LOG.setLevel(logging.DEBUG)
+
+# VLAN ids used as path labels by the two-table pipeline, the block
+# 0xc00-0xffe is matched by a single masked entry in table 0 (chains
+# and E-LANs get their vlan tags below it)
+PATH_LABEL_MIN = 0xc00
+PATH_LABEL_MAX = 0xffe
+PATH_LABEL_MASK = 0xc00
+# OFPVID_PRESENT bit of a masked vlan_vid match
+VID_PRESENT = 0x1000
+# table with the shared forwarding entries of the path labels
+PATH_TABLE_ID = 1
+# cookie and priority of the shared entries, they never carry the cookie
+# of a chain, so deleting the flows of a cookie leaves them alone
+PATH_COOKIE = 0x70617468
+PATH_PRIORITY = 2000
+
+
+class PathLabels(object):
+    """
+    Reference counted labels of the switch paths used by the two-table
+    pipeline. All chains routed over the same switch path to the same
+    destination port share one label and its forwarding entries (table 1).
+    The label is released with the last chain using it. Every switch that
+    receives labeled packets (all but the first switch of a path) needs
+    one table 0 entry that sends them to table 1.
+    """
+
+    def __init__(self, first=PATH_LABEL_MIN, last=PATH_LABEL_MAX):
+        self.labels = TagAllocator(first, last)
+        self._keys = {}  # (path, port) -> label
+        self._paths = {}  # label -> {key, owners, entries}
+        self._switches = {}  # switch name -> {labels, entry}
+        self._lock = threading.Lock()
+
+    def acquire(self, owner, path, port):
+        """
+        Reference the label of a path.
+        :param owner: chain using the path (its tag)
+        :param path: list of switch names
+        :param port: output port (number) at the last switch
+        :return: (label, created, switches): created is True for a new label
+                 whose entries have to be installed, switches is the list of
+                 switches that got their first label (need the table 0 entry)
+        """
+        key = (tuple(path), port)
+        with self._lock:
+            label = self._keys.get(key)
+            if label is not None:
+                self._paths[label]['owners'].add(owner)
+                return label, False, []
+            label = self.labels.allocate(owner=key)
+            self._keys[key] = label
+            self._paths[label] = {'key': key, 'owners': set([owner]), 'entries': []}
+            switches = []
+            for name in path[1:]:
+                switch = self._switches.setdefault(name, {'labels': set(), 'entry': None})
+                if not switch['labels']:
+                    switches.append(name)
+                switch['labels'].add(label)
+        LOG.debug("New path label {0} for {1}".format(label, key))
+        return label, True, switches
+
+    def set_entries(self, label, entries):
+        """
+        Remember the shared entries of a label (to remove them later on).
+        """
+        with self._lock:
+            self._paths[label]['entries'] = list(entries)
+
+    def set_switch_entry(self, name, entry):
+        """
+        Remember the table 0 entry of a switch.
+        """
+        with self._lock:
+            self._switches[name]['entry'] = entry
+
+    def release(self, owner, label):
+        """
+        Drop the reference of an owner to a label.
+        :return: list of entries to remove: the entries of the label if this
+                 was its last reference and the table 0 entries of the
+                 switches that have no label any more
+        """
+        with self._lock:
+            record = self._paths.get(label)
+            if record is None or owner not in record['owners']:
+                return []
+            record['owners'].discard(owner)
+            if record['owners']:
+                return []
+            del self._paths[label]
+            del self._keys[record['key']]
+            self.labels.free(label, owner=record['key'])
+            removed = list(record['entries'])
+            for name in record['key'][0][1:]:
+                switch = self._switches.get(name)
+                if switch is None:
+                    continue
+                switch['labels'].discard(label)
+                if not switch['labels']:
+                    del self._switches[name]
+                    if switch['entry'] is not None:
+                        removed.append(switch['entry'])
+        LOG.debug("Released path label {0} of {1}".format(label, record['key']))
+        return removed
+
+    def to_list(self):
+        """
+        :return: list of dicts {label, path, port, chains}
+        """
+        with self._lock:
+            return [{'label': label, 'path': list(r['key'][0]), 'port': r['key'][1],
+                     'chains': sorted(r['owners'])}
+                    for label, r in sorted(self._paths.items())]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._paths)
+
+
+def path_entry_ryu(dpid, label, port, pop=False):
+    """
+    Ryu REST payload of the shared table 1 entry of a path label at a
+    switch (the last switch of the path pops the label).
+    """
+    actions = [{'type': 'POP_VLAN'}] if pop else []
+    actions.append({'type': 'OUTPUT', 'port': port})
+    return {
+        'dpid': dpid,
+        'table_id': PATH_TABLE_ID,
+        'cookie': PATH_COOKIE,
+        'priority': PATH_PRIORITY,
+        'match': {'dl_vlan': label},
+        'actions': actions
+    }
+
+
+def path_entry_ofctl(label, port, pop=False):
+    """
+    ovs-ofctl flow spec of the shared table 1 entry of a path label.
+    """
+    return '-O OpenFlow13 cookie=%s,table=%s,priority=%s,dl_vlan=%s,action=%soutput:%s' % (
+        PATH_COOKIE, PATH_TABLE_ID, PATH_PRIORITY, label, 'strip_vlan,' if pop else '', port)
+
+
+def label_block_ryu(dpid):
+    """
+    Ryu REST payload of the table 0 entry that sends all packets with a
+    path label to table 1.
+    """
+    vid = VID_PRESENT | PATH_LABEL_MASK
+    return {
+        'dpid': dpid,
+        'table_id': 0,
+        'cookie': PATH_COOKIE,
+        'priority': PATH_PRIORITY,
+        'match': {'dl_vlan': '0x%04x/0x%04x' % (vid, vid)},
+        'actions': [{'type': 'GOTO_TABLE', 'table_id': PATH_TABLE_ID}]
+    }
+
+
+def label_block_ofctl():
+    """
+    ovs-ofctl flow spec of the table 0 entry for all path labels.
+    """
+    vid = VID_PRESENT | PATH_LABEL_MASK
+    return '-O OpenFlow13 cookie=%s,table=0,priority=%s,vlan_tci=0x%04x/0x%04x,action=goto_table:%s' % (
+        PATH_COOKIE, PATH_PRIORITY, vid, vid, PATH_TABLE_ID)
@@ -0,0 +1,201 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import Counter, Gauge, CollectorRegistry
+
+LOG = logging.getLogger("dcemulator.pool")
+LOG.setLevel(logging.DEBUG)
+
+# default number of idle containers per image
+DEFAULT_POOL_SIZE = 2
+# max. number of containers that are created at the same time to refill a pool
+POOL_WORKERS = 2
+# container options that can be applied to a running container (docker update)
+RESOURCE_PARAMS = ['blkio_weight', 'cpu_period', 'cpu_quota', 'cpu_shares', 'cpuset_cpus',
+                   'cpuset_mems', 'mem_limit', 'mem_reservation', 'memswap_limit',
+                   'kernel_memory']
+
+
+class WarmPoolMetrics(object):
+    """
+    Prometheus metrics shared by the warm pools of all data centers.
+    """
+
+    def __init__(self, registry=None):
+        if registry is None:
+            registry = CollectorRegistry()
+        self.claims = Counter('sonemu_warm_pool_claims', 'Containers requested from the warm pool',
+                              ['datacenter', 'image', 'result'], registry=registry)
+        self.idle = Gauge('sonemu_warm_pool_idle', 'Idle containers in the warm pool',
+                          ['datacenter', 'image'], registry=registry)
+
+
+class WarmPool(object):
+    """
+    Pre-created, paused containers of a data center, kept per image.
+    A claimed container is unpaused and handed out under its new name,
+    the pool is refilled in the background.
+
+    Only containers whose options can be changed after creation can be
+    taken from the pool: no command and no environment (a pooled
+    container keeps the environment it was created with) and resource
+    limits only (applied with docker update).
+    """
+
+    def __init__(self, dc, images, size=DEFAULT_POOL_SIZE, max_size=None,
+                 container_cls=None, metrics=None):
+        """
+        :param dc: Datacenter the containers are created for
+        :param images: list of image names to keep containers of
+        :param size: number of idle containers per image (int or dict image -> int)
+        :param max_size: max. number of idle (and pending) containers of all images
+        :param container_cls: class of the containers (EmulatorCompute)
+        :param metrics: WarmPoolMetrics to export the hits/misses and idle containers to
+        """
+        self.dc = dc
+        self.container_cls = container_cls
+        if isinstance(size, dict):
+            self.size = dict(size)
+        else:
+            self.size = dict((image, size) for image in images)
+        self.max_size = max_size
+        self._idle = dict((image, deque()) for image in self.size)
+        self._pending = dict((image, 0) for image in self.size)
+        self._counter = 0
+        self._hits = 0
+        self._misses = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=POOL_WORKERS)
+        self.metrics = metrics if metrics is not None else WarmPoolMetrics()
+
+    def refill(self):
+        """
+        Start creating containers until every image has its size of
+        idle (or pending) containers, within max_size.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            for image, size in self.size.items():
+                while len(self._idle[image]) + self._pending[image] < size and \
+                        (self.max_size is None or self._total() < self.max_size):
+                    self._pending[image] += 1
+                    self._counter += 1
+                    name = "%s.pool%d" % (self.dc.name, self._counter)
+                    self._executor.submit(self._create, image, name)
+
+    def _total(self):
+        return sum(len(q) for q in self._idle.values()) + sum(self._pending.values())
+
+    def _create(self, image, name):
+        d = None
+        try:
+            d = self.container_cls(name, dimage=image, datacenter=self.dc)
+            d.dcli.pause(d.did)
+        except Exception:
+            LOG.exception("Creating pool container %r of image %r failed" % (name, image))
+            if d is not None:
+                d.terminate()
+            d = None
+        with self._lock:
+            self._pending[image] -= 1
+            if d is None:
+                return
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle[image].append(d)
+                self.metrics.idle.labels(datacenter=self.dc.label, image=image).set(
+                    len(self._idle[image]))
+        if closed:
+            self._destroy(d)
+        else:
+            LOG.debug("Pool container %r of image %r is ready" % (name, image))
+
+    def claim(self, image):
+        """
+        Take an idle container of an image out of the pool and unpause it.
+        :return: container or None if the pool has none (miss)
+        """
+        d = None
+        with self._lock:
+            queue = self._idle.get(image)
+            if queue:
+                d = queue.popleft()
+                self._hits += 1
+                self.metrics.idle.labels(datacenter=self.dc.label, image=image).set(len(queue))
+            else:
+                self._misses += 1
+        self.metrics.claims.labels(datacenter=self.dc.label, image=image,
+                                   result='hit' if d is not None else 'miss').inc()
+        if image in self.size:
+            self.refill()
+        if d is not None:
+            d.dcli.unpause(d.did)
+            LOG.debug("Claimed pool container %r of image %r" % (d.name, image))
+        return d
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "idle": dict((image, len(q)) for image, q in self._idle.items()),
+                "pending": dict(self._pending),
+                "size": dict(self.size),
+                "max_size": self.max_size
+            }
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(q) for q in self._idle.values())
+
+    def close(self):
+        """
+        Stop refilling and remove all idle containers.
+        """
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            idle = [d for q in self._idle.values() for d in q]
+            for q in self._idle.values():
+                q.clear()
+        for d in idle:
+            self._destroy(d)
+
+    @staticmethod
+    def _destroy(d):
+        try:
+            d.dcli.unpause(d.did)
+        except Exception:
+            pass
+        d.terminate()
@@ -0,0 +1,146 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+import networkx as nx
+from emuvim.dcemulator.routing import switch_graph
+
+LOG = logging.getLogger("dcemulator.protection")
+LOG.setLevel(logging.DEBUG)
+
+# group types used by chains: select (ECMP) and fast-failover (protected chains)
+GROUP_SELECT = 'select'
+GROUP_FAST_FAILOVER = 'ff'
+
+
+def path_links(path):
+    """
+    Directed links (src, dst) of a path (list of switch names).
+    """
+    return list(zip(path[:-1], path[1:]))
+
+
+def path_alive(graph, path):
+    """
+    True if all links of the path are (still) in the graph.
+    """
+    return all(graph.has_edge(u, v) for u, v in path_links(path))
+
+
+def backup_path(graph, path, weight=None):
+    """
+    Shortest path between the first and the last switch of a path that
+    shares no link (in either direction) with it.
+    :param graph: DCNetwork_graph (networkx MultiDiGraph)
+    :param path: primary path (list of switch names)
+    :param weight: link metric to minimize (default: number of hops)
+    :return: list of switch names, None if there is no such path
+    """
+    if path is None or len(path) < 2:
+        return None
+    g = switch_graph(graph)
+    for u, v in path_links(path):
+        for link in [(u, v), (v, u)]:
+            if g.has_edge(*link):
+                g.remove_edge(*link)
+    try:
+        return nx.shortest_path(g, path[0], path[-1], weight=weight or 'hops')
+    except (nx.NetworkXNoPath, nx.NodeNotFound):
+        return None
+
+
+class ChainEdgeIndex(object):
+    """
+    Reverse index from the links between switches to the chains (tags)
+    routed over them, including the links of their backup paths, so that
+    only the affected chains have to be repaired if a link is removed.
+    """
+
+    def __init__(self):
+        self._chains = {}  # (src, dst) -> set of tags
+        self._links = {}  # tag -> set of (src, dst)
+        self._lock = threading.Lock()
+
+    def add(self, tag, paths):
+        """
+        Index a chain (replaces the links it was indexed with before).
+        :param paths: paths used by the chain, None entries are ignored
+        """
+        links = set(link for path in paths if path for link in path_links(path))
+        with self._lock:
+            self._remove(tag)
+            self._links[tag] = links
+            for link in links:
+                self._chains.setdefault(link, set()).add(tag)
+
+    def remove(self, tag):
+        with self._lock:
+            self._remove(tag)
+
+    def _remove(self, tag):
+        for link in self._links.pop(tag, set()):
+            tags = self._chains.get(link)
+            if tags is None:
+                continue
+            tags.discard(tag)
+            if not tags:
+                del self._chains[link]
+
+    def chains(self, src, dst):
+        """
+        Tags of the chains using the link between two switches (in either direction).
+        :return: sorted list of tags
+        """
+        with self._lock:
+            return sorted(self._chains.get((src, dst), set()) |
+                          self._chains.get((dst, src), set()))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._links)
+
+
+def fast_failover_group_ryu(dpid, group_id, ports):
+    """
+    Ryu REST payload of a fast-failover group: the packet is sent to the
+    first port that is up (ports in order of preference).
+    """
+    return {
+        'dpid': dpid,
+        'type': 'FF',
+        'group_id': group_id,
+        'buckets': [{'watch_port': port, 'actions': [{'type': 'OUTPUT', 'port': port}]}
+                    for port in ports]
+    }
+
+
+def fast_failover_group_ofctl(group_id, ports):
+    """
+    ovs-ofctl add-group spec of a fast-failover group over the given ports.
+    """
+    return '-O OpenFlow13 group_id=%s,type=ff,%s' % (
+        group_id, ','.join('bucket=watch_port:%s,output:%s' % (port, port)
+                           for port in ports))
@@ -0,0 +1,151 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+
+LOG = logging.getLogger("dcemulator.qos")
+LOG.setLevel(logging.DEBUG)
+
+# OpenFlow queue ids of chains with a rate (one id per chain, the same id
+# is used on all ports of the chain), queue 0 is the default queue
+QUEUE_ID_MIN = 1
+QUEUE_ID_MAX = 0xfffe
+# max-rate (Mbit/s) of the QoS of a port whose link has no bw set
+DEFAULT_PORT_RATE = 10000.0
+
+
+def bit_rate(mbps):
+    """
+    Mbit/s -> bit/s as expected by OVSDB.
+    """
+    return int(float(mbps) * 1000000)
+
+
+def queue_config(min_rate=None, max_rate=None):
+    """
+    other-config of an OVSDB queue record (rates in Mbit/s).
+    """
+    config = []
+    if min_rate:
+        config.append('other-config:min-rate=%d' % bit_rate(min_rate))
+    if max_rate:
+        config.append('other-config:max-rate=%d' % bit_rate(max_rate))
+    return ' '.join(config)
+
+
+class QosQueues(object):
+    """
+    HTB queues of the chains on the OVS ports, configured in OVSDB with
+    ovs-vsctl. A port gets a linux-htb QoS record with its first queue,
+    the record is destroyed together with the last queue of the port.
+    Note that OVS replaces the tc configuration of the port (e.g. the
+    bw/delay Mininet set for a TCLink) while it has a QoS record.
+    """
+
+    def __init__(self):
+        # (switch name, port name) -> {'qos': uuid, 'queues': {queue id: uuid}}
+        self._ports = {}
+        # owner -> set of (switch, port name, queue id)
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def add(self, owner, switch, port_name, queue_id, min_rate=None, max_rate=None,
+            port_rate=None):
+        """
+        Add the queue of an owner to a switch port (nothing happens if the
+        owner already has a queue on this port).
+        :param switch: OVSSwitch
+        :param min_rate: guaranteed rate of the queue in Mbit/s
+        :param max_rate: max. rate of the queue in Mbit/s
+        :param port_rate: max. rate of the port in Mbit/s (bw of its link)
+        """
+        key = (switch.name, port_name)
+        with self._lock:
+            queues = self._owners.setdefault(owner, set())
+            if (switch, port_name, queue_id) in queues:
+                return
+            config = queue_config(min_rate, max_rate)
+            port = self._ports.get(key)
+            if port is None:
+                # ovs-vsctl prints the uuids of the created records in order
+                out = switch.vsctl(
+                    '-- set port {0} qos=@qos '
+                    '-- --id=@qos create qos type=linux-htb other-config:max-rate={1} queues:{2}=@q '
+                    '-- --id=@q create queue {3}'.format(
+                        port_name, bit_rate(port_rate or DEFAULT_PORT_RATE), queue_id, config))
+                uuids = out.split()
+                self._ports[key] = {'qos': uuids[0], 'queues': {queue_id: uuids[1]}}
+            else:
+                out = switch.vsctl(
+                    '-- --id=@q create queue {0} -- add qos {1} queues {2}=@q'.format(
+                        config, port['qos'], queue_id))
+                port['queues'][queue_id] = out.split()[0]
+            queues.add((switch, port_name, queue_id))
+        LOG.debug("Added queue {0} of {1} on {2}:{3}".format(
+            queue_id, owner, switch.name, port_name))
+
+    def remove(self, owner, keep=None):
+        """
+        Remove the queues of an owner.
+        :param keep: set of (switch name, port name) whose queues are kept
+        :return: number of removed queues
+        """
+        with self._lock:
+            queues = self._owners.get(owner, set())
+            removed = [q for q in queues
+                       if keep is None or (q[0].name, q[1]) not in keep]
+            for switch, port_name, queue_id in removed:
+                queues.discard((switch, port_name, queue_id))
+                key = (switch.name, port_name)
+                port = self._ports.get(key)
+                if port is None or queue_id not in port['queues']:
+                    continue
+                uuid = port['queues'].pop(queue_id)
+                if port['queues']:
+                    switch.vsctl('-- remove qos {0} queues {1} -- destroy queue {2}'.format(
+                        port['qos'], queue_id, uuid))
+                else:
+                    switch.vsctl('-- clear port {0} qos -- destroy qos {1} -- destroy queue {2}'.format(
+                        port_name, port['qos'], uuid))
+                    del self._ports[key]
+            if not queues:
+                self._owners.pop(owner, None)
+        return len(removed)
+
+    def queues(self, owner):
+        """
+        :return: sorted list of (switch name, port name, queue id) of an owner
+        """
+        with self._lock:
+            return sorted((switch.name, port_name, queue_id) for switch, port_name, queue_id
+                          in self._owners.get(owner, set()))
+
+    def __len__(self):
+        """
+        Number of ports with a QoS record.
+        """
+        with self._lock:
+            return len(self._ports)
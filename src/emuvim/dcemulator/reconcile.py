@@ -0,0 +1,315 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import ipaddress
+import threading
+import time
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry
+
+LOG = logging.getLogger("dcemulator.reconcile")
+LOG.setLevel(logging.DEBUG)
+
+# seconds between two reconcile runs
+DEFAULT_RECONCILE_INTERVAL = 30
+
+# Ryu reports OpenFlow 1.3 matches with the OpenFlow 1.0 field names,
+# desired flows may use either of them
+MATCH_FIELD_ALIASES = {
+    'eth_src': 'dl_src',
+    'eth_dst': 'dl_dst',
+    'eth_type': 'dl_type',
+    'vlan_vid': 'dl_vlan',
+    'ipv4_src': 'nw_src',
+    'ipv4_dst': 'nw_dst',
+    'ip_proto': 'nw_proto',
+    'tcp_src': 'tp_src',
+    'tcp_dst': 'tp_dst',
+    'udp_src': 'tp_src',
+    'udp_dst': 'tp_dst',
+}
+
+FULL_COOKIE_MASK = 0xffffffffffffffff
+
+
+def _canonical_value(value):
+    if not isinstance(value, str):
+        return value
+    value = value.strip().lower()
+    if '/' in value:
+        try:
+            net = ipaddress.ip_network(value, strict=False)
+            if net.prefixlen == net.max_prefixlen:
+                return str(net.network_address)
+            return str(net)
+        except ValueError:
+            pass
+    try:
+        return int(value, 0)
+    except ValueError:
+        return value
+
+
+def canonical_match(match):
+    """
+    Normalize a Ryu match dict, so that a desired match and the match
+    reported by the switch compare equal.
+    :return: sorted tuple of (field, value)
+    """
+    return tuple(sorted(
+        (MATCH_FIELD_ALIASES.get(k, k), _canonical_value(v))
+        for k, v in (match or {}).items()))
+
+
+def flow_key(flow):
+    """
+    Key of a flow entry in a switch: (dpid, table, priority, match).
+    """
+    return (int(flow['dpid']), int(flow.get('table_id', 0)),
+            int(flow.get('priority', 0)), canonical_match(flow.get('match')))
+
+
+class DesiredFlowTable(object):
+    """
+    In-memory copy of all flow entries the emulator installed via Ryu.
+    Updated with every flow entry that is pushed (add-flow adds it,
+    del-flows removes all entries the OpenFlow delete would remove, a
+    strict delete only the entry with exactly its priority and match),
+    so it always describes the intended state of the switches.
+    """
+
+    def __init__(self):
+        self._flows = {}  # flow_key -> Ryu flow entry
+        # cookies of the flows managed by this table, only flows with
+        # these cookies are removed from the switches by the reconciler
+        self._cookies = set()
+        self._lock = threading.Lock()
+
+    def apply(self, cmd, flow, strict=False):
+        if cmd == 'add-flow':
+            self.add(flow)
+        elif cmd == 'del-flows':
+            self.delete(flow, strict=strict)
+
+    def add(self, flow):
+        flow = dict(flow)
+        flow['dpid'] = int(flow['dpid'])
+        with self._lock:
+            self._flows[flow_key(flow)] = flow
+            if flow.get('cookie'):
+                self._cookies.add(int(flow['cookie']))
+
+    def delete(self, flow, strict=False):
+        """
+        Remove all entries matched by a delete request.
+        :param strict: strict delete (stats/flowentry/delete_strict),
+                       only removes the entry with the same priority and match
+        :return: number of removed entries
+        """
+        dpid = int(flow['dpid'])
+        table_id = flow.get('table_id')
+        cookie = int(flow.get('cookie', 0))
+        cookie_mask = int(flow.get('cookie_mask', 0))
+        match = set(canonical_match(flow.get('match')))
+        strict_key = flow_key(flow) if strict else None
+        with self._lock:
+            keys = [key for key, f in self._flows.items()
+                    if key[0] == dpid and
+                    (table_id is None or key[1] == int(table_id)) and
+                    (int(f.get('cookie', 0)) & cookie_mask) == (cookie & cookie_mask) and
+                    (key == strict_key if strict else match.issubset(key[3]))]
+            for key in keys:
+                del self._flows[key]
+        return len(keys)
+
+    def flows(self, dpid=None):
+        with self._lock:
+            return [f for key, f in self._flows.items()
+                    if dpid is None or key[0] == int(dpid)]
+
+    def dpids(self):
+        with self._lock:
+            return sorted(set(key[0] for key in self._flows))
+
+    def is_managed(self, cookie):
+        with self._lock:
+            return int(cookie) in self._cookies
+
+    def __len__(self):
+        with self._lock:
+            return len(self._flows)
+
+
+class FlowReconciler(object):
+    """
+    Periodically compares the flow tables of the switches (Ryu stats/flow)
+    with the DesiredFlowTable and only pushes the difference:
+    missing entries are added again, extra entries that carry a managed
+    cookie are deleted. This repairs failed requests, reconnected or
+    flushed switches without reinstalling all chains.
+    Reconcile time and drift counts are exported as Prometheus metrics
+    (and by stats()).
+    """
+
+    def __init__(self, table, ryu, interval=DEFAULT_RECONCILE_INTERVAL, registry=None):
+        """
+        :param table: DesiredFlowTable
+        :param ryu: RyuClient
+        :param interval: seconds between two reconcile runs
+        :param registry: Prometheus CollectorRegistry to export the metrics to
+        """
+        self.table = table
+        self.ryu = ryu
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        # only one reconcile run at a time (periodic and manual)
+        self._run_lock = threading.Lock()
+
+        self._runs = 0
+        self._missing = 0
+        self._extra = 0
+        self._last = {}
+
+        if registry is None:
+            registry = CollectorRegistry()
+        self.registry = registry
+        self.prom_duration = Histogram('sonemu_flow_reconcile_seconds', 'Duration of a flow reconcile run',
+                                       registry=self.registry)
+        self.prom_drift = Counter('sonemu_flow_drift', 'Flow entries repaired by the reconciler',
+                                  ['kind'], registry=self.registry)
+        self.prom_desired = Gauge('sonemu_flow_desired_entries', 'Flow entries in the desired state',
+                                  registry=self.registry)
+
+    def start(self):
+        if not self.interval or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reconcile()
+            except Exception as ex:
+                LOG.warning("Flow reconcile run failed: {0}".format(ex))
+
+    def diff(self, dpid, installed):
+        """
+        :param dpid: switch dpid (int)
+        :param installed: list of flow entries reported by Ryu for this switch
+        :return: (missing, extra) lists of Ryu flow entries
+        """
+        desired = dict((flow_key(f), f) for f in self.table.flows(dpid))
+        present = set()
+        extra = []
+        for f in installed:
+            key = (int(dpid), int(f.get('table_id', 0)),
+                   int(f.get('priority', 0)), canonical_match(f.get('match')))
+            present.add(key)
+            if key not in desired and self.table.is_managed(f.get('cookie', 0)):
+                extra.append(dict(f, dpid=int(dpid)))
+        missing = [f for key, f in desired.items() if key not in present]
+        return missing, extra
+
+    def reconcile(self):
+        """
+        Run one reconcile pass over all switches with desired entries.
+        :return: dict with the number of missing and extra entries
+        """
+        with self._run_lock:
+            start = time.time()
+            dpids = self.table.dpids()
+            replies = self.ryu.request_many(
+                [{'prefix': 'stats/flow', 'dpid': dpid} for dpid in dpids])
+            fixes = []
+            missing_count = 0
+            extra_count = 0
+            for dpid, ret in zip(dpids, replies):
+                if not isinstance(ret, dict):
+                    # switch not connected (yet), try again in the next run
+                    LOG.debug("No flow stats for dpid {0}: {1}".format(dpid, ret))
+                    continue
+                missing, extra = self.diff(dpid, ret.get(str(dpid), []))
+                missing_count += len(missing)
+                extra_count += len(extra)
+                fixes.extend({'prefix': 'stats/flowentry/add', 'data': f}
+                             for f in missing)
+                fixes.extend({'prefix': 'stats/flowentry/delete_strict',
+                              'data': self._strict_delete(f)} for f in extra)
+            errors = [r for r in self.ryu.request_many(fixes, check=True)
+                      if isinstance(r, Exception)]
+            for ex in errors:
+                LOG.warning("Flow reconcile request failed: {0}".format(ex))
+
+            duration = time.time() - start
+            self.prom_duration.observe(duration)
+            self.prom_drift.labels(kind='missing').inc(missing_count)
+            self.prom_drift.labels(kind='extra').inc(extra_count)
+            self.prom_desired.set(len(self.table))
+            self._runs += 1
+            self._missing += missing_count
+            self._extra += extra_count
+            self._last = {
+                "switches": len(dpids),
+                "missing": missing_count,
+                "extra": extra_count,
+                "errors": len(errors),
+                "duration": duration
+            }
+            if missing_count or extra_count:
+                LOG.info("Flow reconcile: {0} missing, {1} extra entries repaired in {2:.3f}s".format(
+                    missing_count, extra_count, duration))
+            return dict(self._last)
+
+    @staticmethod
+    def _strict_delete(flow):
+        return {
+            'dpid': flow['dpid'],
+            'table_id': flow.get('table_id', 0),
+            'priority': flow.get('priority', 0),
+            'cookie': flow.get('cookie', 0),
+            'cookie_mask': FULL_COOKIE_MASK,
+            'match': flow.get('match', {})
+        }
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "desired": len(self.table),
+            "runs": self._runs,
+            "missing": self._missing,
+            "extra": self._extra,
+            "last": dict(self._last)
+        }
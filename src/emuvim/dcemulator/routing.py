@@ -0,0 +1,179 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+from itertools import islice
+import networkx as nx
+from emuvim.dcemulator.topology import ENDPOINT_TYPES
+
+LOG = logging.getLogger("dcemulator.routing")
+LOG.setLevel(logging.DEBUG)
+
+# max. number of candidate paths checked by the k-shortest path search
+MAX_K_PATHS = 8
+# link attributes set by DCNetwork.addLink (delay in ms, bw in Mbit/s)
+LINK_METRICS = ['bw', 'delay', 'jitter', 'loss']
+
+
+class NoFeasiblePath(Exception):
+    """
+    Raised if no path satisfies the constraints of a chain.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class BandwidthReservations(object):
+    """
+    Bandwidth reserved by chains on the (directed) links between switches.
+    Reservations are recorded per owner (chain) so that they can be
+    released when the chain is removed.
+    """
+
+    def __init__(self):
+        self._reserved = dict()  # (src, dst) -> Mbit/s
+        self._owners = dict()  # owner -> list of ((src, dst), Mbit/s)
+        self._lock = threading.Lock()
+
+    def reserve(self, owner, path, bw):
+        """
+        Reserve bw on every link of a path (list of switch names).
+        """
+        links = list(zip(path[:-1], path[1:]))
+        with self._lock:
+            for link in links:
+                self._reserved[link] = self._reserved.get(link, 0.0) + bw
+                self._owners.setdefault(owner, []).append((link, bw))
+        LOG.debug("Reserved {0} Mbit/s for {1} on {2}".format(bw, owner, links))
+
+    def release(self, owner):
+        """
+        Release all reservations of an owner.
+        :return: number of released link reservations
+        """
+        with self._lock:
+            reservations = self._owners.pop(owner, [])
+            for link, bw in reservations:
+                left = self._reserved.get(link, 0.0) - bw
+                if left > 1e-9:
+                    self._reserved[link] = left
+                else:
+                    self._reserved.pop(link, None)
+        return len(reservations)
+
+    def reserved(self, src, dst):
+        with self._lock:
+            return self._reserved.get((src, dst), 0.0)
+
+    def to_dict(self):
+        with self._lock:
+            return dict(("{0}->{1}".format(*link), bw)
+                        for link, bw in self._reserved.items())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._owners)
+
+
+def _metric(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def switch_graph(graph, reservations=None, min_bw=None):
+    """
+    Simple directed graph of the switches, with the numeric link metrics of
+    the link a chain would use between two switches (the first one) and its
+    residual bandwidth. Links with less residual bandwidth than min_bw are
+    pruned.
+    """
+    node_types = nx.get_node_attributes(graph, 'type')
+    g = nx.DiGraph()
+    g.add_nodes_from(n for n in graph.nodes()
+                     if node_types.get(n) not in ENDPOINT_TYPES)
+    seen = set()
+    for u, v, d in graph.edges(data=True):
+        if u not in g or v not in g or (u, v) in seen:
+            continue
+        seen.add((u, v))
+        attrs = dict((m, _metric(d.get(m))) for m in LINK_METRICS
+                     if _metric(d.get(m)) is not None)
+        attrs.setdefault('delay', 0.0)
+        attrs['hops'] = 1
+        residual = None
+        if 'bw' in attrs:
+            residual = attrs['bw']
+            if reservations is not None:
+                residual -= reservations.reserved(u, v)
+        attrs['residual'] = residual
+        if min_bw and residual is not None and residual < min_bw:
+            continue
+        g.add_edge(u, v, **attrs)
+    return g
+
+
+def path_delay(g, path):
+    return sum(g[u][v]['delay'] for u, v in zip(path[:-1], path[1:]))
+
+
+def constrained_path(graph, src, dst, max_delay=None, min_bw=None,
+                     reservations=None, weight=None, k=MAX_K_PATHS):
+    """
+    Path between two switches with an end-to-end delay of at most max_delay
+    (ms) and at least min_bw (Mbit/s) residual bandwidth on every link.
+    Links without enough bandwidth are pruned, then the k shortest paths
+    (Yen, ordered by weight or hop count) are checked against the delay
+    budget. If none of them fits, the lowest delay path is used.
+    Raises NoFeasiblePath with the reason if no path satisfies the constraints.
+    :return: list of switch names
+    """
+    g = switch_graph(graph, reservations=reservations, min_bw=min_bw)
+    if src not in g or dst not in g:
+        raise NoFeasiblePath("{0} or {1} is not a switch".format(src, dst))
+    try:
+        min_delay = nx.shortest_path_length(g, src, dst, weight='delay')
+    except nx.NetworkXNoPath:
+        if min_bw:
+            raise NoFeasiblePath("no path from {0} to {1} with {2} Mbit/s residual bandwidth".format(
+                src, dst, min_bw))
+        raise NoFeasiblePath("no path from {0} to {1}".format(src, dst))
+    # fail fast, no path can be faster than this one
+    if max_delay is not None and min_delay > max_delay:
+        raise NoFeasiblePath("lowest delay from {0} to {1} is {2} ms, exceeds the budget of {3} ms".format(
+            src, dst, min_delay, max_delay))
+
+    if weight not in LINK_METRICS:
+        weight = 'hops'
+    for path in islice(nx.shortest_simple_paths(g, src, dst, weight=weight), k):
+        if max_delay is None or path_delay(g, path) <= max_delay:
+            return path
+    return nx.shortest_path(g, src, dst, weight='delay')
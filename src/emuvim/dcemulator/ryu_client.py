@@ -0,0 +1,232 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+import time
+import requests
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from prometheus_client import Gauge, Histogram, CollectorRegistry
+
+LOG = logging.getLogger("dcemulator.ryu_client")
+LOG.setLevel(logging.DEBUG)
+
+# max. number of concurrent requests (and pooled connections) to Ryu
+MAX_RYU_WORKERS = 16
+
+
+class RyuClient(object):
+    """
+    Client for the Ryu ofctl REST api.
+    Requests are executed by a pool of worker threads that share a bounded
+    pool of HTTP connections, so many requests can be in flight at once.
+
+    request() is the blocking call used by existing code, submit() and
+    request_many() are the concurrent entry points. Requests submitted with
+    the same key (e.g. a switch) are sent one after the other.
+    Request latency and queue depth are exported as Prometheus metrics
+    (and by stats()).
+    """
+
+    def __init__(self, api_url, max_workers=MAX_RYU_WORKERS, registry=None):
+        """
+        :param api_url: base url of the Ryu REST api, e.g. http://localhost:8080
+        :param max_workers: max. number of requests in flight
+        :param registry: Prometheus CollectorRegistry to export the metrics to
+        """
+        self.api_url = api_url
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self._lock = threading.Lock()
+        self._queued = 0  # submitted, but not yet started
+        self._in_flight = 0  # started, but not yet finished
+        self._max_queued = 0
+        self._requests = 0
+        self._errors = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        # key -> requests waiting for the running request of that key
+        self._ordered = dict()
+
+        if registry is None:
+            registry = CollectorRegistry()
+        self.registry = registry
+        self.prom_latency = Histogram('sonemu_ryu_request_seconds', 'Latency of Ryu REST requests',
+                                      ['prefix'], registry=self.registry)
+        self.prom_queue_depth = Gauge('sonemu_ryu_queue_depth', 'Ryu REST requests waiting for a worker',
+                                      registry=self.registry)
+        self.prom_in_flight = Gauge('sonemu_ryu_in_flight', 'Ryu REST requests in flight',
+                                    registry=self.registry)
+
+    def url(self, prefix, dpid=None):
+        if dpid:
+            return self.api_url + '/' + str(prefix) + '/' + str(dpid)
+        return self.api_url + '/' + str(prefix)
+
+    def request(self, prefix, dpid=None, data=None, check=False):
+        """
+        Send a request to the Ryu REST api (POST if data is given, else GET)
+        and wait for the reply.
+        :param check: raise an exception if Ryu does not answer with 200 (OK)
+        :return: decoded json reply or reply text
+        """
+        return self.submit(prefix, dpid=dpid, data=data, check=check).result()
+
+    def submit(self, prefix, dpid=None, data=None, check=False, key=None):
+        """
+        Queue a request without waiting for its reply.
+        :param key: requests with the same key are sent in the order they
+                    were submitted, each one after the reply to the previous
+                    one, requests with different keys (or none) in parallel
+        :return: concurrent.futures.Future
+        """
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+            self.prom_queue_depth.set(self._queued)
+            if key is not None:
+                future = Future()
+                queue = self._ordered.get(key)
+                start = queue is None
+                if start:
+                    queue = self._ordered[key] = deque()
+                queue.append((future, prefix, dpid, data, check))
+        if key is None:
+            return self.executor.submit(self._do_request, prefix, dpid, data, check)
+        if start:
+            # one worker sends all queued requests of the key
+            self.executor.submit(self._drain, key)
+        return future
+
+    def _drain(self, key):
+        while True:
+            with self._lock:
+                queue = self._ordered[key]
+                if not queue:
+                    del self._ordered[key]
+                    return
+                future, prefix, dpid, data, check = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._do_request(prefix, dpid, data, check))
+            except Exception as ex:
+                future.set_exception(ex)
+
+    def request_many(self, reqs, check=False):
+        """
+        Send a list of requests concurrently and wait for all replies.
+        :param reqs: list of dicts with the keys prefix, dpid (optional), data (optional)
+        :return: list of replies in the order of the requests,
+                 failed requests are returned as their exception
+        """
+        futures = [self.submit(r['prefix'], dpid=r.get('dpid'), data=r.get('data'), check=check)
+                   for r in reqs]
+        ret = []
+        for f in futures:
+            try:
+                ret.append(f.result())
+            except Exception as ex:
+                ret.append(ex)
+        return ret
+
+    def _do_request(self, prefix, dpid, data, check):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+            self.prom_queue_depth.set(self._queued)
+            self.prom_in_flight.set(self._in_flight)
+        start = time.time()
+        failed = True
+        try:
+            ret = self._send(prefix, dpid, data, check)
+            failed = False
+            return ret
+        finally:
+            latency = time.time() - start
+            self.prom_latency.labels(prefix=str(prefix)).observe(latency)
+            with self._lock:
+                self._in_flight -= 1
+                self._requests += 1
+                if failed:
+                    self._errors += 1
+                self._latency_sum += latency
+                self._latency_max = max(self._latency_max, latency)
+                self.prom_in_flight.set(self._in_flight)
+
+    def _send(self, prefix, dpid, data, check):
+        url = self.url(prefix, dpid)
+
+        LOG.debug('sending RYU command: %s, payload: %s', url, data)
+        if data:
+            req = self.session.post(url, json=data)
+        else:
+            req = self.session.get(url)
+
+        # do extra logging if status code is not 200 (OK)
+        if req.status_code is not requests.codes.ok:
+            LOG.info(
+                'type {0}  encoding: {1} text: {2} headers: {3} history: {4}'.format(req.headers['content-type'],
+                                                                                     req.encoding, req.text,
+                                                                                     req.headers, req.history))
+            LOG.info('url: {0}'.format(str(url)))
+            if data:
+                LOG.info('POST: {0}'.format(str(data)))
+            LOG.info('status: {0} reason: {1}'.format(
+                req.status_code, req.reason))
+            if check:
+                raise Exception('Ryu request {0} failed with status {1}: {2}'.format(
+                    prefix, req.status_code, req.reason))
+
+        if 'json' in req.headers['content-type']:
+            return req.json()
+
+        return req.text.rstrip()
+
+    def stats(self):
+        """
+        Request counters to tune the number of workers.
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "requests": self._requests,
+                "errors": self._errors,
+                "queue_depth": self._queued,
+                "max_queue_depth": self._max_queued,
+                "in_flight": self._in_flight,
+                "latency_avg": self._latency_sum / self._requests if self._requests else 0.0,
+                "latency_max": self._latency_max
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
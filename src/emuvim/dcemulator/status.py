@@ -0,0 +1,165 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+import time
+import docker
+
+LOG = logging.getLogger("dcemulator.status")
+LOG.setLevel(logging.DEBUG)
+
+# seconds of one events request, the subscriber checks for stop() in between
+EVENT_WINDOW = 2
+# container events that change the inspect result
+STATE_ACTIONS = ['create', 'start', 'restart', 'die', 'stop', 'kill', 'oom',
+                 'pause', 'unpause', 'update', 'rename']
+
+
+class ContainerStatusCache(object):
+    """
+    Docker inspect results of the containers, kept up to date by one
+    background subscriber to the Docker events stream: a container is
+    inspected again when an event changes its state (start, die, pause,
+    update, ...) and dropped when it is destroyed. Status requests are
+    served from memory instead of one Docker API call per container.
+
+    While the subscriber is not running (or lost the events stream),
+    every request inspects the container.
+    """
+
+    def __init__(self, dcli=None):
+        """
+        :param dcli: docker.APIClient, default: client from the environment
+        """
+        self.dcli = dcli if dcli is not None else docker.from_env().api
+        # container id -> inspect dict
+        self._cache = {}
+        # container id -> number of handled events, an inspect result is
+        # only cached if no event of the container arrived in the meantime
+        self._generation = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._running = False
+        self._hits = 0
+        self._misses = 0
+        self._events = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='container-events')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(EVENT_WINDOW * 2)
+        self._thread = None
+        self._set_running(False)
+
+    def inspect(self, container_id, fresh=False):
+        """
+        :param container_id: id of the container
+        :param fresh: bypass the cache
+        :return: inspect dict of the container
+        """
+        with self._lock:
+            cinspect = None if fresh or not self._running else self._cache.get(container_id)
+            if cinspect is not None:
+                self._hits += 1
+                return cinspect
+            self._misses += 1
+        return self._refresh(container_id)
+
+    def invalidate(self, container_id):
+        with self._lock:
+            self._cache.pop(container_id, None)
+
+    def _refresh(self, container_id):
+        with self._lock:
+            generation = self._generation.get(container_id, 0)
+        cinspect = self.dcli.inspect_container(container_id)
+        with self._lock:
+            # the result may be outdated if an event arrived during the inspect
+            if self._running and self._generation.get(container_id, 0) == generation:
+                self._cache[cinspect['Id']] = cinspect
+        return cinspect
+
+    def _set_running(self, running):
+        with self._lock:
+            self._running = running
+            # nothing is known about the containers without the events
+            self._cache.clear()
+
+    def _run(self):
+        since = int(time.time())
+        while not self._stop.is_set():
+            until = since + EVENT_WINDOW
+            try:
+                if not self._running:
+                    self._set_running(True)
+                for event in self.dcli.events(since=since, until=until,
+                                              filters={'type': 'container'}, decode=True):
+                    self._handle(event)
+                since = until
+            except Exception:
+                LOG.exception("Lost the Docker events stream")
+                self._set_running(False)
+                self._stop.wait(EVENT_WINDOW)
+                since = int(time.time())
+
+    def _handle(self, event):
+        container_id = event.get('id') or event.get('Actor', {}).get('ID')
+        action = event.get('Action') or event.get('status')
+        with self._lock:
+            self._events += 1
+            cached = container_id in self._cache
+            if action == 'destroy' or action in STATE_ACTIONS:
+                self._generation[container_id] = self._generation.get(container_id, 0) + 1
+        if action == 'destroy':
+            self.invalidate(container_id)
+        elif cached and action in STATE_ACTIONS:
+            try:
+                self._refresh(container_id)
+            except docker.errors.NotFound:
+                self.invalidate(container_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._running,
+                "containers": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses,
+                "events": self._events
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
@@ -0,0 +1,108 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from prometheus_client import Histogram, CollectorRegistry
+
+LOG = logging.getLogger("dcemulator.timing")
+LOG.setLevel(logging.DEBUG)
+
+# chain setup ranges from a few ms (one switch, Ryu) to seconds
+# (long paths, ovs-ofctl, docker exec calls)
+TIMING_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5,
+                  1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+class PhaseTimer(object):
+    """
+    Records how long the phases of network operations (chain add/delete,
+    E-LAN setup, load balancer install, ...) take, as Prometheus histograms
+    labeled by operation, backend and phase, e.g.:
+
+        with timer.operation('chain_add', 'ryu'):
+            with timer.phase('chain_add', 'ryu', 'compile'):
+                ...
+    """
+
+    def __init__(self, registry=None):
+        """
+        :param registry: Prometheus CollectorRegistry to export the metrics to
+        """
+        if registry is None:
+            registry = CollectorRegistry()
+        self.registry = registry
+        self.prom_phase = Histogram('sonemu_network_phase_seconds',
+                                    'Duration of a single phase of a network operation',
+                                    ['operation', 'backend', 'phase'],
+                                    buckets=TIMING_BUCKETS, registry=self.registry)
+        self.prom_operation = Histogram('sonemu_network_operation_seconds',
+                                        'Duration of a complete network operation',
+                                        ['operation', 'backend'],
+                                        buckets=TIMING_BUCKETS, registry=self.registry)
+
+    @contextmanager
+    def phase(self, operation, backend, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.prom_phase.labels(operation=operation, backend=backend,
+                                   phase=phase).observe(time.time() - start)
+
+    @contextmanager
+    def operation(self, operation, backend):
+        start = time.time()
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            self.prom_operation.labels(operation=operation,
+                                       backend=backend).observe(duration)
+            LOG.debug("{0} ({1}) took {2:.3f}s".format(operation, backend, duration))
+
+    def observe(self, operation, backend, phase, duration):
+        self.prom_phase.labels(operation=operation, backend=backend,
+                               phase=phase).observe(duration)
+
+
+def timed_operation(operation):
+    """
+    Decorator that records the duration of a method as network operation.
+    Works for DCNetwork methods and for methods of objects that
+    reference the DCNetwork as self.net (e.g. OpenstackManage).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            net = self if hasattr(self, 'timer') else getattr(self, 'net', None)
+            if net is None:
+                return func(self, *args, **kwargs)
+            with net.timer.operation(operation, net.flow_backend):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,215 @@
+# Copyright (c) 2015 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import logging
+import threading
+import networkx as nx
+from collections import namedtuple
+
+LOG = logging.getLogger("dcemulator.topology")
+LOG.setLevel(logging.DEBUG)
+
+
+# node types that are end points and never forward chain traffic
+# (containers, external SAPs and the internal SAPs of the gatekeepers)
+ENDPOINT_TYPES = ['docker', 'sap_ext', 'sap_int']
+
+# switch port to which a node interface is connected
+SwitchPort = namedtuple(
+    'SwitchPort', ['switch', 'port_nr', 'port_name', 'intf_id', 'intf_name'])
+
+
+class InterfaceIndex(object):
+    """
+    Hash index of all node interfaces in the DCNetwork graph:
+    (node name, interface id or name) -> SwitchPort of the connected node.
+    Kept up to date by DCNetwork.addLink/removeLink, so callers do not have
+    to scan the neighbors and multi-edges of the graph.
+    """
+
+    def __init__(self):
+        # (node, interface id/name) -> SwitchPort
+        self._ports = dict()
+        # node -> list of SwitchPorts in the order the links were added
+        self._node_ports = dict()
+
+    def add(self, node, intf_id, intf_name, switch, port_nr, port_name):
+        port = SwitchPort(switch, port_nr, port_name, intf_id, intf_name)
+        self._node_ports.setdefault(node, []).append(port)
+        # interfaces can be referenced by their id (descriptor) or name
+        self._ports.setdefault((node, intf_id), port)
+        self._ports.setdefault((node, intf_name), port)
+        return port
+
+    def remove_node(self, node):
+        for port in self._node_ports.pop(node, []):
+            for key in [(node, port.intf_id), (node, port.intf_name)]:
+                if self._ports.get(key) is port:
+                    del self._ports[key]
+
+    def rebuild_node(self, graph, node):
+        """
+        Re-index all interfaces of a node from its out-edges in the graph.
+        """
+        self.remove_node(node)
+        if node not in graph:
+            return
+        for _, nbr, d in graph.out_edges(node, data=True):
+            self.add(node, d['src_port_id'], d['src_port_name'],
+                     nbr, d['dst_port_nr'], d['dst_port_name'])
+
+    def clear(self):
+        self._ports.clear()
+        self._node_ports.clear()
+
+    def lookup(self, node, intf=None):
+        """
+        :param node: node name
+        :param intf: interface id or name, None = first interface of the node
+        :return: SwitchPort or None
+        """
+        if intf is None:
+            ports = self._node_ports.get(node)
+            return ports[0] if ports else None
+        return self._ports.get((node, intf))
+
+    def ports(self, node):
+        return list(self._node_ports.get(node, []))
+
+    def __len__(self):
+        return len(self._node_ports)
+
+
+class NodeRegistry(object):
+    """
+    Hash index of all nodes of the DCNetwork: name -> (node, kind), with
+    kind e.g. 'container', 'switch', 'sap_ext', 'host' or 'station'.
+    Kept up to date by the DCNetwork add/remove wrappers, so that name
+    lookups and duplicate checks do not scan the data centers.
+    """
+
+    def __init__(self):
+        self._nodes = dict()
+        self._lock = threading.Lock()
+
+    def add(self, name, node, kind):
+        with self._lock:
+            self._nodes[name] = (node, kind)
+
+    def remove(self, name):
+        """
+        :return: the removed node or None
+        """
+        with self._lock:
+            entry = self._nodes.pop(name, None)
+        return entry[0] if entry is not None else None
+
+    def get(self, name, kind=None):
+        """
+        :return: node or None (also if it is not of the given kind)
+        """
+        entry = self._nodes.get(name)
+        if entry is None or kind is not None and entry[1] != kind:
+            return None
+        return entry[0]
+
+    def kind(self, name):
+        entry = self._nodes.get(name)
+        return entry[1] if entry is not None else None
+
+    def names(self, kind=None):
+        with self._lock:
+            return [name for name, (_, k) in self._nodes.items()
+                    if kind is None or k == kind]
+
+    def __contains__(self, name):
+        return name in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class PathCache(object):
+    """
+    Cache of shortest paths between switches, keyed on (src, dst, weight).
+    Paths are computed on a switch-only view of the DCNetwork graph (VNF and
+    SAP nodes are dropped). All cached paths are invalidated as soon as the
+    topology epoch is bumped by a topology change.
+    """
+
+    def __init__(self):
+        # incremented on every topology change
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self._cached_epoch = 0
+        self._paths = dict()
+        self._switch_graph = None
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """
+        Invalidate all cached paths (called on topology changes).
+        """
+        with self._lock:
+            self.epoch += 1
+
+    def get(self, graph, src, dst, weight=None):
+        """
+        Shortest path between two switches.
+        Raises the networkx exceptions if no path exists.
+        :return: list of switch names
+        """
+        with self._lock:
+            if self._cached_epoch != self.epoch:
+                self._paths.clear()
+                self._switch_graph = None
+                self._cached_epoch = self.epoch
+            key = (src, dst, weight)
+            path = self._paths.get(key)
+            if path is not None:
+                self.hits += 1
+                return list(path)
+            self.misses += 1
+            if self._switch_graph is None:
+                self._switch_graph = self._switch_view(graph)
+            path = nx.shortest_path(
+                self._switch_graph, src, dst, weight=weight)
+            self._paths[key] = path
+            return list(path)
+
+    def _switch_view(self, graph):
+        node_types = nx.get_node_attributes(graph, 'type')
+        switches = [n for n in graph.nodes()
+                    if node_types.get(n) not in ENDPOINT_TYPES]
+        return graph.subgraph(switches)
+
+    def stats(self):
+        return {
+            "epoch": self.epoch,
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._paths)
+        }
@@ -23,10 +23,13 @@
 # the Horizon 2020 and 5G-PPP programmes. The authors would like to
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.sonata-nfv.eu).
+import time
 import unittest
 from emuvim.dcemulator.node import EmulatorCompute
+from emuvim.dcemulator.link import NETLINK_AVAILABLE
 from emuvim.test.base import SimpleTestTopology
 from mininet.node import RemoteController
+from mininet.link import Link
 
 
 # @unittest.skip("disabled topology tests for development")
@@ -79,6 +82,54 @@ class testEmulatorTopology(SimpleTestTopology):
         # stop Mininet network
         self.stopNet()
 
+    def testMultipleDatacenterBatchStartup(self):
+        """
+        Start the switches of two data centers in one batch
+        and check that they forward traffic.
+        """
+        # create network
+        self.createNet(nswitches=1, ndatacenter=2, nhosts=2, ndockers=0,
+                       batch_startup=True)
+        # setup links
+        self.net.addLink(self.dc[0], self.h[0])
+        self.net.addLink(self.h[1], self.dc[1])
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        self.assertTrue(len(self.net.switches) == 3)
+        timings = self.net.getBootTimings()
+        self.assertIn('bridges', timings)
+        self.assertIn('link_config', timings)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping([self.h[0], self.h[1]]) <= 0.0)
+        # stop Mininet network
+        self.stopNet()
+
+    @unittest.skipIf(not NETLINK_AVAILABLE, "needs pyroute2")
+    def testMultipleDatacenterNetlinkLinks(self):
+        """
+        Create the links of two data centers over netlink
+        and check connectivity and the link config.
+        """
+        # create network
+        self.createNet(nswitches=0, ndatacenter=2, nhosts=2, ndockers=0,
+                       netlink_links=True)
+        # setup links
+        links = self.net.addLinks([(self.dc[0], self.h[0]),
+                                   (self.h[1], self.dc[1]),
+                                   (self.dc[0], self.dc[1], {'delay': '5ms', 'bw': 100})])
+        self.assertTrue(len(links) == 3)
+        # start Mininet network
+        self.startNet()
+        out = links[2].intf1.node.cmd('tc qdisc show dev %s' % links[2].intf1.name)
+        self.assertIn('netem', out)
+        self.assertIn('htb', out)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping([self.h[0], self.h[1]]) <= 0.0)
+        # stop Mininet network
+        self.stopNet()
+
     def testMultipleDatacenterWithIntermediateSwitches(self):
         """
         Create a two data centers and interconnect them with additional
@@ -104,6 +155,43 @@ class testEmulatorTopology(SimpleTestTopology):
         # stop Mininet network
         self.stopNet()
 
+    def testPathCacheInvalidation(self):
+        """
+        Check that the cached shortest paths are invalidated by
+        topology changes and never lead through containers.
+        """
+        # create network
+        self.createNet(
+            nswitches=3, ndatacenter=0, nhosts=0, ndockers=1,
+            autolinkswitches=True)
+        # the container is connected to the first and the last switch
+        self.net.addLink(self.d[0], self.s[0])
+        self.net.addLink(self.d[0], self.s[2])
+        # start Mininet network
+        self.startNet()
+        self.assertTrue(self.net.getShortestPath('s1', 's3') == ['s1', 's2', 's3'])
+        self.assertTrue(self.net.getShortestPath('s1', 's3') == ['s1', 's2', 's3'])
+        stats = self.net.getPathCacheStats()
+        self.assertTrue(stats['hits'] == 1)
+        self.assertTrue(stats['misses'] == 1)
+        # addLink
+        self.net.addLink(self.s[0], self.s[2])
+        self.assertTrue(self.net.getPathCacheStats()['epoch'] > stats['epoch'])
+        self.assertTrue(self.net.getShortestPath('s1', 's3') == ['s1', 's3'])
+        # removeLink
+        stats = self.net.getPathCacheStats()
+        self.net.removeLink(node1=self.s[0], node2=self.s[2])
+        self.assertTrue(self.net.getPathCacheStats()['epoch'] > stats['epoch'])
+        self.assertTrue(self.net.getShortestPath('s1', 's3') == ['s1', 's2', 's3'])
+        # removeDocker
+        stats = self.net.getPathCacheStats()
+        self.net.removeDocker('d0')
+        self.assertTrue(self.net.getPathCacheStats()['epoch'] > stats['epoch'])
+        self.assertTrue(self.net.getShortestPath('s1', 's3') == ['s1', 's2', 's3'])
+        self.assertTrue(self.net.getPathCacheStats()['misses'] == stats['misses'] + 1)
+        # stop Mininet network
+        self.stopNet()
+
 
 class testEmulatorNetworking(SimpleTestTopology):
 
@@ -280,6 +368,494 @@ class testEmulatorNetworking(SimpleTestTopology):
         # stop Mininet network
         self.stopNet()
 
+    def testSDNProgramChainsBatch(self):
+        """
+        Compile both directions of a chain into one flow batch
+        and check the reported per-hop outcomes.
+        """
+        # create network
+        self.createNet(
+            nswitches=3, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=True,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[2], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        vnf1 = self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        vnf2 = self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        # should be not not yet connected
+        self.assertTrue(self.net.ping([vnf1, vnf2]) > 0.0)
+        # program both directions in one batch
+        res = self.net.programChains(
+            [{'vnf_src_name': 'vnf1', 'vnf_dst_name': 'vnf2',
+              'vnf_src_interface': 'intf1', 'vnf_dst_interface': 'intf2'},
+             {'vnf_src_name': 'vnf2', 'vnf_dst_name': 'vnf1',
+              'vnf_src_interface': 'intf2', 'vnf_dst_interface': 'intf1'}],
+            cmd='add-flow')
+        self.assertTrue(res.success)
+        # 5 switches on each path
+        self.assertTrue(len(res.hops) == 10)
+        self.assertTrue(len(res.messages) == 2)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping([vnf1, vnf2]) <= 0.0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingMplsLabels(self):
+        """
+        Isolate chains with MPLS labels instead of vlan tags.
+        """
+        # create network
+        self.createNet(
+            nswitches=3, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=True,
+            controller=RemoteController,
+            enable_learning=False,
+            label_mode='mpls')
+        # setup links
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[2], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        vnf1 = self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        vnf2 = self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        # should be not not yet connected
+        self.assertTrue(self.net.ping([vnf1, vnf2]) > 0.0)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='add-flow')
+        # labels are taken from the MPLS range, not from the vlan pool
+        self.assertTrue(len(self.net.chain_labels) == 2)
+        self.assertTrue(len(self.net.vlans) == 0)
+        self.assertTrue(min(self.net.installed_chains) >= 16)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping([vnf1, vnf2]) <= 0.0)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='del-flows')
+        self.assertTrue(len(self.net.chain_labels) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainVlanRelease(self):
+        """
+        Check that removing a chain gives its vlan tag back to the pool.
+        """
+        # create network
+        self.createNet(
+            nswitches=1, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=True,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='add-flow', cookie=11)
+        self.assertTrue(len(self.net.vlans) == 2)
+        self.assertTrue(len(self.net.installed_chains) == 2)
+        # only the switches of the path hold flows with this cookie
+        self.assertTrue(len(self.net.cookie_index.dpids(11)) == 3)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='del-flows')
+        self.assertTrue(len(self.net.vlans) == 0)
+        self.assertTrue(len(self.net.installed_chains) == 0)
+        # a chain that can not be compiled releases its tag right away
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='add-flow',
+                                path=[self.dc[0].switch.name, 'vnf2'])
+        self.assertTrue('is not a switch' in ret)
+        self.assertTrue(len(self.net.vlans) == 0)
+        self.assertTrue(len(self.net.installed_chains) == 0)
+        # E-LAN tags are released as well
+        before = self.net.getOvsdbStats()
+        tag = self.net.setLAN([{'name': 'vnf1', 'interface': 'intf1'},
+                               {'name': 'vnf2', 'interface': 'intf2'}])
+        self.assertTrue(self.net.vlans.is_used(tag))
+        # both ports are tagged in a single transaction (or ovs-vsctl call)
+        after = self.net.getOvsdbStats()
+        self.assertTrue(after['transactions'] + after['fallbacks'] ==
+                        before['transactions'] + before['fallbacks'] + 1)
+        self.assertTrue(list(self.net.port_tags.values()).count(tag) == 2)
+        self.assertTrue(self.net.removeLAN(tag))
+        self.assertFalse(self.net.vlans.is_used(tag))
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNFlowReconcile(self):
+        """
+        Flush the flow table of a switch and check that the reconciler
+        reinstalls only the missing chain entries.
+        """
+        # create network
+        self.createNet(
+            nswitches=1, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=True,
+            controller=RemoteController,
+            enable_learning=False,
+            reconcile_interval=0)
+        # setup links
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='add-flow')
+        # nothing to repair
+        ret = self.net.reconcileFlows()
+        self.assertTrue(ret['missing'] == 0)
+        # flush the middle switch
+        dpid = int(self.s[0].dpid, 16)
+        self.net.ryu_REST('stats/flowentry/delete', data={'dpid': dpid})
+        ret = self.net.reconcileFlows()
+        self.assertTrue(ret['missing'] == 2)
+        self.assertTrue(self.net.reconcileFlows()['missing'] == 0)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping(
+            [self.net.getNodeByName("vnf1"), self.net.getNodeByName("vnf2")]) <= 0.0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNFlowReconcileDeletedChain(self):
+        """
+        Delete a chain by its cookie (like the OpenStack api does) and check
+        that the reconciler does not reinstall it.
+        """
+        # create network
+        self.createNet(
+            nswitches=1, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=True,
+            controller=RemoteController,
+            enable_learning=False,
+            reconcile_interval=0)
+        # setup links
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='add-flow', cookie=21)
+        self.assertTrue(self.net.ping(
+            [self.net.getNodeByName("vnf1"), self.net.getNodeByName("vnf2")]) <= 0.0)
+        # delete the chain
+        self.net.deleteFlows(
+            [{'dpid': dpid, 'cookie': 21, 'cookie_mask': 0xffffffffffffffff}
+             for dpid in self.net.cookie_index.dpids(21)])
+        self.assertFalse([f for f in self.net.flow_table.flows()
+                          if int(f.get('cookie', 0)) == 21])
+        # the deleted flows are not missing, so nothing is reinstalled
+        ret = self.net.reconcileFlows()
+        self.assertTrue(ret['missing'] == 0)
+        self.assertTrue(self.net.ping(
+            [self.net.getNodeByName("vnf1"), self.net.getNodeByName("vnf2")]) > 0.0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingEcmp(self):
+        """
+        Spread a chain over two equal-cost paths with a select group.
+        """
+        # create network
+        self.createNet(
+            nswitches=2, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=False,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links: two paths between the data centers
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        self.net.addLink(self.dc[0], self.s[1])
+        self.net.addLink(self.s[1], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='add-flow', ecmp=True)
+        groups = self.net.getChainGroups()
+        # one group at the first switch of each direction
+        self.assertTrue(len(groups) == 2)
+        for group in groups:
+            self.assertTrue(len(group['paths']) == 2)
+            self.assertTrue(len(group['switches']) == 1)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping(
+            [self.net.getNodeByName("vnf1"), self.net.getNodeByName("vnf2")]) <= 0.0)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2',
+                          bidirectional=True, cmd='del-flows')
+        self.assertTrue(len(self.net.getChainGroups()) == 0)
+        self.assertTrue(len(self.net.group_ids) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingConstraints(self):
+        """
+        Route chains with delay and bandwidth constraints and check
+        that the bandwidth reservations are honored and released.
+        """
+        # create network
+        self.createNet(
+            nswitches=2, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=False,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links: a fast path over s0 and a slow path over s1
+        self.net.addLink(self.dc[0], self.s[0], delay="1ms", bw=10)
+        self.net.addLink(self.s[0], self.dc[1], delay="1ms", bw=10)
+        self.net.addLink(self.dc[0], self.s[1], delay="20ms", bw=10)
+        self.net.addLink(self.s[1], self.dc[1], delay="20ms", bw=10)
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'},
+                             {'id': 'intf3', 'ip': '10.0.20.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'},
+                             {'id': 'intf4', 'ip': '10.0.20.2/24'}])
+        # the delay budget only fits the path over s0
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='add-flow',
+                                max_delay=10, min_bw=8)
+        self.assertTrue(ret.startswith('success'))
+        self.assertTrue(self.net.getLinkReservations().get(
+            "{0}->{1}".format(self.s[0].name, self.dc[1].switch.name)) == 8.0)
+        # not enough bandwidth left on the fast path
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf3', 'intf4', cmd='add-flow',
+                                max_delay=10, min_bw=8)
+        self.assertTrue(ret.startswith('No feasible path'))
+        # but on the slow one
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf3', 'intf4', cmd='add-flow',
+                                min_bw=8)
+        self.assertTrue(ret.startswith('success'))
+        # removing the chains releases their bandwidth
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='del-flows')
+        self.net.setChain('vnf1', 'vnf2', 'intf3', 'intf4', cmd='del-flows')
+        self.assertTrue(len(self.net.getLinkReservations()) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingProtection(self):
+        """
+        Protect a chain with a backup path and check that it is moved
+        to the backup path if a link of its path is removed.
+        """
+        # create network
+        self.createNet(
+            nswitches=2, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=False,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links: two link-disjoint paths over s0 and s1
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        self.net.addLink(self.dc[0], self.s[1])
+        self.net.addLink(self.s[1], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='add-flow',
+                                protect=True)
+        self.assertTrue(ret.startswith('success'))
+        chain = list(self.net.installed_chains.values())[0]
+        path = chain['path']
+        backup = chain['backup']
+        self.assertTrue(backup is not None and backup[1] != path[1])
+        groups = self.net.getChainGroups()
+        self.assertTrue(len(groups) == 1)
+        self.assertTrue(groups[0]['type'] == 'ff')
+        # only the chain using the removed link is repaired
+        self.net.removeLink(node1=self.net.getNodeByName(path[0]),
+                            node2=self.net.getNodeByName(path[1]))
+        self.assertTrue(chain['path'] == backup)
+        self.assertTrue(len(self.net.chain_edges.chains(path[0], path[1])) == 0)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='del-flows')
+        self.assertTrue(len(self.net.installed_chains) == 0)
+        self.assertTrue(len(self.net.chain_edges) == 0)
+        self.assertTrue(len(self.net.getChainGroups()) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingQueues(self):
+        """
+        Give a chain a guaranteed rate and check that its HTB queues
+        are created on its ports and removed with the chain.
+        """
+        # create network
+        self.createNet(
+            nswitches=0, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=False,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links
+        self.net.addLink(self.dc[0], self.dc[1], bw=100)
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='add-flow',
+                                min_rate=10, max_rate=50)
+        self.assertTrue(ret.startswith('success'))
+        queues = self.net.getChainQueues()
+        self.assertTrue(len(queues) == 1)
+        # one queue towards dc1 and one towards vnf2
+        self.assertTrue(len(queues[0]['ports']) == 2)
+        self.assertTrue(len(self.net.qos) == 2)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='del-flows')
+        self.assertTrue(len(self.net.getChainQueues()) == 0)
+        self.assertTrue(len(self.net.qos) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingPipeline(self):
+        """
+        Install two chains over the same path towards the same
+        interface and check that they share one path label.
+        """
+        # create network
+        self.createNet(
+            nswitches=0, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=False,
+            controller=RemoteController,
+            enable_learning=False,
+            pipeline=True)
+        # setup links
+        self.net.addLink(self.dc[0], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[0].startCompute(
+            "vnf3", network=[{'id': 'intf3', 'ip': '10.0.10.3/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='add-flow')
+        self.assertTrue(ret.startswith('success'))
+        ret = self.net.setChain('vnf3', 'vnf2', 'intf3', 'intf2', cmd='add-flow')
+        self.assertTrue(ret.startswith('success'))
+        labels = self.net.getPathLabels()
+        self.assertTrue(len(labels) == 1)
+        self.assertTrue(len(labels[0]['chains']) == 2)
+        # the label stays until its last chain is removed
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='del-flows')
+        self.assertTrue(len(self.net.path_labels) == 1)
+        self.net.setChain('vnf3', 'vnf2', 'intf3', 'intf2', cmd='del-flows')
+        self.assertTrue(len(self.net.path_labels) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNChainingLoadAware(self):
+        """
+        Route a chain load-aware and check that idle links
+        do not trigger a rebalancing.
+        """
+        # create network
+        self.createNet(
+            nswitches=2, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=False,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links: two paths over s0 and s1
+        self.net.addLink(self.dc[0], self.s[0], bw=10)
+        self.net.addLink(self.s[0], self.dc[1], bw=10)
+        self.net.addLink(self.dc[0], self.s[1], bw=10)
+        self.net.addLink(self.s[1], self.dc[1], bw=10)
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        ret = self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='add-flow',
+                                routing='load')
+        self.assertTrue(ret.startswith('success'))
+        chains = list(self.net.installed_chains.values())
+        self.assertTrue(len(chains) == 1)
+        self.assertTrue(chains[0]['path'][0] == self.dc[0].switch.name)
+        self.assertTrue(chains[0]['path'][-1] == self.dc[1].switch.name)
+        # no traffic, nothing to move
+        self.assertTrue(self.net.rebalanceChains() == 0)
+        self.net.setChain('vnf1', 'vnf2', 'intf1', 'intf2', cmd='del-flows')
+        self.assertTrue(len(self.net.installed_chains) == 0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testSDNSetChainsBatch(self):
+        """
+        Install several chains with one setChains call and check the
+        per-request results.
+        """
+        # create network
+        self.createNet(
+            nswitches=1, ndatacenter=2, nhosts=0, ndockers=0,
+            autolinkswitches=True,
+            controller=RemoteController,
+            enable_learning=False)
+        # setup links
+        self.net.addLink(self.dc[0], self.s[0])
+        self.net.addLink(self.s[0], self.dc[1])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        self.dc[1].startCompute(
+            "vnf2", network=[{'id': 'intf2', 'ip': '10.0.10.2/24'}])
+        results = self.net.setChains([
+            dict(vnf_src_name='vnf1', vnf_dst_name='vnf2',
+                 vnf_src_interface='intf1', vnf_dst_interface='intf2',
+                 bidirectional=True, cmd='add-flow'),
+            dict(vnf_src_name='vnf1', vnf_dst_name='unknown',
+                 vnf_src_interface='intf1', vnf_dst_interface='intf2',
+                 cmd='add-flow')])
+        self.assertTrue(len(results) == 2)
+        self.assertTrue(results[0]['success'])
+        self.assertFalse(results[1]['success'])
+        self.assertTrue(len(self.net.installed_chains) == 2)
+        # the chain setup time is recorded
+        self.assertTrue(self.net.metrics_registry.get_sample_value(
+            'sonemu_network_operation_seconds_count',
+            {'operation': 'chain_add', 'backend': 'ryu'}) == 1)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping(
+            [self.net.getNodeByName("vnf1"), self.net.getNodeByName("vnf2")]) <= 0.0)
+        # stop Mininet network
+        self.stopNet()
+
 # @unittest.skip("disabled compute tests for development")
 
 
@@ -317,6 +893,67 @@ class testEmulatorCompute(SimpleTestTopology):
         # stop Mininet network
         self.stopNet()
 
+    def testAddComputeBatchSingleDC(self):
+        """
+        Start several compute instances with one batch call,
+        a duplicate name is reported but does not stop the others.
+        """
+        # create network
+        self.createNet(nswitches=0, ndatacenter=1, nhosts=1, ndockers=0)
+        # setup links
+        self.net.addLink(self.dc[0], self.h[0])
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        results = self.dc[0].startComputeBatch([
+            {'name': 'vnf1'},
+            {'name': 'vnf2', 'network': [{'id': 'intf1'}, {'id': 'intf2'}]},
+            {'name': 'vnf1'}])
+        self.assertTrue(len(results) == 3)
+        self.assertTrue(results[0]['error'] is None)
+        self.assertTrue(results[1]['error'] is None)
+        self.assertTrue(results[2]['container'] is None)
+        self.assertIn('create', results[0]['timings'])
+        # check number of running nodes
+        self.assertTrue(len(self.getContainernetContainers()) == 2)
+        self.assertTrue(len(self.dc[0].listCompute()) == 2)
+        self.assertTrue(len(results[1]['container'].intfList()) == 2)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping([self.h[0], results[0]['container']]) <= 0.0)
+        # stop Mininet network
+        self.stopNet()
+
+    def testAddComputeWarmPoolSingleDC(self):
+        """
+        Take a compute instance from the warm pool of a DC
+        and check that it is connected and the pool is refilled.
+        """
+        # create network
+        self.createNet(nswitches=0, ndatacenter=1, nhosts=1, ndockers=0)
+        # setup links
+        self.net.addLink(self.dc[0], self.h[0])
+        # start Mininet network
+        self.startNet()
+        self.dc[0].enableWarmPool(['ubuntu:trusty'], size=1)
+        for _ in range(60):
+            if len(self.dc[0].warm_pool) == 1:
+                break
+            time.sleep(1)
+        self.assertTrue(len(self.dc[0].warm_pool) == 1)
+        # add compute resources
+        vnf1 = self.dc[0].startCompute("vnf1")
+        stats = self.dc[0].getWarmPoolStats()
+        self.assertTrue(stats['hits'] == 1)
+        self.assertTrue(vnf1.name == "vnf1")
+        self.assertTrue(len(self.dc[0].listCompute()) == 1)
+        # check connectivity by using ping
+        self.assertTrue(self.net.ping([self.h[0], vnf1]) <= 0.0)
+        # a command can not be changed, the pool is not used
+        self.dc[0].startCompute("vnf2", command="sleep 100")
+        self.assertTrue(self.dc[0].getWarmPoolStats()['hits'] == 1)
+        # stop Mininet network
+        self.stopNet()
+
     def testRemoveSingleComputeSingleDC(self):
         """
         Test stop method for compute instances.
@@ -349,6 +986,61 @@ class testEmulatorCompute(SimpleTestTopology):
         # stop Mininet network
         self.stopNet()
 
+    def testConnectedSwitchPortIndex(self):
+        """
+        Check that the interface index follows start/stop of
+        compute instances.
+        """
+        # create network
+        self.createNet(nswitches=0, ndatacenter=1, nhosts=0, ndockers=0)
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'},
+                             {'id': 'intf2', 'ip': '10.0.20.1/24'}])
+        # lookup by interface id and default interface
+        p1 = self.net.getConnectedSwitchPort("vnf1", "intf1")
+        p2 = self.net.getConnectedSwitchPort("vnf1", "intf2")
+        self.assertTrue(p1.switch == self.dc[0].switch.name)
+        self.assertTrue(p1.port_nr != p2.port_nr)
+        self.assertTrue(self.net.getConnectedSwitchPort("vnf1") == p1)
+        self.assertTrue(
+            self.net.find_connected_dc_interface("vnf1", "intf2") == p2.port_name)
+        # remove compute resources
+        self.dc[0].stopCompute("vnf1")
+        self.assertTrue(self.net.getConnectedSwitchPort("vnf1") is None)
+        # stop Mininet network
+        self.stopNet()
+
+    def testNodeRegistry(self):
+        """
+        Check that the node name registry follows start/stop of
+        compute instances.
+        """
+        # create network
+        self.createNet(nswitches=0, ndatacenter=1, nhosts=1, ndockers=0)
+        # start Mininet network
+        self.startNet()
+        self.assertTrue(self.net.hasNode(self.dc[0].switch.name, kind='switch'))
+        self.assertTrue(self.net.hasNode(self.h[0].name, kind='host'))
+        # add compute resources
+        vnf1 = self.dc[0].startCompute("vnf1")
+        self.assertTrue(self.net.hasNode("vnf1", kind='container'))
+        self.assertTrue(self.net.getNodeByName("vnf1") is vnf1)
+        self.assertIn("vnf1", self.net.getNodeNames(kind='container'))
+        # names are unique over all node kinds
+        with self.assertRaises(Exception):
+            self.dc[0].startCompute("vnf1")
+        with self.assertRaises(Exception):
+            self.dc[0].startCompute(self.h[0].name)
+        # remove compute resources
+        self.dc[0].stopCompute("vnf1")
+        self.assertFalse(self.net.hasNode("vnf1"))
+        self.assertTrue(self.net.getNodeByName("vnf1") is None)
+        # stop Mininet network
+        self.stopNet()
+
     def testGetStatusSingleComputeSingleDC(self):
         """
         Check if the getStatus functionality of EmulatorCompute
@@ -377,6 +1069,45 @@ class testEmulatorCompute(SimpleTestTopology):
         s = self.dc[0].containers.get("vnf1").getStatus()
         self.assertTrue(s["name"] == "vnf1")
         self.assertTrue(s["state"]["Running"])
+        # the second request is served from the status cache
+        hits = self.net.getContainerStatusStats()['hits']
+        s = vnf1.getStatus()
+        self.assertTrue(s["state"]["Running"])
+        self.assertTrue(self.net.getContainerStatusStats()['hits'] == hits + 1)
+        # a pause is seen through the docker events
+        vnf1.dcli.pause(vnf1.did)
+        for _ in range(10):
+            if vnf1.getStatus()["state"]["Paused"]:
+                break
+            time.sleep(0.5)
+        self.assertTrue(vnf1.getStatus()["state"]["Paused"])
+        vnf1.dcli.unpause(vnf1.did)
+        self.assertFalse(vnf1.getStatus(fresh=True)["state"]["Paused"])
+        # stop Mininet network
+        self.stopNet()
+
+    def testNetworkStatusSingleComputeSingleDC(self):
+        """
+        Check that the network status of a compute instance
+        follows changes of its interfaces.
+        """
+        # create network
+        self.createNet(nswitches=0, ndatacenter=1, nhosts=0, ndockers=0)
+        # start Mininet network
+        self.startNet()
+        # add compute resources
+        vnf1 = self.dc[0].startCompute(
+            "vnf1", network=[{'id': 'intf1', 'ip': '10.0.10.1/24'}])
+        s = vnf1.getStatus()
+        self.assertTrue(len(s["network"]) == 1)
+        self.assertTrue(s["network"][0]["ip"] == "10.0.10.1/24")
+        self.assertTrue(s["network"][0]["up"])
+        self.assertTrue(s["network"][0]["status"] == "OK")
+        # a new link invalidates the cached status
+        self.net.addLink(vnf1, self.dc[0].switch, params1={'id': 'intf2', 'ip': '10.0.20.1/24'},
+                         cls=Link, intfName1='intf2')
+        s = vnf1.getStatus()
+        self.assertTrue(len(s["network"]) == 2)
         # stop Mininet network
         self.stopNet()
 
@@ -0,0 +1,123 @@
+# Copyright (c) 2018 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import unittest
+
+from emuvim.dcemulator.flows import CookieIndex, FlowBatch, FlowEntry, OfctlBundle, \
+    ofctl_bundle_line
+
+
+class FakeSwitch(object):
+    """
+    Records the ovs-ofctl calls (and the content of bundle files).
+    """
+
+    def __init__(self, name, dpid, reply=''):
+        self.name = name
+        self.dpid = dpid
+        self.reply = reply
+        self.calls = []
+
+    def dpctl(self, cmd, arg):
+        if '--bundle' in cmd:
+            with open(arg) as f:
+                arg = f.read().splitlines()
+        self.calls.append((cmd, arg))
+        return self.reply
+
+
+class OfctlBundleLineTest(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(
+            "add cookie=10,in_port=1,actions=output:2",
+            ofctl_bundle_line('add-flow', '-O OpenFlow13 "cookie=10,in_port=1,actions=output:2"'))
+
+    def test_delete(self):
+        # the cookie has to be matched completely
+        self.assertEqual(
+            "delete cookie=10/-1,in_port=1",
+            ofctl_bundle_line('del-flows', '-OOpenFlow13 cookie=10,in_port=1'))
+        self.assertEqual(
+            "delete cookie=0x1/0xff,in_port=1",
+            ofctl_bundle_line('del-flows', 'cookie=0x1/0xff,in_port=1'))
+
+    def test_strict_delete(self):
+        self.assertEqual(
+            "delete_strict priority=1000,in_port=1,dl_vlan=5",
+            ofctl_bundle_line('del-flows', '--strict priority=1000,in_port=1,dl_vlan=5'))
+
+
+class OfctlBundleTest(unittest.TestCase):
+    def test_grouped_per_switch(self):
+        s1 = FakeSwitch('s1', '0000000000000001')
+        s2 = FakeSwitch('s2', '0000000000000002')
+        cookies = CookieIndex()
+        bundle = OfctlBundle(cookie_index=cookies)
+        bundle.add(s1, 'cookie=7,in_port=1,actions=output:2')
+        bundle.add(s2, 'cookie=7,in_port=2,actions=output:1')
+        bundle.add(s1, 'cookie=7,in_port=2,actions=output:1')
+        bundle.add(s1, 'cookie=7,in_port=3', cmd='del-flows')
+        self.assertEqual(4, len(bundle))
+        bundle.apply()
+        # one bundle per switch, flow_mods in the order they were added
+        self.assertEqual([('-O OpenFlow14 --bundle add-flows',
+                           ['add cookie=7,in_port=1,actions=output:2',
+                            'add cookie=7,in_port=2,actions=output:1',
+                            'delete cookie=7/-1,in_port=3'])], s1.calls)
+        self.assertEqual([('-O OpenFlow14 --bundle add-flows',
+                           ['add cookie=7,in_port=2,actions=output:1'])], s2.calls)
+        self.assertEqual(0, len(bundle))
+        self.assertEqual([1, 2], cookies.dpids(7))
+
+    def test_without_bundles(self):
+        s1 = FakeSwitch('s1', '0000000000000001')
+        bundle = OfctlBundle(use_bundles=False)
+        bundle.add(s1, 'in_port=1,actions=output:2')
+        bundle.add(s1, 'in_port=1', cmd='del-flows')
+        bundle.apply()
+        self.assertEqual([('add-flow -OOpenFlow13', 'in_port=1,actions=output:2'),
+                          ('del-flows -OOpenFlow13', 'in_port=1')], s1.calls)
+
+    def test_error(self):
+        s1 = FakeSwitch('s1', '0000000000000001', reply='OFPT_ERROR (OF1.4): OFPBFC_BAD_FLAGS')
+        s2 = FakeSwitch('s2', '0000000000000002')
+        bundle = OfctlBundle()
+        bundle.add(s1, 'in_port=1,actions=output:2')
+        bundle.add(s2, 'in_port=1,actions=output:2')
+        self.assertRaises(Exception, bundle.apply)
+        # the other switches are programmed anyway
+        self.assertEqual(1, len(s2.calls))
+
+
+class FlowBatchTest(unittest.TestCase):
+    def test_per_switch(self):
+        s1 = FakeSwitch('s1', '0000000000000001')
+        s2 = FakeSwitch('s2', '0000000000000002')
+        batch = FlowBatch()
+        entries = [batch.add(FlowEntry(s, 'add-flow', ofcmd='in_port=%d' % i), chain='c', hop=i)
+                   for i, s in enumerate([s1, s2, s1])]
+        self.assertEqual(['s1', 's2'], list(batch.per_switch()))
+        self.assertEqual([entries[0], entries[2]], batch.per_switch()['s1'])
+        self.assertEqual([entries[1]], batch.per_switch()['s2'])
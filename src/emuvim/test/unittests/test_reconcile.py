@@ -0,0 +1,67 @@
+# Copyright (c) 2018 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import unittest
+
+from emuvim.dcemulator.reconcile import DesiredFlowTable
+
+
+def _flow(priority, match, cookie=1):
+    return {'dpid': 1, 'priority': priority, 'cookie': cookie,
+            'match': match, 'actions': [{'type': 'OUTPUT', 'port': 3}]}
+
+
+class testDesiredFlowTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = DesiredFlowTable()
+        self.table.apply('add-flow', _flow(1000, {'in_port': 2, 'dl_vlan': 7}))
+        self.table.apply('add-flow', _flow(1001, {'in_port': 2, 'dl_vlan': 7, 'dl_type': 2048}))
+
+    def testDelete(self):
+        # non-strict delete removes all entries with a superset match
+        self.table.apply('del-flows', {'dpid': 1, 'match': {'in_port': 2}})
+        self.assertEqual(len(self.table), 0)
+
+    def testStrictDelete(self):
+        # strict delete only removes the entry with the same priority and match
+        self.table.apply('del-flows', {'dpid': 1, 'priority': 1000, 'cookie': 1,
+                                       'match': {'in_port': 2, 'dl_vlan': 7}},
+                         strict=True)
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.table.flows()[0]['priority'], 1001)
+        # nothing is removed if the priority differs
+        self.table.apply('del-flows', {'dpid': 1, 'priority': 1000,
+                                       'match': {'in_port': 2, 'dl_vlan': 7, 'dl_type': 2048}},
+                         strict=True)
+        self.assertEqual(len(self.table), 1)
+
+    def testManagedCookies(self):
+        self.assertTrue(self.table.is_managed(1))
+        self.assertFalse(self.table.is_managed(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# Copyright (c) 2018 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from emuvim.dcemulator.ryu_client import RyuClient
+
+
+class FakeRyuHandler(BaseHTTPRequestHandler):
+    """
+    Minimal Ryu REST api: GET stats/switches, POST stats/flowentry/*
+    (payload key 'delay' delays the reply), everything else fails.
+    """
+
+    def do_GET(self):
+        if self.path == '/stats/switches':
+            self._reply(200, json.dumps([1, 2]), 'application/json')
+        else:
+            self._reply(404, 'not found', 'text/plain')
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if not self.path.startswith('/stats/flowentry/'):
+            self._reply(400, 'bad request', 'text/plain')
+            return
+        time.sleep(data.get('delay', 0))
+        self.server.received.append(data)
+        self._reply(200, '', 'text/html')
+
+    def _reply(self, status, body, content_type):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RyuClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRyuHandler)
+        self.server.daemon_threads = True
+        self.server.received = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.ryu = RyuClient('http://127.0.0.1:%d' % self.server.server_port, max_workers=4)
+
+    def tearDown(self):
+        self.ryu.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_request_get_json(self):
+        self.assertEqual([1, 2], self.ryu.request('stats/switches'))
+
+    def test_request_post(self):
+        self.assertEqual('', self.ryu.request('stats/flowentry/add', data={'dpid': 1}))
+        self.assertEqual([{'dpid': 1}], self.server.received)
+
+    def test_request_error(self):
+        # without check the reply text is returned
+        self.assertEqual('bad request', self.ryu.request('stats/groupentry/add', data={'dpid': 1}))
+        with self.assertRaises(Exception):
+            self.ryu.request('stats/groupentry/add', data={'dpid': 1}, check=True)
+        stats = self.ryu.stats()
+        self.assertEqual(2, stats['requests'])
+        self.assertEqual(1, stats['errors'])
+
+    def test_submit(self):
+        future = self.ryu.submit('stats/switches')
+        self.assertEqual([1, 2], future.result())
+        future = self.ryu.submit('stats/groupentry/add', data={'dpid': 1}, check=True)
+        self.assertRaises(Exception, future.result)
+
+    def test_submit_key_keeps_order(self):
+        # the slow first request is still answered before the second one is sent
+        first = self.ryu.submit('stats/flowentry/delete', data={'dpid': 1, 'delay': 0.3}, key='s1')
+        second = self.ryu.submit('stats/flowentry/add', data={'dpid': 1}, key='s1')
+        other = self.ryu.submit('stats/flowentry/add', data={'dpid': 2}, key='s2')
+        for future in [first, second, other]:
+            future.result()
+        self.assertEqual([{'dpid': 2}, {'dpid': 1, 'delay': 0.3}, {'dpid': 1}],
+                         self.server.received)
+
+    def test_request_many(self):
+        ret = self.ryu.request_many([
+            {'prefix': 'stats/switches'},
+            {'prefix': 'stats/groupentry/add', 'data': {'dpid': 1}},
+            {'prefix': 'stats/flowentry/add', 'data': {'dpid': 1}}], check=True)
+        self.assertEqual([1, 2], ret[0])
+        self.assertTrue(isinstance(ret[1], Exception))
+        self.assertEqual('', ret[2])
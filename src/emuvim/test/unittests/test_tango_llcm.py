@@ -222,6 +222,8 @@ class testTangoLLCM(SimpleTestTopology):
         r5 = requests.get("http://127.0.0.1:56001/instantiations")
         # note that there was 1 instance before
         self.assertEqual(len(json.loads(r5.text)), 0)
+        # the E-Lines are removed with the service, their tags are free again
+        self.assertEqual(len(self.net.installed_chains), 0)
 
         # stop Mininet network
         self.stopNet()
@@ -0,0 +1,79 @@
+# Copyright (c) 2018 SONATA-NFV and Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+import unittest
+
+import networkx as nx
+
+from emuvim.dcemulator.topology import PathCache
+
+
+class PathCacheTest(unittest.TestCase):
+    def setUp(self):
+        # s1 - s2 - s3 plus a VNF and an internal SAP connected to s1 and s3
+        self.graph = nx.MultiDiGraph()
+        for name in ['s1', 's2', 's3']:
+            self.graph.add_node(name, type='switch')
+        self.graph.add_node('vnf1', type='docker')
+        self.graph.add_node('sap1', type='sap_int')
+        for u, v in [('s1', 's2'), ('s2', 's3'), ('vnf1', 's1'), ('vnf1', 's3'),
+                     ('sap1', 's1'), ('sap1', 's3')]:
+            self.graph.add_edge(u, v)
+            self.graph.add_edge(v, u)
+        self.cache = PathCache()
+
+    def test_hits_and_misses(self):
+        self.assertEqual(['s1', 's2', 's3'], self.cache.get(self.graph, 's1', 's3'))
+        self.assertEqual(['s1', 's2', 's3'], self.cache.get(self.graph, 's1', 's3'))
+        self.assertEqual(['s3', 's2', 's1'], self.cache.get(self.graph, 's3', 's1'))
+        stats = self.cache.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertEqual(2, stats['size'])
+
+    def test_returns_copies(self):
+        self.cache.get(self.graph, 's1', 's3').append('s4')
+        self.assertEqual(['s1', 's2', 's3'], self.cache.get(self.graph, 's1', 's3'))
+
+    def test_bump_invalidates(self):
+        self.cache.get(self.graph, 's1', 's3')
+        # a direct link is only found after the topology epoch was bumped
+        self.graph.add_edge('s1', 's3')
+        self.assertEqual(['s1', 's2', 's3'], self.cache.get(self.graph, 's1', 's3'))
+        self.cache.bump()
+        self.assertEqual(['s1', 's3'], self.cache.get(self.graph, 's1', 's3'))
+        stats = self.cache.stats()
+        self.assertEqual(1, stats['epoch'])
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertEqual(1, stats['size'])
+
+    def test_endpoints_excluded(self):
+        # the shorter paths over the VNF and the internal SAP are not used
+        self.assertEqual(['s1', 's2', 's3'], self.cache.get(self.graph, 's1', 's3'))
+        self.graph.remove_edge('s1', 's2')
+        self.graph.remove_edge('s2', 's1')
+        self.cache.bump()
+        self.assertRaises(nx.NetworkXNoPath, self.cache.get, self.graph, 's1', 's3')